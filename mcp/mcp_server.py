@@ -3,8 +3,8 @@ MCP server for OpenJDK mailing list search.
 
 Exposes the OpenJDK Mail Search API as tools so AI assistants (e.g. Cursor)
 can search and browse OpenJDK mailing list archives. Includes a tool to
-fetch raw message content from mail.openjdk.org (the REST API returns only
-metadata).
+fetch message content, served by the API's /mail/bodies endpoint where stored
+and from mail.openjdk.org otherwise.
 
 Run with stdio transport for Cursor:
   cd mcp && python -m mcp_server
@@ -15,42 +15,378 @@ Requires: pip install mcp httpx (or uv pip install from mcp/)
 """
 
 import asyncio
+import contextlib
 import html
+import importlib.util
 import json
 import os
 import re
-import unicodedata
+import sqlite3
+import sys
+import threading
+import time
 import urllib.parse
+import zlib
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from pathlib import Path
 from typing import Any
 
 import httpx
 
-# When including content in search/list results, cap at this many bodies to keep response size bounded.
-MAX_INCLUDE_CONTENT = 5
+# When including content in search/list results, stop adding bodies once the response holds this many
+# characters of content; cached bodies are free, so the budget bounds response size rather than fetches.
+MAX_INCLUDE_CONTENT_CHARS = 200_000
+# Upper bound on bodies per call, and how many are fetched per round while the budget lasts.
+MAX_INCLUDE_CONTENT = 50
+BODY_FETCH_CHUNK = 10
+
+# openjdk_mail_collect: most results one call gathers, and the default size of its JSON response.
+MAX_COLLECT_RESULTS = 1000
+COLLECT_MAX_CHARS = 200_000
+
+# Per-message character limit for bodies served by the API (/mail/bodies max_chars).
+MAX_BODY_CHARS = 20_000
+
+# Bodies returned to the assistant are shaped to fit this many tokens each (estimated at CHARS_PER_TOKEN):
+# quoted replies and patches are collapsed into one-line summaries, then the text is cut at a line boundary.
+MESSAGE_MAX_TOKENS = int(os.environ.get("OPENJDK_MAIL_MESSAGE_MAX_TOKENS", "1500"))
+CHARS_PER_TOKEN = 4
+
+# Same rules as STOP_LINES in src/stops.py, which the indexer applies before storing bodies; keep in sync.
+STOP_LINES = [
+    r'\W*>',
+    r'An HTML attachment was scrubbed',
+    r'URL: <'
+]
+QUOTE_LINE = re.compile(STOP_LINES[0])
+DROP_LINE = re.compile("|".join([*STOP_LINES[1:], r"-+ next part -+$"]))
+DIFF_START = re.compile(r"diff --git |@@ -\d+(,\d+)? \+\d+(,\d+)? @@")
+DIFF_LINE = re.compile(r"(diff |index |--- |\+\+\+ |@@ |[-+ ]|$)")
+DIFF_FILE = re.compile(r"\+\+\+ (?:b/)?(\S+)")
+
+# C0/C1 control characters except tab, newline and carriage return.
+CONTROL_CHARS = dict.fromkeys(c for c in [*range(0x20), *range(0x7f, 0xa0)] if chr(c) not in "\t\n\r")
 
 # Raw mail content is fetched from OpenJDK pipermail (not from the REST API).
 PIPERMAIL_BASE = os.environ.get(
     "OPENJDK_PIPERMAIL_BASE_URL", "https://mail.openjdk.org/pipermail"
 )
 
+# One pooled client serves every tool call; connections stay open between calls.
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE = 10
+HTTP_KEEPALIVE_EXPIRY = 60.0  # seconds an idle connection is kept
+# Concurrent requests per host; pipermail is a single archive server, so stay polite there.
+HOST_CONCURRENCY = {"mail.openjdk.org": 4}
+DEFAULT_HOST_CONCURRENCY = 10
+# HTTP/2 multiplexes the parallel body fetches over one connection; needs the http2 extra (h2).
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Archived messages never change, so bodies are cached in memory and as zlib files on disk across sessions.
+# Set OPENJDK_MAIL_CACHE_DIR to an empty string to keep the cache in memory only.
+BODY_CACHE_DIR = os.environ.get(
+    "OPENJDK_MAIL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "openjdk-mail-mcp", "bodies")
+)
+BODY_CACHE_MAX_BYTES = 256 * 1024 * 1024  # on disk; least recently used files are evicted beyond this
+BODY_CACHE_MEMORY_ENTRIES = 1000
+
+# Optional offline index built by src/build_snapshot.py. Search, latest, by-author and by-email are answered from it
+# while it is as new as the API's last_update (checked every SNAPSHOT_CHECK_INTERVAL seconds) or the API is down.
+SNAPSHOT_PATH = os.environ.get("OPENJDK_MAIL_SNAPSHOT", "")
+SNAPSHOT_CHECK_INTERVAL = 300
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_MMAP_BYTES = 1 << 34  # map the whole file; pages are shared with the OS cache
+LOCAL_CURSOR = "local:"  # cursors into the snapshot, API cursors are opaque base64
+SNAPSHOT_PATH_RE = re.compile(r"(?:/lists/(?P<list>[^/]+))?/mail(?:/(?P<kind>search|byauthor|byemail))?")
+
 # Use official MCP Python SDK (pip install mcp)
 from mcp.server.fastmcp import FastMCP
 
 BASE_URL = os.environ.get("OPENJDK_MAIL_API_BASE_URL", "https://openjdk.barlasgarden.com/api")
 
+_client: httpx.AsyncClient | None = None
+_host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+def _http_client() -> httpx.AsyncClient:
+    """The process-wide client, created on first use and closed by the server lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=30.0,
+            http2=HTTP2,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            headers={"User-Agent": "OpenJDK-Mail-MCP/1.0"},
+        )
+    return _client
+
+
+async def _request(method: str, url: str, **kwargs: Any) -> httpx.Response:
+    host = urllib.parse.urlsplit(url).hostname or ""
+    sem = _host_semaphores.get(host)
+    if sem is None:
+        sem = _host_semaphores[host] = asyncio.Semaphore(HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY))
+    async with sem:
+        resp = await _http_client().request(method, url, **kwargs)
+    resp.raise_for_status()
+    return resp
+
+
+class Snapshot:
+    """Read-only view of a snapshot file. Queries mirror the API: same filters, order, page size and item fields,
+    with LOCAL_CURSOR cursors."""
+
+    NON_WORD = re.compile(r"[^\w+#]+")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime
+        self.conn = sqlite3.connect(f"file:{urllib.parse.quote(path)}?mode=ro&immutable=1", uri=True,
+                                    check_same_thread=False)
+        self.conn.execute(f"PRAGMA mmap_size = {SNAPSHOT_MMAP_BYTES}")
+        self.lock = threading.Lock()
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        if int(meta.get("format", 0)) != SNAPSHOT_FORMAT:
+            raise ValueError(f"unsupported snapshot format {meta.get('format')}")
+        self.last_update = meta["last_update"]
+        # the tokenizer settings the index was built with, see src/query.py
+        self.max_token_length = int(meta["max_token_length"])
+        self.stop_words = frozenset(json.loads(meta["stop_words"]))
+        self.stop_prefixes = tuple(json.loads(meta["stop_prefixes"]))
+
+    def normalize(self, t: str) -> str:
+        return self.NON_WORD.sub("", t.lower())
+
+    def tokens(self, q: str) -> list[str]:
+        out = []
+        for t in q.split():
+            t = t.lower()
+            if len(t) > self.max_token_length or t.startswith(self.stop_prefixes):
+                continue
+            t = self.normalize(t)
+            if t and t not in self.stop_words:
+                out.append(t)
+        return out
+
+    def query(self, path: str, params: dict[str, str | None]) -> dict[str, Any] | None:
+        """The API response for path and params, or None when the snapshot cannot answer it."""
+        m = SNAPSHOT_PATH_RE.fullmatch(path)
+        if m is None:
+            return None
+        kind = m.group("kind")
+        list_name = urllib.parse.unquote(m.group("list")) if m.group("list") else None
+        cursor = params.get("cursor")
+        forward = params.get("order") == "asc"
+        limit = max(1, min(100, int(params.get("limit") or 10)))
+        where: list[str] = []
+        args: list[Any] = []
+        if kind == "search":
+            tokens = self.tokens(params.get("q") or "")
+            if not tokens:
+                return {"items": []}
+            source, key = "terms t JOIN mail m ON m.rowid = t.mail", ("t.date", "t.mail")
+            where.append("t.term = ?")
+            args.append("|".join(tokens))
+        else:
+            source, key = "mail m", ("m.date", "m.rowid")
+            if kind in ("byauthor", "byemail"):
+                field, value = ("authorkey", params.get("author")) if kind == "byauthor" else ("emailkey", params.get("email"))
+                where.append(f"m.{field} = ?")
+                args.append(self.normalize(value or ""))
+        if list_name:
+            where.append("m.list = ?")
+            args.append(list_name)
+        if params.get("from") and params.get("to"):
+            where.append(f"{key[0]} BETWEEN ? AND ?")
+            args += [params["from"], f"{params['to']}\uffff"]
+        if cursor:
+            date, _, rowid = cursor[len(LOCAL_CURSOR):].rpartition("/")
+            where.append(f"({key[0]}, {key[1]}) {'>' if forward else '<'} (?, ?)")
+            args += [date, int(rowid)]
+        direction = "ASC" if forward else "DESC"
+        sql = (f"SELECT m.list, m.month, m.id, m.date, m.author, m.email, m.subject, m.parent, m.root, {key[1]} "
+               f"FROM {source} WHERE {' AND '.join(where) or '1'} "
+               f"ORDER BY {key[0]} {direction}, {key[1]} {direction} LIMIT ?")
+        with self.lock:
+            rows = self.conn.execute(sql, [*args, limit]).fetchall()
+        if kind in ("byauthor", "byemail") and not rows and not cursor:
+            return None  # the API resolves names and addresses that are not exact keys
+        fields = ("list", "month", "id", "date", "author", "email", "subject", "parent", "root")
+        items = [{k: v for k, v in zip(fields, row) if v is not None} for row in rows]
+        out: dict[str, Any] = {"items": items}
+        if len(rows) == limit:
+            out["cursor"] = f"{LOCAL_CURSOR}{rows[-1][3]}/{rows[-1][-1]}"
+        return out
+
+
+_snapshot: Snapshot | None = None
+_snapshot_checked = -SNAPSHOT_CHECK_INTERVAL
+_snapshot_fresh = False
+
+
+def _open_snapshot() -> Snapshot | None:
+    global _snapshot
+    try:
+        if _snapshot is None or os.stat(SNAPSHOT_PATH).st_mtime != _snapshot.mtime:
+            _snapshot = Snapshot(SNAPSHOT_PATH)
+    except (OSError, sqlite3.Error, ValueError, KeyError) as e:
+        print(f"snapshot unavailable, path={SNAPSHOT_PATH}, error={e!r}", file=sys.stderr)
+    return _snapshot
+
+
+async def _fresh_snapshot() -> Snapshot | None:
+    """The snapshot when it is current with the API, or when the API cannot be reached."""
+    global _snapshot_checked, _snapshot_fresh
+    if not SNAPSHOT_PATH:
+        return None
+    now = time.monotonic()
+    if now - _snapshot_checked > SNAPSHOT_CHECK_INTERVAL:
+        _snapshot_checked = now
+        snap = await asyncio.to_thread(_open_snapshot)
+        if snap is None:
+            return None
+        try:
+            last_update = (await _api_get("/mail/status")).get("last_update")
+            _snapshot_fresh = not last_update or last_update <= snap.last_update
+        except (httpx.HTTPError, ValueError):
+            _snapshot_fresh = True
+    return _snapshot if _snapshot_fresh else None
+
+
+async def _api_query(path: str, params: dict[str, str | None]) -> dict[str, Any]:
+    """GET a query endpoint, answered from the snapshot when it is fresh. Pages continue where their cursor
+    came from, so a listing started locally stays consistent even if the snapshot goes stale meanwhile."""
+    cursor = params.get("cursor")
+    local = bool(cursor) and cursor.startswith(LOCAL_CURSOR)
+    if local:
+        snap = _snapshot or (await asyncio.to_thread(_open_snapshot) if SNAPSHOT_PATH else None)
+    else:
+        snap = None if cursor else await _fresh_snapshot()
+    if snap is not None:
+        data = await asyncio.to_thread(snap.query, path, params)
+        if data is not None:
+            return data
+    return await _api_get(path, params)
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(server: Any) -> AsyncIterator[None]:
+    try:
+        yield
+    finally:
+        if _client is not None:
+            await _client.aclose()
+
+
 mcp = FastMCP(
     name="OpenJDK Mail Search",
     instructions="Tools for searching and browsing OpenJDK mailing list archives (e.g. net-dev, core-libs-dev, amber-dev). Use when the user asks about OpenJDK lists, mail archives, or specific discussions.",
+    lifespan=_lifespan,
 )
 
 
 async def _api_get(path: str, query: dict[str, str] | None = None) -> dict[str, Any]:
     url = f"{BASE_URL.rstrip('/')}{path}"
     params = {k: v for k, v in (query or {}).items() if v is not None}
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        resp = await client.get(url, params=params or None)
-        resp.raise_for_status()
-        return resp.json()
+    resp = await _request("GET", url, params=params or None)
+    return resp.json()
+
+
+async def _api_post(path: str, payload: dict[str, Any]) -> dict[str, Any]:
+    url = f"{BASE_URL.rstrip('/')}{path}"
+    resp = await _request("POST", url, json=payload)
+    return resp.json()
+
+
+class BodyCache:
+    """Message bodies by (list, month, id): an in-memory LRU in front of one zlib file per message on disk.
+    Disk recency is the file mtime, refreshed on every read."""
+
+    def __init__(self, directory: str, max_bytes: int, memory_entries: int):
+        self.directory = Path(directory) if directory else None
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory: OrderedDict[tuple[str, str, str], str] = OrderedDict()
+        self.disk_bytes: int | None = None  # summed lazily on the first write
+        self.lock = threading.Lock()
+
+    def _path(self, ref: tuple[str, str, str]) -> Path:
+        return self.directory.joinpath(*(urllib.parse.quote(part, safe="") for part in ref[:2]),
+                                       urllib.parse.quote(ref[2], safe="") + ".z")
+
+    def _remember(self, ref: tuple[str, str, str], body: str) -> None:
+        with self.lock:
+            self.memory[ref] = body
+            self.memory.move_to_end(ref)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def get(self, ref: tuple[str, str, str]) -> str | None:
+        with self.lock:
+            body = self.memory.get(ref)
+            if body is not None:
+                self.memory.move_to_end(ref)
+                return body
+        if self.directory is None:
+            return None
+        path = self._path(ref)
+        try:
+            body = zlib.decompress(path.read_bytes()).decode("utf-8")
+            os.utime(path)
+        except (OSError, zlib.error, UnicodeDecodeError):
+            return None
+        self._remember(ref, body)
+        return body
+
+    def put(self, ref: tuple[str, str, str], body: str) -> None:
+        self._remember(ref, body)
+        if self.directory is None:
+            return
+        path = self._path(ref)
+        data = zlib.compress(body.encode("utf-8"), 6)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self.lock:
+            if self.disk_bytes is None:
+                self.disk_bytes = sum(f.stat().st_size for f in self.directory.rglob("*.z"))
+            else:
+                self.disk_bytes += len(data)
+            if self.disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # down to 90% so that eviction does not run again on the next write
+        files = []
+        for f in self.directory.rglob("*.z"):
+            with contextlib.suppress(OSError):
+                st = f.stat()
+                files.append((st.st_mtime, st.st_size, f))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, f in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            with contextlib.suppress(OSError):
+                f.unlink()
+                total -= size
+        self.disk_bytes = total
+
+
+_body_cache = BodyCache(BODY_CACHE_DIR, BODY_CACHE_MAX_BYTES, BODY_CACHE_MEMORY_ENTRIES)
+
+
+class _FetchError(Exception):
+    """A message body could not be fetched; the message is shown in place of the content."""
 
 
 async def _fetch_mail_body(list_name: str, month: str, id_str: str) -> str:
@@ -58,33 +394,157 @@ async def _fetch_mail_body(list_name: str, month: str, id_str: str) -> str:
     path = f"{list_name}/{urllib.parse.quote(month)}/{urllib.parse.quote(id_str)}.html"
     url = f"{PIPERMAIL_BASE.rstrip('/')}/{path}"
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            resp = await client.get(url, headers={"User-Agent": "OpenJDK-Mail-MCP/1.0"})
-            resp.raise_for_status()
-            html_text = resp.text
+        resp = await _request("GET", url, timeout=15.0)
+        html_text = resp.text
     except httpx.HTTPStatusError as e:
-        return f"Failed to fetch message: HTTP {e.response.status_code} ({url})"
+        raise _FetchError(f"Failed to fetch message: HTTP {e.response.status_code} ({url})") from e
     except httpx.RequestError as e:
-        return f"Failed to fetch message: {e!s}"
+        raise _FetchError(f"Failed to fetch message: {e!s}") from e
     # Pipermail puts the message body in the first <pre> block (tag casing may vary).
     m = re.search(r"<pre[^>]*>(.*?)</pre>", html_text, re.DOTALL | re.IGNORECASE)
     if not m:
-        return "No message body found in archive page (page structure may have changed)."
+        raise _FetchError("No message body found in archive page (page structure may have changed).")
     body = m.group(1).strip()
     body = _sanitize_mail_body(body)
     return body
 
 
+def _filtered_ref(ref: tuple[str, str, str]) -> tuple[str, str, str]:
+    """Body cache key of the API's copy of a body, which the indexer stored without quote and trailer lines."""
+    return ref[0], ref[1], f"{ref[2]}.filtered"
+
+
+async def _fetch_mail_bodies(refs: list[tuple[str, str, str]], complete: bool = False) -> list[str]:
+    """Fetch bodies for (list, month, id) refs: the body cache first, then one /mail/bodies request for those
+    stored by the API, then pipermail for the rest (mail indexed before bodies were stored, bodies the API cut at
+    MAX_BODY_CHARS, or the API is unavailable). The API's bodies lack quote and trailer lines, so they are cached
+    apart from pipermail's and skipped when complete is set. Failures come back as messages."""
+    found: dict[tuple[str, str, str], str] = {}
+    for ref in refs:
+        body = await asyncio.to_thread(_body_cache.get, ref)
+        if body is None and not complete:
+            body = await asyncio.to_thread(_body_cache.get, _filtered_ref(ref))
+        if body is not None:
+            found[ref] = body
+    filtered: dict[tuple[str, str, str], str] = {}
+    missing = [ref for ref in refs if ref not in found]
+    if missing and not complete:
+        try:
+            data = await _api_get(
+                "/mail/bodies",
+                {"ids": ",".join("/".join(ref) for ref in missing), "max_chars": str(MAX_BODY_CHARS)},
+            )
+            for item in data.get("items") or []:
+                if item.get("found") and not item.get("truncated"):
+                    filtered[(item["list"], item["month"], item["id"])] = item.get("content", "")
+        except (httpx.HTTPError, ValueError):
+            pass
+    missing = [ref for ref in missing if ref not in filtered]
+    fetched: dict[tuple[str, str, str], str] = {}
+    results = await asyncio.gather(*(_fetch_mail_body(*ref) for ref in missing), return_exceptions=True)
+    for ref, r in zip(missing, results):
+        if isinstance(r, _FetchError):
+            found[ref] = str(r)
+        elif isinstance(r, Exception):
+            found[ref] = f"(Failed to fetch content: {r!s})"
+        else:
+            fetched[ref] = r
+    for ref, body in filtered.items():
+        await asyncio.to_thread(_body_cache.put, _filtered_ref(ref), body)
+    for ref, body in fetched.items():
+        await asyncio.to_thread(_body_cache.put, ref, body)
+    found.update(filtered)
+    found.update(fetched)
+    return [found[ref] for ref in refs]
+
+
+async def _fetch_bodies_within_budget(
+    refs: list[tuple[str, str, str]], shape: bool = True, max_chars: int | None = None
+) -> list[str]:
+    """Bodies for the leading refs whose combined length fits MAX_INCLUDE_CONTENT_CHARS (the first one always
+    does), shaped unless shape is false. Fetched a chunk at a time so that no body is fetched past the budget."""
+    bodies: list[str] = []
+    used = 0
+    refs = refs[:MAX_INCLUDE_CONTENT]
+    for i in range(0, len(refs), BODY_FETCH_CHUNK):
+        for body in await _fetch_mail_bodies(refs[i:i + BODY_FETCH_CHUNK], complete=not shape):
+            if shape:
+                body = _shape_body(body, max_chars)
+            if bodies and used + len(body) > MAX_INCLUDE_CONTENT_CHARS:
+                return bodies
+            bodies.append(body)
+            used += len(body)
+    return bodies
+
+
 def _sanitize_mail_body(body: str) -> str:
     """Decode HTML entities and remove control characters that could break parsing or display."""
-    body = html.unescape(body)
-    # Remove control characters except newline, tab, carriage return (keep normal text flow).
-    body = "".join(
-        c
-        for c in body
-        if c in "\n\t\r" or unicodedata.category(c) != "Cc"
-    )
-    return body
+    return html.unescape(body).translate(CONTROL_CHARS)
+
+
+def _diff_summary(lines: list[str]) -> str:
+    files = [m.group(1) for line in lines if (m := DIFF_FILE.match(line))]
+    added = sum(1 for line in lines if line.startswith("+") and not line.startswith("+++ "))
+    removed = sum(1 for line in lines if line.startswith("-") and not line.startswith("--- "))
+    where = f" to {', '.join(files[:5])}{' and more' if len(files) > 5 else ''}" if files else ""
+    return f"[patch{where}: +{added} -{removed} lines omitted]"
+
+
+def _shape_body(body: str, max_chars: int | None = None) -> str:
+    """Make a body compact for the assistant: drop attachment trailers, replace runs of quoted lines and
+    unified diffs with one-line summaries, squeeze blank lines, and cut the text to max_chars."""
+    if max_chars is None:
+        max_chars = MESSAGE_MAX_TOKENS * CHARS_PER_TOKEN
+    lines = body.splitlines()
+    out: list[str] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if DROP_LINE.match(line):
+            i += 1
+        elif QUOTE_LINE.match(line):
+            j = i
+            while j < len(lines) and (QUOTE_LINE.match(lines[j]) or not lines[j].strip()):
+                j += 1
+            while not lines[j - 1].strip():
+                j -= 1
+            out.append(f"[{j - i} quoted lines omitted]")
+            i = j
+        elif DIFF_START.match(line) or (line.startswith("--- ") and lines[i + 1:i + 2] and
+                                         lines[i + 1].startswith("+++ ")):
+            j = i + 1
+            while j < len(lines) and DIFF_LINE.match(lines[j]):
+                j += 1
+            while not lines[j - 1].strip():
+                j -= 1
+            out.append(_diff_summary(lines[i:j]))
+            i = j
+        else:
+            if line.strip() or (out and out[-1].strip()):
+                out.append(line)
+            i += 1
+    text = "\n".join(out).strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n", 0, max_chars)
+    cut = cut if cut > max_chars // 2 else max_chars
+    return f"{text[:cut].rstrip()}\n[{len(text) - cut} more characters truncated]"
+
+
+def _format_entry(m: dict[str, Any]) -> dict[str, Any]:
+    entry = {
+        "list": m.get("list", ""),
+        "month": m.get("month", ""),
+        "id": m.get("id", ""),
+        "date": m.get("date", ""),
+        "author": m.get("author", ""),
+        "email": m.get("email", ""),
+        "subject": m.get("subject", ""),
+    }
+    for k in ("parent", "root"):
+        if m.get(k):
+            entry[k] = m[k]
+    return entry
 
 
 async def _format_items(data: dict[str, Any], include_content_max: int = 0) -> str:
@@ -92,39 +552,19 @@ async def _format_items(data: dict[str, Any], include_content_max: int = 0) -> s
     raw_items = data.get("items") or []
     if not raw_items:
         return json.dumps({"items": [], "message": "No matching mail found."}, separators=(",", ":"))
-    to_fetch = min(include_content_max, MAX_INCLUDE_CONTENT) if include_content_max else 0
-    bodies: list[str] = [""] * len(raw_items)
-    if to_fetch:
-        num_fetch = min(to_fetch, len(raw_items))
-        tasks = [
-            _fetch_mail_body(
-                raw_items[i]["list"],
-                raw_items[i]["month"],
-                raw_items[i]["id"],
-            )
-            for i in range(num_fetch)
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        for i, r in enumerate(results):
-            if isinstance(r, Exception):
-                bodies[i] = f"(Failed to fetch content: {r!s})"
-            else:
-                bodies[i] = r
+    bodies: list[str] = []
+    if include_content_max > 0:
+        refs = [(m["list"], m["month"], m["id"]) for m in raw_items[:include_content_max]]
+        bodies = await _fetch_bodies_within_budget(refs)
     items: list[dict[str, Any]] = []
     for i, m in enumerate(raw_items):
-        entry = {
-            "list": m.get("list", ""),
-            "month": m.get("month", ""),
-            "id": m.get("id", ""),
-            "date": m.get("date", ""),
-            "author": m.get("author", ""),
-            "email": m.get("email", ""),
-            "subject": m.get("subject", ""),
-        }
+        entry = _format_entry(m)
         if i < len(bodies) and bodies[i]:
             entry["content"] = bodies[i]
         items.append(entry)
     out: dict[str, Any] = {"items": items}
+    if 0 < len(bodies) < min(include_content_max, len(raw_items)):
+        out["content_note"] = f"Content included for the first {len(bodies)} items only (response size budget)."
     if data.get("cursor"):
         out["cursor"] = data["cursor"]
     return json.dumps(out, separators=(",", ":"))
@@ -145,8 +585,8 @@ async def openjdk_mail_search(
 
     Query is tokenized and matched against subject and body. Use when the user wants to find
     discussions about a topic. Optionally restrict to one list (e.g. net-dev, core-libs-dev).
-    Set include_content_max to 1–5 to include raw message body for the first N results (avoids
-    separate get-content calls); 0 = metadata only.
+    Set include_content_max to N (up to 50) to include the message body for the first N results, as far as a
+    ~200K character budget allows (avoids separate get-content calls); 0 = metadata only.
     """
     params: dict[str, str] = {"q": query, "limit": str(min(100, max(1, limit))), "order": order}
     if cursor:
@@ -159,7 +599,7 @@ async def openjdk_mail_search(
         path = f"/lists/{urllib.parse.quote(list_name)}/mail/search"
     else:
         path = "/mail/search"
-    data = await _api_get(path, params)
+    data = await _api_query(path, params)
     return await _format_items(data, include_content_max)
 
 
@@ -174,7 +614,8 @@ async def openjdk_mail_latest(
     include_content_max: int = 0,
 ) -> str:
     """Get latest OpenJDK mailing list messages in date order (optionally for one list).
-    Set include_content_max to 1–5 to include raw message body for the first N results; 0 = metadata only.
+    Set include_content_max to N (up to 50) to include the message body for the first N results, as far as a
+    ~200K character budget allows; 0 = metadata only.
     """
     params: dict[str, str] = {"limit": str(min(100, max(1, limit))), "order": order}
     if cursor:
@@ -187,7 +628,7 @@ async def openjdk_mail_latest(
         path = f"/lists/{urllib.parse.quote(list_name)}/mail"
     else:
         path = "/mail"
-    data = await _api_get(path, params)
+    data = await _api_query(path, params)
     return await _format_items(data, include_content_max)
 
 
@@ -202,10 +643,14 @@ async def openjdk_mail_by_author(
     to_date: str | None = None,
     include_content_max: int = 0,
 ) -> str:
-    """Get OpenJDK mail by author display name (e.g. Brian Goetz). Matching is normalized.
-    Set include_content_max to 1–5 to include raw message body for the first N results; 0 = metadata only.
+    """Get OpenJDK mail by author display name (e.g. Brian Goetz). Matching is normalized; a name with no exact
+    match resolves to the closest known author (use openjdk_mail_find_authors to see candidates).
+    Set include_content_max to N (up to 50) to include the message body for the first N results, as far as a
+    ~200K character budget allows; 0 = metadata only.
     """
-    params: dict[str, str] = {"author": author, "limit": str(min(100, max(1, limit))), "order": order}
+    params: dict[str, str] = {
+        "author": author, "limit": str(min(100, max(1, limit))), "order": order, "resolve": "1"
+    }
     if cursor:
         params["cursor"] = cursor
     if from_date:
@@ -216,7 +661,7 @@ async def openjdk_mail_by_author(
         path = f"/lists/{urllib.parse.quote(list_name)}/mail/byauthor"
     else:
         path = "/mail/byauthor"
-    data = await _api_get(path, params)
+    data = await _api_query(path, params)
     return await _format_items(data, include_content_max)
 
 
@@ -231,10 +676,14 @@ async def openjdk_mail_by_email(
     to_date: str | None = None,
     include_content_max: int = 0,
 ) -> str:
-    """Get OpenJDK mail by author email address. Matching is normalized.
-    Set include_content_max to 1–5 to include raw message body for the first N results; 0 = metadata only.
+    """Get OpenJDK mail by author email address. Matching is normalized; an address with no exact match
+    resolves to the closest known address.
+    Set include_content_max to N (up to 50) to include the message body for the first N results, as far as a
+    ~200K character budget allows; 0 = metadata only.
     """
-    params: dict[str, str] = {"email": email, "limit": str(min(100, max(1, limit))), "order": order}
+    params: dict[str, str] = {
+        "email": email, "limit": str(min(100, max(1, limit))), "order": order, "resolve": "1"
+    }
     if cursor:
         params["cursor"] = cursor
     if from_date:
@@ -245,10 +694,161 @@ async def openjdk_mail_by_email(
         path = f"/lists/{urllib.parse.quote(list_name)}/mail/byemail"
     else:
         path = "/mail/byemail"
+    data = await _api_query(path, params)
+    return await _format_items(data, include_content_max)
+
+
+@mcp.tool()
+async def openjdk_mail_thread(
+    list_name: str,
+    root: str,
+    cursor: str | None = None,
+    include_content_max: int = 0,
+) -> str:
+    """Get a whole OpenJDK mail thread in one call, oldest first (e.g. list_name='net-dev', root='027700').
+    Use the "root" field of any message returned by the other tools; each item carries "parent" (the message it
+    replies to, absent for the first message). Replies in a later month than their root form their own thread.
+    Set include_content_max to N (up to 50) to include the message body for the first N results, as far as a
+    ~200K character budget allows; 0 = metadata only.
+    """
+    params: dict[str, str] = {}
+    if cursor:
+        params["cursor"] = cursor
+    path = f"/lists/{urllib.parse.quote(list_name)}/threads/{urllib.parse.quote(root)}"
     data = await _api_get(path, params)
     return await _format_items(data, include_content_max)
 
 
+@mcp.tool()
+async def openjdk_mail_find_authors(query: str, limit: int = 10) -> str:
+    """Find OpenJDK mail authors by partial or approximate name or email (e.g. 'goetz', 'B. Goetz').
+    Returns JSON: { "items": [ {"author", "email", "authorkey", "emailkey", "count", "score"}, ... ] }, best first.
+    Pass an author or email from the results to openjdk_mail_by_author / openjdk_mail_by_email.
+    """
+    data = await _api_get("/mail/authors", {"q": query, "limit": str(min(100, max(1, limit)))})
+    return json.dumps({"items": data.get("items", [])}, separators=(",", ":"))
+
+
+@mcp.tool()
+async def openjdk_mail_batch(queries: list[dict[str, Any]]) -> str:
+    """Run up to 20 independent API queries in one round trip; prefer this over several separate tool calls.
+    Each query is {"path": ..., "params": {...}} using the REST paths behind the other tools, e.g.
+    {"path": "/mail/search", "params": {"q": "virtual threads", "limit": 5}},
+    {"path": "/lists/loom-dev/mail/byauthor", "params": {"author": "Alan Bateman"}},
+    {"path": "/lists/net-dev/threads/027700"}, {"path": "/mail/authors", "params": {"q": "goetz"}},
+    {"path": "/mail/status"}.
+    Returns JSON: { "results": [ {"status": 200, "body": {...}} | {"status": 4xx/5xx, "error": "..."}, ... ] }
+    in query order; a failing query does not affect the others.
+    """
+    data = await _api_post("/mail/batch", {"queries": queries[:20]})
+    return json.dumps({"results": data.get("results", [])}, separators=(",", ":"))
+
+
+@mcp.tool()
+async def openjdk_mail_collect(
+    query: str | None = None,
+    author: str | None = None,
+    email: str | None = None,
+    list_name: str | None = None,
+    max_results: int = 200,
+    order: str = "desc",
+    cursor: str | None = None,
+    from_date: str | None = None,
+    to_date: str | None = None,
+    include_content: bool = False,
+    max_chars: int = COLLECT_MAX_CHARS,
+) -> str:
+    """Collect up to max_results (≤1000) OpenJDK mails in one call instead of paging with cursor yourself.
+    Give query (search), author or email (like the by-author/by-email tools), or none of them for the latest mail;
+    optionally restrict to list_name and a date range. Pages are fetched internally and duplicates removed.
+    Collection stops early when the JSON response would exceed max_chars (default ~200K); set include_content to
+    add message bodies, which uses the budget much faster.
+    Returns JSON: { "items": [...], "count": N, "cursor"?: string, "message"?: string }. A returned cursor continues
+    the collection (pass it back with the same arguments); after a max_chars stop it restarts at the start of the
+    last page, so the items already returned from that page repeat.
+    """
+    if sum(x is not None for x in (query, author, email)) > 1:
+        return json.dumps({"items": [], "message": "Give at most one of query, author, email."}, separators=(",", ":"))
+    params: dict[str, str] = {"order": order}
+    if query is not None:
+        suffix, params["q"] = "/mail/search", query
+    elif author is not None:
+        suffix, params["author"], params["resolve"] = "/mail/byauthor", author, "1"
+    elif email is not None:
+        suffix, params["email"], params["resolve"] = "/mail/byemail", email, "1"
+    else:
+        suffix = "/mail"
+    path = f"/lists/{urllib.parse.quote(list_name)}{suffix}" if list_name else suffix
+    if from_date:
+        params["from"] = from_date
+    if to_date:
+        params["to"] = to_date
+    target = min(MAX_COLLECT_RESULTS, max(1, max_results))
+
+    def fetch_page(page_cursor: str | None, remaining: int) -> asyncio.Task:
+        # pages end at max_results, so the cursor returned after reaching it is exact
+        limit = str(min(100, remaining))
+        return asyncio.create_task(_api_query(path, {**params, "limit": limit, "cursor": page_cursor}))
+
+    items: list[dict[str, Any]] = []
+    seen: set[tuple[str, str, str]] = set()
+    used = 0
+    page_cursor = cursor
+    resume: str | None = None
+    stopped = ""
+    page = fetch_page(page_cursor, target)
+    while page is not None:
+        data = await page
+        page = None
+        next_cursor = data.get("cursor")
+        raw_items = []
+        for m in data.get("items") or []:
+            ref = (m.get("list", ""), m.get("month", ""), m.get("id", ""))
+            if ref not in seen:
+                seen.add(ref)
+                raw_items.append(m)
+        if next_cursor and len(items) + len(raw_items) < target:
+            # the next page is in flight while this one's bodies are fetched
+            page = fetch_page(next_cursor, target - len(items) - len(raw_items))
+        for i in range(0, len(raw_items), BODY_FETCH_CHUNK):
+            chunk = raw_items[i:i + BODY_FETCH_CHUNK]
+            bodies = []
+            if include_content:
+                bodies = [_shape_body(b) for b in
+                          await _fetch_mail_bodies([(m["list"], m["month"], m["id"]) for m in chunk])]
+            for j, m in enumerate(chunk):
+                entry = _format_entry(m)
+                if j < len(bodies) and bodies[j]:
+                    entry["content"] = bodies[j]
+                size = len(json.dumps(entry, separators=(",", ":")))
+                if len(items) >= target:
+                    stopped = "max_results"
+                elif items and used + size > max_chars:
+                    stopped = "max_chars"
+                else:
+                    items.append(entry)
+                    used += size
+                    continue
+                resume = page_cursor
+                break
+            if stopped:
+                break
+        if stopped:
+            if page is not None:
+                page.cancel()
+            break
+        page_cursor = resume = next_cursor
+    out: dict[str, Any] = {"items": items, "count": len(items)}
+    if resume:
+        out["cursor"] = resume
+    if stopped == "max_chars":
+        out["message"] = ("Stopped at the max_chars budget; continue with cursor." if resume else
+                          "Stopped at the max_chars budget within the first page; narrow the date range or list.")
+    elif not items:
+        out["message"] = "No matching mail found."
+    return json.dumps(out, separators=(",", ":"))
+
+
 @mcp.tool()
 async def openjdk_mail_status() -> str:
     """Get OpenJDK mail index status (last check and last update timestamps). Returns JSON."""
@@ -260,11 +860,13 @@ async def openjdk_mail_status() -> str:
 
 @mcp.tool()
 async def openjdk_mail_get_content(
-    list_name: str, month: str, message_ids: list[str]
+    list_name: str, month: str, message_ids: list[str], max_tokens: int | None = None, full: bool = False
 ) -> str:
-    """Get the raw text body of OpenJDK mailing list message(s) from mail.openjdk.org.
+    """Get the text body of OpenJDK mailing list message(s). Quoted replies and patches are collapsed into
+    one-line summaries and each body is cut to about max_tokens (default 1500); set full=True for the
+    complete text, e.g. to read a patch.
     Returns JSON: { "items": [ {"id": "...", "content": "..." }, ... ] }.
-    At most 5 IDs are fetched (same cap as include_content_max in search/latest tools).
+    At most 50 IDs are fetched, within the same ~200K character budget as include_content_max in search/latest.
 
     The search/latest/by-author/by-email tools return only metadata (list, month, id, date,
     author, email, subject). Use this tool when you need the full message content.
@@ -273,13 +875,16 @@ async def openjdk_mail_get_content(
     ids = message_ids[:MAX_INCLUDE_CONTENT]
     if not ids:
         return json.dumps({"items": [], "message": "No message IDs provided."}, separators=(",", ":"))
-    tasks = [_fetch_mail_body(list_name, month, mid) for mid in ids]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    items: list[dict[str, Any]] = []
-    for i, r in enumerate(results):
-        content = f"(Failed to fetch content: {r!s})" if isinstance(r, Exception) else r
-        items.append({"id": ids[i], "content": content})
-    return json.dumps({"items": items}, separators=(",", ":"))
+    contents = await _fetch_bodies_within_budget(
+        [(list_name, month, mid) for mid in ids],
+        shape=not full,
+        max_chars=max_tokens * CHARS_PER_TOKEN if max_tokens else None,
+    )
+    items: list[dict[str, Any]] = [{"id": mid, "content": content} for mid, content in zip(ids, contents)]
+    out: dict[str, Any] = {"items": items}
+    if len(contents) < len(ids):
+        out["message"] = f"Response size budget reached; request the remaining {len(ids) - len(contents)} IDs separately."
+    return json.dumps(out, separators=(",", ":"))
 
 
 def main() -> None:
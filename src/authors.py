@@ -0,0 +1,115 @@
+import json
+import math
+import zlib
+from collections import Counter
+from typing import NamedTuple
+
+import query
+
+ARTIFACT_POINTER = 'authors/directory.json'
+
+MIN_CONTAINMENT = 0.5  # fraction of the query trigrams a key must contain to be a match
+RESOLVE_MIN_SCORE = 0.75
+
+
+class Author(NamedTuple):
+    authorkey: str
+    emailkey: str
+    author: str
+    email: str
+    count: int
+
+
+def trigrams(key):
+    padded = f'${key}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AuthorDirectory:
+    """Distinct (authorkey, emailkey) pairs with message counts and a character-trigram index over both keys.
+
+    Keys are indexer.normalize values, so 'B. Goetz' becomes 'bgoetz' and still shares most trigrams with
+    'briangoetz'. Matches are scored mostly by how much of the query the key contains, then by trigram
+    similarity and by message count, so a prolific author ranks above a namesake who posted once.
+    """
+
+    def __init__(self, entries: list[Author], postings: dict[str, list[int]], version=''):
+        self.entries = entries
+        self.postings = postings  # trigram -> entry * 2 + field, field 0 is authorkey and 1 is emailkey
+        self.version = version
+        self.by_author = {}
+        self.by_email = {}
+        self.log_max_count = math.log1p(max((e.count for e in entries), default=1))
+        for i, e in enumerate(entries):
+            self.by_author.setdefault(e.authorkey, i)
+            self.by_email.setdefault(e.emailkey, i)
+
+    @staticmethod
+    def build(entries, version=''):
+        entries = sorted(entries, key=lambda e: (-e.count, e.authorkey, e.emailkey))
+        postings = {}
+        for i, e in enumerate(entries):
+            for field, key in enumerate((e.authorkey, e.emailkey)):
+                for t in trigrams(key):
+                    postings.setdefault(t, []).append(i * 2 + field)
+        return AuthorDirectory(entries, postings, version)
+
+    def to_bytes(self):
+        doc = {'version': self.version, 'entries': self.entries, 'postings': self.postings}
+        return zlib.compress(json.dumps(doc, separators=(',', ':')).encode('utf-8'))
+
+    @staticmethod
+    def from_bytes(data):
+        doc = json.loads(zlib.decompress(data))
+        return AuthorDirectory([Author(*e) for e in doc['entries']], doc['postings'], doc['version'])
+
+    def search(self, q, limit=10):
+        key = query.normalize(q)
+        grams = trigrams(key) if key else set()
+        hits = Counter()
+        for t in grams:
+            hits.update(self.postings.get(t, ()))
+        scores = {}
+        for posting, n in hits.items():
+            containment = n / len(grams)
+            if containment < MIN_CONTAINMENT:
+                continue
+            i, field = divmod(posting, 2)
+            e = self.entries[i]
+            target = e.emailkey if field else e.authorkey
+            similarity = n / (len(grams) + len(trigrams(target)) - n)
+            popularity = math.log1p(e.count) / self.log_max_count if self.log_max_count else 0.0
+            score = 0.7 * containment + 0.2 * similarity + 0.1 * popularity
+            if score > scores.get(i, 0.0):
+                scores[i] = score
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], -self.entries[kv[0]].count, kv[0]))
+        return [(self.entries[i], round(score, 3)) for i, score in ranked[:limit]]
+
+    def resolve_author(self, authorkey):
+        # exact keys win; otherwise the best sufficiently close match, by whichever field matched
+        if authorkey in self.by_author:
+            return authorkey
+        best = self.search(authorkey, 1)
+        return best[0][0].authorkey if best and best[0][1] >= RESOLVE_MIN_SCORE else authorkey
+
+    def resolve_email(self, emailkey):
+        if emailkey in self.by_email:
+            return emailkey
+        best = self.search(emailkey, 1)
+        return best[0][0].emailkey if best and best[0][1] >= RESOLVE_MIN_SCORE else emailkey
+
+
+def publish(store, directory: AuthorDirectory):
+    key = f'authors/directory-{directory.version}.json.z'
+    store.put(key, directory.to_bytes())
+    pointer = {'version': directory.version, 'key': key, 'entries': len(directory.entries)}
+    store.put(ARTIFACT_POINTER, json.dumps(pointer).encode('utf-8'), 'application/json')
+    return key
+
+
+def load(store):
+    pointer = store.get(ARTIFACT_POINTER)
+    if pointer is None:
+        return None
+    data = store.get(json.loads(pointer)['key'])
+    return AuthorDirectory.from_bytes(data) if data is not None else None
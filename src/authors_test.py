@@ -0,0 +1,34 @@
+import unittest
+
+from authors import Author, AuthorDirectory
+
+ENTRIES = [
+    Author('briangoetz', 'briangoetzoraclecom', 'Brian Goetz', 'brian.goetz@oracle.com', 1200),
+    Author('brianburkhalter', 'brianburkhalteroraclecom', 'Brian Burkhalter', 'brian.burkhalter@oracle.com', 900),
+    Author('rongoetz', 'rongoetzexamplecom', 'Ron Goetz', 'ron@example.com', 3),
+    Author('alanbateman', 'alanbatemanoraclecom', 'Alan Bateman', 'alan.bateman@oracle.com', 2000),
+]
+
+
+class TestAuthorDirectory(unittest.TestCase):
+    def setUp(self):
+        self.directory = AuthorDirectory.from_bytes(AuthorDirectory.build(ENTRIES, 'v1').to_bytes())
+
+    def test_search(self):
+        self.assertEqual(self.directory.version, 'v1')
+        self.assertEqual([a.author for a, _ in self.directory.search('goetz')], ['Brian Goetz', 'Ron Goetz'])
+        self.assertEqual(self.directory.search('B. Goetz')[0][0].author, 'Brian Goetz')
+        self.assertEqual(self.directory.search('Brian Goetz')[0][0].author, 'Brian Goetz')
+        self.assertEqual(self.directory.search('alan.bateman@oracle.com')[0][0].author, 'Alan Bateman')
+        self.assertEqual(self.directory.search('zzz'), [])
+        self.assertEqual(self.directory.search(''), [])
+
+    def test_resolve(self):
+        self.assertEqual(self.directory.resolve_author('briangoetz'), 'briangoetz')
+        self.assertEqual(self.directory.resolve_author('briangoets'), 'briangoetz')
+        self.assertEqual(self.directory.resolve_author('unknown'), 'unknown')
+        self.assertEqual(self.directory.resolve_email('alanbatemanoracle'), 'alanbatemanoraclecom')
+
+
+if __name__ == '__main__':
+    unittest.main()
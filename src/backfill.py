@@ -0,0 +1,262 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import batched
+from typing import NamedTuple
+
+import database
+import mail
+import metrics
+import params
+import task
+import updater
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 600  # a shard whose worker stops renewing for this long is handed out again
+BUSY_TIMEOUT = 30  # seconds a process waits for another's write transaction
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS shards (
+    list TEXT NOT NULL,
+    month TEXT NOT NULL,
+    month_key INTEGER NOT NULL,  -- year * 12 + month, orders shards by calendar across lists
+    state TEXT NOT NULL DEFAULT 'pending',  -- pending, leased, done
+    owner TEXT,
+    lease_expires REAL,
+    checkpoint TEXT NOT NULL DEFAULT '',  -- id of the last mail processed in the month
+    mails INTEGER NOT NULL DEFAULT 0,
+    updated REAL,
+    PRIMARY KEY (list, month)
+);
+'''
+
+
+def month_key(month):
+    # archive months are named like 2025-February
+    dt = datetime.strptime(month, '%Y-%B')
+    return dt.year * 12 + dt.month - 1
+
+
+class Shard(NamedTuple):
+    list: str
+    month: str
+    checkpoint: str
+
+
+class Coordinator:
+    # hands out (list, month) shards under leases; a SQLite file stands in for a shared backend, so workers on one
+    # host (or hosts sharing the file system) coordinate through it
+    def __init__(self, path, lease_seconds=LEASE_SECONDS):
+        self.lease_seconds = lease_seconds
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.executescript(SCHEMA)
+
+    def _write(self, sql, args=()):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            cur = self.conn.execute(sql, args)
+            self.conn.execute('COMMIT')
+            return cur.rowcount
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def add_shards(self, list_name, months):
+        # planning again keeps the progress of known shards and adds new months
+        self.conn.execute('BEGIN IMMEDIATE')
+        self.conn.executemany('INSERT OR IGNORE INTO shards (list, month, month_key) VALUES (?, ?, ?)',
+                              [(list_name, month, month_key(month)) for month in months])
+        self.conn.execute('COMMIT')
+
+    def acquire(self, owner, now=None):
+        # newest months of all lists first, so recent mail is searchable early; expired leases are taken over with
+        # their checkpoint
+        now = time.time() if now is None else now
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute(
+                "SELECT list, month, checkpoint FROM shards "
+                "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY month_key DESC, list LIMIT 1", (now,)).fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE shards SET state = 'leased', owner = ?, lease_expires = ?, updated = ? "
+                    "WHERE list = ? AND month = ?", (owner, now + self.lease_seconds, now, row[0], row[1]))
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return Shard(*row) if row else None
+
+    def renew(self, shard: Shard, owner, now=None):
+        # extends the lease; False when it was lost
+        now = time.time() if now is None else now
+        return self._write(
+            "UPDATE shards SET lease_expires = ?, updated = ? "
+            "WHERE list = ? AND month = ? AND state = 'leased' AND owner = ?",
+            (now + self.lease_seconds, now, shard.list, shard.month, owner)) == 1
+
+    def checkpoint(self, shard: Shard, owner, mail_id, mails, now=None):
+        # records progress and renews the lease; False when the lease was lost, the worker must then stop
+        now = time.time() if now is None else now
+        return self._write(
+            "UPDATE shards SET checkpoint = ?, mails = mails + ?, lease_expires = ?, updated = ? "
+            "WHERE list = ? AND month = ? AND state = 'leased' AND owner = ?",
+            (mail_id, mails, now + self.lease_seconds, now, shard.list, shard.month, owner)) == 1
+
+    def complete(self, shard: Shard, owner, now=None):
+        # returns the list checkpoint (month, id) when this was the list's last open shard, None otherwise;
+        # decided in the same transaction, so exactly one worker sees it
+        now = time.time() if now is None else now
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            done = self.conn.execute(
+                "UPDATE shards SET state = 'done', owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE list = ? AND month = ? AND state = 'leased' AND owner = ?",
+                (now, shard.list, shard.month, owner)).rowcount == 1
+            remaining = self.conn.execute("SELECT count(*) FROM shards WHERE list = ? AND state != 'done'",
+                                          (shard.list,)).fetchone()[0]
+            newest = self.conn.execute(
+                "SELECT month, checkpoint FROM shards WHERE list = ? AND checkpoint != '' ORDER BY month_key DESC LIMIT 1",
+                (shard.list,)).fetchone()
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return newest if done and not remaining else None
+
+    def progress(self):
+        # {list: {state: (shards, mails)}}
+        result = {}
+        for list_name, state, shards, mails in self.conn.execute(
+                'SELECT list, state, count(*), sum(mails) FROM shards GROUP BY list, state ORDER BY list'):
+            result.setdefault(list_name, {})[state] = (shards, mails)
+        return result
+
+
+def init_logging():
+    root = logging.getLogger()
+    if root.handlers:
+        for handler in root.handlers:
+            root.removeHandler(handler)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] <%(processName)s:%(threadName)s> %(levelname)s - %(message)s')
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Sharded backfill of whole mailing lists by (list, month)")
+    p.add_argument("command", choices=["plan", "work", "status"])
+    p.add_argument("--coordinator", default="backfill.sqlite", help="SQLite coordinator file")
+    p.add_argument("--lists", help="comma-separated lists to plan, defaults to updater.MAILING_LISTS")
+    p.add_argument("--processes", type=int, default=4)
+    p.add_argument("--db_workers", type=int, default=10)
+    p.add_argument("--mail_workers", type=int, default=10)
+    p.add_argument("--throttle_sleep", type=float, default=1.6)
+    p.add_argument("--denormalize_terms", action="store_true")
+    p.add_argument("--term_stats", action="store_true")
+    p.add_argument("--author_counts", action="store_true")
+    p.add_argument("--store_bodies", action="store_true")
+    p.add_argument("--term_df", help="frequency table from mine_stops.py --df_out, enables idf term selection")
+    p.add_argument("--max_terms", type=int)
+    p.add_argument("--metrics", choices=["emf", "prometheus"], help="emit metrics after each batch")
+    p.add_argument("--metrics_file", default="backfill.prom", help="Prometheus text file, suffixed by the worker pid")
+    return p.parse_args()
+
+
+def plan(coordinator, lists):
+    session = mail.http_session(1)
+    for list_name in lists:
+        ml = mail.MailingList(session, list_name, mail.Checkpoint('', ''))
+        months = [url.split('/')[-2] for url in ml.fetch_month_urls()]
+        coordinator.add_shards(list_name, months)
+        logger.info(f'planned list, list={list_name}, months={len(months)}')
+
+
+def process_shard(coordinator, owner, shard: Shard, ml, db, executor, args, index_params):
+    mail_urls = ml.fetch_mail_urls(f'{ml.url}/{shard.month}/date.html')
+    if shard.checkpoint:
+        mail_urls = mail_urls[mail_urls.index(f'{ml.url}/{shard.month}/{shard.checkpoint}.html') + 1:]
+
+    def fn(mail_url):
+        return task.process_mail(ml, db, mail_url, index_params)
+
+    for batch in batched(mail_urls, args.mail_workers):
+        db.bump_terms_epoch()  # invalidates the published Bloom filter, see rebuild_bloom.py
+        mails = list(executor.map(fn, batch))
+        # a worker that took the shard over processes these mails again, so their counts must not be flushed here;
+        # the renewed lease outlasts the flush and checkpoint below
+        if not coordinator.renew(shard, owner):
+            logger.warning(f'lease lost, list={shard.list}, month={shard.month}')
+            metrics.count('backfill.lease_lost')
+            db.discard_counts()
+            return False
+        if args.term_stats:
+            keys = db.flush_term_stats()
+            logger.info(f'flushed term stats, keys={keys}')
+        if args.author_counts:
+            keys = db.flush_author_counts()
+            logger.info(f'flushed author counts, keys={keys}')
+        if not coordinator.checkpoint(shard, owner, mails[-1].id, len(mails)):
+            logger.warning(f'lease lost, list={shard.list}, month={shard.month}')
+            metrics.count('backfill.lease_lost')
+            return False
+        metrics.flush(args.metrics, {'Service': 'backfill', 'List': shard.list},
+                      f'{args.metrics_file}.{os.getpid()}')
+        time.sleep(args.throttle_sleep)
+    return True
+
+
+def work(args):
+    # one worker process: takes shards until none are left
+    init_logging()
+    index_params = params.idf_params(args.term_df, args.max_terms) if args.term_df else params.DEFAULT_PARAMS
+    owner = f'{socket.gethostname()}:{os.getpid()}'
+    coordinator = Coordinator(args.coordinator)
+    db = database.Database(args.db_workers, denormalize_terms=args.denormalize_terms, term_stats=args.term_stats,
+                           author_counts=args.author_counts, store_bodies=args.store_bodies)
+    session = mail.http_session(args.mail_workers)
+    executor = ThreadPoolExecutor(max_workers=args.mail_workers)
+    while shard := coordinator.acquire(owner):
+        logger.info(f'leased shard, list={shard.list}, month={shard.month}, checkpoint={shard.checkpoint}')
+        ml = mail.MailingList(session, shard.list, mail.Checkpoint(shard.month, shard.checkpoint))
+        if not process_shard(coordinator, owner, shard, ml, db, executor, args, index_params):
+            continue
+        newest = coordinator.complete(shard, owner)
+        metrics.count('backfill.shards')
+        logger.info(f'completed shard, list={shard.list}, month={shard.month}')
+        if newest:
+            # the whole list is indexed, the updater continues from its newest mail
+            db.put_checkpoint(shard.list, *newest)
+            logger.info(f'completed list, list={shard.list}, checkpoint={newest}')
+    db.bump_terms_epoch()  # again after the last batch, for a filter rebuilt while it was written
+
+
+def main():
+    init_logging()
+    args = parse_args()
+    logger.info(args)
+    if args.command == 'plan':
+        plan(Coordinator(args.coordinator), args.lists.split(',') if args.lists else updater.MAILING_LISTS)
+    elif args.command == 'work':
+        processes = [multiprocessing.Process(target=work, args=(args,), name=f'worker-{i}')
+                     for i in range(args.processes)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+    for list_name, states in Coordinator(args.coordinator).progress().items():
+        logger.info(f'progress, list={list_name}, ' + ', '.join(
+            f'{state}={shards} shards/{mails} mails' for state, (shards, mails) in sorted(states.items())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+import backfill
+
+
+class TestCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'backfill.sqlite')
+        self.coordinator = backfill.Coordinator(self.path, lease_seconds=60)
+        self.coordinator.add_shards('net-dev', ['2025-January', '2025-February'])
+
+    def tearDown(self):
+        self.coordinator.conn.close()
+        self.dir.cleanup()
+
+    def test_acquire_newest_first(self):
+        self.assertEqual(self.coordinator.acquire('a', now=0), backfill.Shard('net-dev', '2025-February', ''))
+        self.assertEqual(self.coordinator.acquire('b', now=0), backfill.Shard('net-dev', '2025-January', ''))
+        self.assertIsNone(self.coordinator.acquire('c', now=0))
+
+    def test_acquire_by_calendar_across_lists(self):
+        # a long archive's months do not jump ahead of another list's newer ones
+        self.coordinator.add_shards('jdk-dev', [f'{year}-March' for year in range(2007, 2021)])
+        order = [self.coordinator.acquire('a', now=0)[:2] for _ in range(4)]
+        self.assertEqual(order, [('net-dev', '2025-February'), ('net-dev', '2025-January'),
+                                 ('jdk-dev', '2020-March'), ('jdk-dev', '2019-March')])
+        self.assertEqual(backfill.month_key('2025-January') + 1, backfill.month_key('2025-February'))
+        self.assertEqual(backfill.month_key('2024-December') + 1, backfill.month_key('2025-January'))
+
+    def test_expired_lease_resumes_from_checkpoint(self):
+        shard = self.coordinator.acquire('a', now=0)
+        self.assertTrue(self.coordinator.renew(shard, 'a', now=20))
+        self.assertTrue(self.coordinator.checkpoint(shard, 'a', '025750', 10, now=30))
+        self.coordinator.acquire('b', now=30)
+        self.assertIsNone(self.coordinator.acquire('c', now=89))  # renewed at 30, expires at 90
+
+        other = backfill.Coordinator(self.path)  # another process
+        taken = other.acquire('c', now=91)
+        other.conn.close()
+        self.assertEqual(taken, backfill.Shard('net-dev', '2025-February', '025750'))
+        self.assertFalse(self.coordinator.renew(shard, 'a', now=92))
+        self.assertFalse(self.coordinator.checkpoint(shard, 'a', '025760', 10, now=92))
+        self.assertIsNone(self.coordinator.complete(shard, 'a', now=92))
+
+    def test_list_checkpoint_after_last_shard(self):
+        february = self.coordinator.acquire('a', now=0)
+        january = self.coordinator.acquire('b', now=0)
+        self.coordinator.checkpoint(february, 'a', '025800', 5, now=1)
+        self.assertIsNone(self.coordinator.complete(february, 'a', now=2))
+        self.coordinator.checkpoint(january, 'b', '025700', 7, now=3)
+        self.assertEqual(self.coordinator.complete(january, 'b', now=4), ('2025-February', '025800'))
+        self.assertEqual(self.coordinator.progress(), {'net-dev': {'done': (2, 12)}})
+
+        # planning again keeps finished shards and adds the new month
+        self.coordinator.add_shards('net-dev', ['2025-January', '2025-February', '2025-March'])
+        self.assertEqual(self.coordinator.acquire('a', now=5), backfill.Shard('net-dev', '2025-March', ''))
+        self.assertIsNone(self.coordinator.acquire('a', now=5))
+
+
+if __name__ == '__main__':
+    unittest.main()
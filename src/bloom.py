@@ -0,0 +1,113 @@
+import hashlib
+import json
+import math
+import struct
+import threading
+
+MAGIC = b'BLM1'
+HEADER = struct.Struct('>4sBQQH')  # magic, k, m, count, version length
+
+ARTIFACT_POINTER = 'bloom/terms.json'
+DIGEST_SIZE = 16
+
+
+def digest(key):
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+
+class BloomFilter:
+    def __init__(self, m, k, count=0, bits=None, version=''):
+        self.m = m  # number of bits
+        self.k = k  # number of hash functions
+        self.count = count  # number of added keys
+        self.bits = bits if bits is not None else bytearray((m + 7) // 8)
+        self.version = version
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def for_capacity(capacity, fpr):
+        m = max(8, math.ceil(-capacity * math.log(fpr) / math.log(2) ** 2))
+        k = max(1, round(m / capacity * math.log(2)))
+        return BloomFilter(m, k)
+
+    def positions(self, key_digest):
+        # Kirsch-Mitzenmacher double hashing over one 128-bit digest
+        h1, h2 = struct.unpack('>QQ', key_digest)
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def add(self, key):
+        self.add_digest(digest(key))
+
+    def add_digest(self, key_digest):
+        positions = self.positions(key_digest)
+        with self.lock:
+            for p in positions:
+                self.bits[p >> 3] |= 1 << (p & 7)
+            self.count += 1
+
+    def contains_digest(self, key_digest):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self.positions(key_digest))
+
+    def __contains__(self, key):
+        return self.contains_digest(digest(key))
+
+    def fill_ratio(self):
+        return int.from_bytes(self.bits, 'big').bit_count() / self.m
+
+    def expected_fpr(self):
+        # theoretical rate for the number of added keys
+        return (1 - math.exp(-self.k * self.count / self.m)) ** self.k
+
+    def observed_fpr(self):
+        # rate implied by the bits actually set, accounts for duplicate adds
+        return self.fill_ratio() ** self.k
+
+    def to_bytes(self):
+        version = self.version.encode('utf-8')
+        return HEADER.pack(MAGIC, self.k, self.m, self.count, len(version)) + version + bytes(self.bits)
+
+    @staticmethod
+    def from_bytes(data):
+        magic, k, m, count, version_len = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f'not a bloom filter artifact, magic={magic}')
+        start = HEADER.size + version_len
+        version = data[HEADER.size:start].decode('utf-8')
+        return BloomFilter(m, k, count, bytearray(memoryview(data)[start:]), version)
+
+
+def term_keys(list_name, terms):
+    # both access paths of openjdk-mail-terms: the list_term partition key and the term_date GSI key
+    for term_array in terms:
+        joined_term = '|'.join(term_array)
+        yield f'{list_name}/{joined_term}'
+        yield joined_term
+
+
+def add_terms(bf: BloomFilter, list_name, terms):
+    for key in term_keys(list_name, terms):
+        bf.add(key)
+
+
+def publish(store, bf: BloomFilter):
+    key = f'bloom/terms-{bf.version}.bloom'
+    store.put(key, bf.to_bytes())
+    pointer = {
+        'version': bf.version,
+        'key': key,
+        'm': bf.m,
+        'k': bf.k,
+        'count': bf.count,
+        'expected_fpr': bf.expected_fpr()
+    }
+    store.put(ARTIFACT_POINTER, json.dumps(pointer).encode('utf-8'), 'application/json')
+    return key
+
+
+def load(store):
+    pointer = store.get(ARTIFACT_POINTER)
+    if pointer is None:
+        return None
+    data = store.get(json.loads(pointer)['key'])
+    return BloomFilter.from_bytes(data) if data is not None else None
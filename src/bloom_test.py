@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+
+import bloom
+import rebuild_bloom
+from bloom import BloomFilter
+from store import LocalStore
+
+
+class TestBloom(unittest.TestCase):
+    def test_membership(self):
+        bf = BloomFilter.for_capacity(1000, 0.01)
+        keys = [f'term{i}' for i in range(1000)]
+        for key in keys:
+            bf.add(key)
+        self.assertTrue(all(key in bf for key in keys))
+        false_positives = sum(1 for i in range(10_000) if f'absent{i}' in bf)
+        self.assertLess(false_positives / 10_000, 0.03)
+        self.assertAlmostEqual(bf.expected_fpr(), 0.01, delta=0.005)
+
+    def test_round_trip(self):
+        bf = BloomFilter.for_capacity(100, 0.01)
+        bf.version = '2025-08-24T20:07:24Z'
+        bloom.add_terms(bf, 'net-dev', [['ssl'], ['ssl', 'socket']])
+        copy = BloomFilter.from_bytes(bf.to_bytes())
+        self.assertEqual((copy.m, copy.k, copy.count, copy.version), (bf.m, bf.k, 4, bf.version))
+        for key in ['net-dev/ssl', 'ssl', 'net-dev/ssl|socket', 'ssl|socket']:
+            self.assertIn(key, copy)
+        self.assertNotIn('loom-dev/ssl', copy)
+        with self.assertRaises(ValueError):
+            BloomFilter.from_bytes(b'XXXX' + bf.to_bytes()[4:])
+
+    def test_publish_and_load(self):
+        with tempfile.TemporaryDirectory() as root:
+            artifacts = LocalStore(root)
+            self.assertIsNone(bloom.load(artifacts))
+            bf = BloomFilter.for_capacity(10, 0.01)
+            bf.version = 'v1'
+            bf.add('valhalla')
+            self.assertEqual(bloom.publish(artifacts, bf), 'bloom/terms-v1.bloom')
+            loaded = bloom.load(artifacts)
+            self.assertEqual(loaded.version, 'v1')
+            self.assertIn('valhalla', loaded)
+
+    def test_rebuild_sized_by_distinct_keys(self):
+        class FakeDatabase:
+            epoch = 4
+
+            def bump_terms_epoch(self):
+                self.epoch += 1
+                return str(self.epoch)
+
+            def scan(self, table, projection, segment, total_segments):
+                # one posting item per mail, the items of a partition returned together
+                for list_term in ['net-dev/ssl', 'loom-dev/ssl', 'net-dev/http']:
+                    for _ in range(1000):
+                        yield {'p': {'S': list_term}}
+
+        bf, scanned = rebuild_bloom.rebuild(FakeDatabase(), None, 0.01, 1)
+        self.assertEqual((scanned, bf.version, bf.count), (3000, '5', 5))
+        self.assertEqual(bf.m, BloomFilter.for_capacity(6, 0.01).m)
+        for key in ['net-dev/ssl', 'ssl', 'loom-dev/ssl', 'net-dev/http', 'http']:
+            self.assertIn(key, bf)
+
+
+if __name__ == '__main__':
+    unittest.main()
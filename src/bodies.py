@@ -0,0 +1,50 @@
+import zlib
+
+import query
+
+MAX_BODY_BYTES = 350_000  # compressed, leaves headroom under the 400KB DynamoDB item limit
+SNIPPET_CONTEXT = 80  # characters kept on each side of a match
+MAX_SNIPPETS = 3
+
+
+def compress(body: str):
+    data = zlib.compress(body.encode('utf-8'), 6)
+    if len(data) > MAX_BODY_BYTES:
+        # rare multi-megabyte patches; keep the head, which is where the discussion is
+        head = body.encode('utf-8')[:MAX_BODY_BYTES].decode('utf-8', errors='ignore')
+        data = zlib.compress(head.encode('utf-8'), 9)
+    return data
+
+
+def decompress(data: bytes):
+    return zlib.decompress(data).decode('utf-8')
+
+
+def find_matches(text, q):
+    # character offsets of the query phrase in text, matched on normalized tokens like the index;
+    # falls back to the individual tokens when the phrase does not occur
+    wanted = query.tokens(q)
+    if not wanted:
+        return []
+    spans = list(query.token_spans(text))
+    n = len(wanted)
+    phrase = [(spans[i][1], spans[i + n - 1][2]) for i in range(len(spans) - n + 1)
+              if all(spans[i + j][0] == wanted[j] for j in range(n))]
+    if phrase or n == 1:
+        return phrase
+    words = set(wanted)
+    return [(start, end) for t, start, end in spans if t in words]
+
+
+def snippets(text, matches, limit=MAX_SNIPPETS, context=SNIPPET_CONTEXT):
+    # windows around the first matches, merged when they overlap
+    windows = []
+    for start, end in matches:
+        lo, hi = max(0, start - context), min(len(text), end + context)
+        if windows and lo <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], hi)
+        elif len(windows) < limit:
+            windows.append([lo, hi])
+        else:
+            break
+    return [{'start': lo, 'end': hi, 'text': text[lo:hi]} for lo, hi in windows]
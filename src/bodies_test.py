@@ -0,0 +1,43 @@
+import unittest
+
+import bodies
+
+BODY = '''Hi all,
+
+Virtual threads are now pinned less often. The state of the
+virtual-thread scheduler is described in JEP 491.
+
+Thanks,
+Alan
+'''
+
+
+class TestBodies(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(bodies.decompress(bodies.compress(BODY)), BODY)
+        big = 'é' * bodies.MAX_BODY_BYTES * 4
+        self.assertLessEqual(len(bodies.compress(big)), bodies.MAX_BODY_BYTES)
+
+    def test_find_matches(self):
+        start, end = bodies.find_matches(BODY, 'virtual threads')[0]
+        self.assertEqual(BODY[start:end], 'Virtual threads')
+        # 'of the' are stop words, so the phrase spans them like the index does
+        (start, end), = bodies.find_matches(BODY, 'state of the virtual-thread')
+        self.assertEqual(BODY[start:end], 'state of the\nvirtual-thread')
+        # no phrase match, individual tokens instead
+        self.assertEqual([BODY[s:e] for s, e in bodies.find_matches(BODY, 'jep scheduler')],
+                         ['scheduler', 'JEP'])
+        self.assertEqual(bodies.find_matches(BODY, 'the'), [])
+
+    def test_snippets(self):
+        matches = bodies.find_matches(BODY, 'virtual scheduler')
+        self.assertEqual(len(matches), 2)
+        s, = bodies.snippets(BODY, matches, context=40)
+        self.assertEqual(BODY[s['start']:s['end']], s['text'])
+        self.assertIn('Virtual threads', s['text'])
+        self.assertEqual(len(bodies.snippets(BODY, matches, context=5)), 2)
+        self.assertEqual(len(bodies.snippets(BODY, matches, limit=1, context=5)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import authors
+import database
+import store
+
+logger = logging.getLogger(__name__)
+
+
+def init_logging():
+    root = logging.getLogger()
+    if root.handlers:
+        for handler in root.handlers:
+            root.removeHandler(handler)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] <%(threadName)s> %(levelname)s - %(message)s')
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Build the fuzzy author directory from author message counts")
+    p.add_argument("--store", required=True, help="s3://bucket/prefix or a local directory")
+    p.add_argument("--segments", type=int, default=4)
+    p.add_argument("--dry_run", action="store_true")
+    return p.parse_args()
+
+
+def main():
+    init_logging()
+    args = parse_args()
+    logger.info(args)
+    db = database.Database(workers=0)
+    version = db.get_last_update() or db.now()
+    with ThreadPoolExecutor(max_workers=args.segments) as executor:
+        parts = executor.map(lambda s: list(db.scan_authors(s, args.segments)), range(args.segments))
+        entries = [authors.Author(*a) for part in parts for a in part]
+    directory = authors.AuthorDirectory.build(entries, version)
+    data = directory.to_bytes()
+    logger.info(f'built directory, entries={len(entries)}, trigrams={len(directory.postings)}, '
+                f'size={len(data) / 1024:.0f}KiB, version={version}')
+    for q in ('goetz', 'B. Goetz', 'bateman'):
+        start = time.perf_counter()
+        top = directory.search(q, 3)
+        logger.info(f'sample, q={q}, ms={(time.perf_counter() - start) * 1e3:.2f}, '
+                    f'top={[(a.author, a.email, score) for a, score in top]}')
+    if not args.dry_run:
+        key = authors.publish(store.open_store(args.store), directory)
+        logger.info(f'published directory, key={key}')
+
+
+if __name__ == '__main__':
+    main()
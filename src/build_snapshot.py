@@ -0,0 +1,86 @@
+import argparse
+import logging
+import queue
+import threading
+
+import database
+import snapshot
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+
+def init_logging():
+    root = logging.getLogger()
+    if root.handlers:
+        for handler in root.handlers:
+            root.removeHandler(handler)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] <%(threadName)s> %(levelname)s - %(message)s')
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Build an offline SQLite snapshot of mail records and term postings")
+    p.add_argument("--out", required=True, help="snapshot file, replaced atomically when complete")
+    p.add_argument("--lists", help="comma-separated lists to include, defaults to all")
+    p.add_argument("--segments", type=int, default=8)
+    return p.parse_args()
+
+
+def scan_batches(db, table, projection, segments, names=None):
+    # parallel scan segments feed one consumer, since the snapshot has a single writer
+    batches = queue.Queue(maxsize=segments * 2)
+
+    def scan_segment(segment):
+        try:
+            batch = []
+            for item in db.scan(table, projection, segment, segments, names):
+                batch.append(item)
+                if len(batch) == BATCH_SIZE:
+                    batches.put(batch)
+                    batch = []
+            batches.put(batch)
+        except Exception as e:
+            batches.put(e)
+        finally:
+            batches.put(None)
+
+    for segment in range(segments):
+        threading.Thread(target=scan_segment, args=(segment,), name=f'scan-{segment}', daemon=True).start()
+    done = 0
+    while done < segments:
+        batch = batches.get()
+        if batch is None:
+            done += 1
+        elif isinstance(batch, Exception):
+            raise batch
+        else:
+            yield batch
+
+
+def main():
+    init_logging()
+    args = parse_args()
+    logger.info(args)
+    db = database.Database(workers=0)
+    # read first so the snapshot never claims to be newer than what it contains
+    last_update = db.get_last_update() or db.now()
+    built = db.now()
+    writer = snapshot.SnapshotWriter(args.out, args.lists.split(',') if args.lists else None)
+    projection, names = snapshot.record_projection()
+    for batch in scan_batches(db, database.TABLE_RECORDS, projection, args.segments, names):
+        writer.add_records(batch)
+    logger.info(f'scanned records, mails={writer.mails}')
+    for batch in scan_batches(db, database.TABLE_TERMS, 'p, s', args.segments):
+        writer.add_terms(batch)
+        if writer.terms // 1_000_000 != (writer.terms - len(batch)) // 1_000_000:
+            logger.info(f'scanning terms, postings={writer.terms}')
+    meta = writer.finish(last_update, built)
+    logger.info(f'built snapshot, path={args.out}, mails={writer.mails}, postings={writer.terms}, '
+                f'lists={len(meta["lists"])}, last_update={last_update}')
+
+
+if __name__ == '__main__':
+    main()
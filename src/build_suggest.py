@@ -0,0 +1,90 @@
+import argparse
+import heapq
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import store
+import suggest
+
+logger = logging.getLogger(__name__)
+
+
+def init_logging():
+    root = logging.getLogger()
+    if root.handlers:
+        for handler in root.handlers:
+            root.removeHandler(handler)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] <%(threadName)s> %(levelname)s - %(message)s')
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Build the prefix suggestion artifact from term document frequencies")
+    p.add_argument("--store", required=True, help="s3://bucket/prefix or a local directory")
+    p.add_argument("--df", help="mine_stops.py --df_out JSON, defaults to scanning the term stats table")
+    p.add_argument("--min_df", type=int, default=3, help="drops rare terms, mostly typos and identifiers")
+    p.add_argument("--max_terms", type=int, default=2_000_000)
+    p.add_argument("--segments", type=int, default=8)
+    p.add_argument("--dry_run", action="store_true")
+    return p.parse_args()
+
+
+def scan_term_stats(db, segments):
+    # global keys only; list keys are 'list/term' and '/' never survives normalization
+    def scan_segment(segment):
+        df = {}
+        for item in db.scan(database.TABLE_TERM_STATS, 'p, n', segment, segments):
+            key = item['p']['S']
+            if '/' not in key and key != database.DOCS_KEY:
+                df[key] = int(item['n']['N'])
+        return df
+
+    df = {}
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        for part in executor.map(scan_segment, range(segments)):
+            df.update(part)
+    return df
+
+
+def read_df(path):
+    with open(path) as f:
+        return json.load(f)['df']
+
+
+def select(df, min_df, max_terms):
+    kept = ((t, n) for t, n in df.items() if n >= min_df)
+    return dict(heapq.nlargest(max_terms, kept, key=lambda kv: kv[1]))
+
+
+def main():
+    init_logging()
+    args = parse_args()
+    logger.info(args)
+    if args.df:
+        df = read_df(args.df)
+        version = database.Database.now()
+    else:
+        db = database.Database(workers=0)
+        version = db.get_last_update() or db.now()
+        df = scan_term_stats(db, args.segments)
+    terms = select(df, args.min_df, args.max_terms)
+    start = time.perf_counter()
+    data = suggest.build(terms, version)
+    logger.info(f'built artifact, terms={len(terms)}, scanned={len(df)}, size={len(data) / 1024 ** 2:.1f}MiB, '
+                f'elapsed={time.perf_counter() - start:.1f}s, version={version}')
+    idx = suggest.SuggestIndex(data)
+    for prefix in ('j', 'va', 'virtual|'):
+        start = time.perf_counter()
+        top = idx.top(prefix)
+        logger.info(f'sample, prefix={prefix}, micros={(time.perf_counter() - start) * 1e6:.0f}, top={top[:3]}')
+    if not args.dry_run:
+        key = suggest.publish(store.open_store(args.store), data, version)
+        logger.info(f'published artifact, key={key}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl  # seconds, or None for no expiry
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __contains__(self, key):
+        # a live entry, without counting a hit or miss or refreshing its recency
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and (entry[1] is None or entry[1] >= time.monotonic())
+
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+
+class DynamoDBStore:
+    """Shared cache store backed by a DynamoDB table with pk `k` and a TTL attribute `x`."""
+
+    def __init__(self, client_fn, table, ttl=3600):
+        self.client_fn = client_fn  # returns a DynamoDB client, created lazily by the caller
+        self.table = table
+        self.ttl = ttl
+
+    def get(self, key):
+        res = self.client_fn().get_item(TableName=self.table, Key={'k': {'S': key}})
+        item = res.get('Item')
+        if not item or int(item['x']['N']) < time.time():
+            return None
+        return item['v']['S']
+
+    def put(self, key, value):
+        self.client_fn().put_item(
+            TableName=self.table,
+            Item={
+                'k': {'S': key},
+                'v': {'S': value},
+                'x': {'N': str(int(time.time()) + self.ttl)}
+            })
+
+
+class ResultCache:
+    """In-process LRU in front of an optional shared store; values are response body strings."""
+
+    def __init__(self, local: LRUCache, shared=None):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                print(f'shared cache get failed, error={e}')
+            if value is not None:
+                self.local.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.local.put(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, value)
+            except Exception as e:
+                print(f'shared cache put failed, error={e}')
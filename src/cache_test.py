@@ -0,0 +1,70 @@
+import unittest
+
+from cache import LRUCache, ResultCache
+
+
+class DictStore:
+    def __init__(self, fail=False):
+        self.items = {}
+        self.fail = fail
+
+    def get(self, key):
+        if self.fail:
+            raise IOError('unavailable')
+        return self.items.get(key)
+
+    def put(self, key, value):
+        if self.fail:
+            raise IOError('unavailable')
+        self.items[key] = value
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)  # b is now the oldest
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats(), {'entries': 2, 'hits': 3, 'misses': 1, 'hit_rate': 0.75})
+
+    def test_contains_does_not_touch(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertIn('a', cache)
+        self.assertNotIn('x', cache)
+        cache.put('c', 3)  # membership did not make a recent
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.stats()['hits'] + cache.stats()['misses'], 0)
+
+    def test_expiry(self):
+        cache = LRUCache(2, ttl=-1)
+        cache.put('a', 1)
+        self.assertNotIn('a', cache)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+
+class TestResultCache(unittest.TestCase):
+    def test_shared_store_fills_local(self):
+        shared = DictStore()
+        shared.items['k'] = 'body'
+        cache = ResultCache(LRUCache(2), shared)
+        self.assertEqual(cache.get('k'), 'body')
+        self.assertIn('k', cache.local)
+        cache.put('j', 'other')
+        self.assertEqual(shared.items['j'], 'other')
+
+    def test_shared_store_failure_is_a_miss(self):
+        cache = ResultCache(LRUCache(2), DictStore(fail=True))
+        cache.put('k', 'body')
+        self.assertEqual(cache.get('k'), 'body')
+        self.assertIsNone(cache.get('j'))
+
+
+if __name__ == '__main__':
+    unittest.main()
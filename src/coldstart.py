@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a fresh interpreter per sample so every measurement is a true cold start.
+# The 404 request exercises the handler without touching DynamoDB.
+PROBE = '''
+import json, time
+t0 = time.perf_counter()
+import server
+t1 = time.perf_counter()
+event = {'Records': [{'cf': {'request': {'method': 'GET', 'uri': '/api/coldstart', 'querystring': ''}}}]}
+server.lambda_handler(event, None)
+t2 = time.perf_counter()
+client_ms = None
+try:
+    server.dynamodb()
+    client_ms = (time.perf_counter() - t2) * 1000
+except ImportError:
+    pass
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'handler_ms': (t2 - t1) * 1000, 'client_ms': client_ms}))
+'''
+
+
+def sample():
+    out = subprocess.run([sys.executable, '-c', PROBE], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_profile(top):
+    # -X importtime reports cumulative microseconds per module on stderr
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import server'],
+                         cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        if cumulative_us.strip().isdigit():  # skips the header row
+            rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def summarize(samples):
+    result = {}
+    for key in ('import_ms', 'handler_ms', 'client_ms'):
+        values = sorted(s[key] for s in samples if s[key] is not None)
+        if values:
+            result[key] = {
+                'median': statistics.median(values),
+                'p90': values[min(len(values) - 1, int(len(values) * 0.9))]
+            }
+    return result
+
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    for key, stats in result.items():
+        if key in baseline:
+            limit = baseline[key]['median'] * (1 + tolerance)
+            if stats['median'] > limit:
+                regressions.append(f'{key} median={stats["median"]:.1f}ms > {limit:.1f}ms')
+    return regressions
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Cold-start benchmark for server.py")
+    p.add_argument("--runs", type=int, default=20)
+    p.add_argument("--top", type=int, default=10)
+    p.add_argument("--save")
+    p.add_argument("--baseline")
+    p.add_argument("--tolerance", type=float, default=0.25)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    result = summarize([sample() for _ in range(args.runs)])
+    for key, stats in result.items():
+        print(f'{key}: median={stats["median"]:.2f}ms, p90={stats["p90"]:.2f}ms')
+    print()
+    print('slowest imports (cumulative)')
+    for cumulative_us, name in import_profile(args.top):
+        print(f'{cumulative_us / 1000:>10.2f}ms  {name}')
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f'regression: {r}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import math
+
+# DynamoDB billing granularity
+WRITE_UNIT_BYTES = 1024
+READ_UNIT_BYTES = 4096
+EVENTUAL_READ_FACTOR = 0.5
+
+# on-demand pricing, us-west-1
+USD_PER_MILLION_WRITE_UNITS = 1.25
+USD_PER_MILLION_READ_UNITS = 0.25
+USD_PER_GB_MONTH = 0.25
+
+# representative attribute value lengths observed in openjdk-mail-records
+LIST_BYTES = 12
+TERM_BYTES = 14
+DATE_BYTES = 20
+MONTH_BYTES = 13
+ID_BYTES = 6
+RECORD_BYTES = 330  # full openjdk-mail-records item
+
+
+def term_item_bytes(author_bytes, email_bytes, subject_bytes, denormalized):
+    # item size is the sum of attribute name and value lengths
+    size = 1 + LIST_BYTES + 1 + TERM_BYTES  # p
+    size += 1 + DATE_BYTES + 1 + MONTH_BYTES + 1 + ID_BYTES  # s
+    size += 1 + DATE_BYTES  # d
+    size += 1 + TERM_BYTES  # t
+    if denormalized:
+        size += 1 + author_bytes  # a
+        size += 1 + email_bytes  # e
+        size += 1 + subject_bytes  # j
+    return size
+
+
+def write_units(item_bytes, items, gsi=True):
+    # term_date GSI projects all attributes, so each term write is replicated once
+    per_item = math.ceil(item_bytes / WRITE_UNIT_BYTES)
+    return per_item * items * (2 if gsi else 1)
+
+
+def read_units(item_bytes, items):
+    return math.ceil(item_bytes * items / READ_UNIT_BYTES) * EVENTUAL_READ_FACTOR
+
+
+def page_read_units(term_bytes, limit, denormalized):
+    units = read_units(term_bytes, limit)
+    if not denormalized:
+        # batch_get_item rounds each record up to a full read unit
+        units += limit * read_units(RECORD_BYTES, 1)
+    return units
+
+
+def page_latency(query_ms, batch_get_ms, denormalized):
+    return query_ms if denormalized else query_ms + batch_get_ms
+
+
+def report(args):
+    base_bytes = term_item_bytes(args.author_bytes, args.email_bytes, args.subject_bytes, False)
+    denorm_bytes = term_item_bytes(args.author_bytes, args.email_bytes, args.subject_bytes, True)
+    print(f'term item bytes: base={base_bytes}, denormalized={denorm_bytes}')
+    print()
+    print('writes per mail')
+    print(f'{"terms":>8} {"wu base":>10} {"wu denorm":>10} {"kb base":>10} {"kb denorm":>10} {"storage x":>10}')
+    for terms in args.terms:
+        wu_base = write_units(base_bytes, terms)
+        wu_denorm = write_units(denorm_bytes, terms)
+        kb_base = base_bytes * terms * 2 / 1024
+        kb_denorm = denorm_bytes * terms * 2 / 1024
+        print(f'{terms:>8} {wu_base:>10} {wu_denorm:>10} {kb_base:>10.1f} {kb_denorm:>10.1f} '
+              f'{kb_denorm / kb_base:>10.2f}')
+    print()
+    print('reads per search page')
+    print(f'{"limit":>8} {"ru base":>10} {"ru denorm":>10} {"ms base":>10} {"ms denorm":>10} {"trips":>10}')
+    for limit in args.limits:
+        ru_base = page_read_units(base_bytes, limit, False)
+        ru_denorm = page_read_units(denorm_bytes, limit, True)
+        ms_base = page_latency(args.query_ms, args.batch_get_ms, False)
+        ms_denorm = page_latency(args.query_ms, args.batch_get_ms, True)
+        print(f'{limit:>8} {ru_base:>10.1f} {ru_denorm:>10.1f} {ms_base:>10.1f} {ms_denorm:>10.1f} {"2 -> 1":>10}')
+    print()
+    print(f'monthly totals, mails={args.mails_per_month}, searches={args.searches_per_month}, '
+          f'terms={args.avg_terms}, limit={args.avg_limit}')
+    for denormalized in (False, True):
+        item_bytes = denorm_bytes if denormalized else base_bytes
+        wu = write_units(item_bytes, args.avg_terms) * args.mails_per_month
+        ru = page_read_units(item_bytes, args.avg_limit, denormalized) * args.searches_per_month
+        gb = item_bytes * args.avg_terms * 2 * args.total_mails / 1024 ** 3
+        usd = (wu * USD_PER_MILLION_WRITE_UNITS + ru * USD_PER_MILLION_READ_UNITS) / 1e6 + gb * USD_PER_GB_MONTH
+        label = 'denormalized' if denormalized else 'base'
+        print(f'{label:>12}: write_units={wu:,.0f}, read_units={ru:,.0f}, storage_gb={gb:,.1f}, usd={usd:,.2f}')
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Cost model for denormalized term items")
+    p.add_argument("--terms", type=int, nargs="+", default=[250, 500, 1000, 2500])
+    p.add_argument("--limits", type=int, nargs="+", default=[10, 25, 50, 100])
+    p.add_argument("--author_bytes", type=int, default=14)
+    p.add_argument("--email_bytes", type=int, default=24)
+    p.add_argument("--subject_bytes", type=int, default=55)
+    p.add_argument("--query_ms", type=float, default=8.0)
+    p.add_argument("--batch_get_ms", type=float, default=12.0)
+    p.add_argument("--avg_terms", type=int, default=900)
+    p.add_argument("--avg_limit", type=int, default=25)
+    p.add_argument("--mails_per_month", type=int, default=15_000)
+    p.add_argument("--searches_per_month", type=int, default=500_000)
+    p.add_argument("--total_mails", type=int, default=1_500_000)
+    return p.parse_args()
+
+
+def main():
+    report(parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,55 @@
+import threading
 import time
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 import boto3
 
+import bodies
 import indexer
+import metrics
 
 TABLE_RECORDS = 'openjdk-mail-records'
 TABLE_CHECKPOINTS = 'openjdk-mail-checkpoints'
 TABLE_TERMS = 'openjdk-mail-terms'
 TABLE_STATUS = 'openjdk-mail-status'
+TABLE_TERM_STATS = 'openjdk-mail-term-stats'
+TABLE_AUTHORS = 'openjdk-mail-authors'
+TABLE_BODIES = 'openjdk-mail-bodies'
+
+# term stats key holding the number of indexed mails; '!' never survives normalization, so it is not a term
+DOCS_KEY = '!docs'
+
+# status item attribute prefix of the per-list maps written by update_status
+LIST_STATUS_PREFIX = 'list:'
+
+# status item attribute counting term writes, see bump_terms_epoch
+TERMS_EPOCH = 'terms_epoch'
 
 REGION = 'us-west-1'
 
 class Database:
-    def __init__(self, workers=10, max_retries=10, max_sleep=5.0):
-        self.client = boto3.client('dynamodb', region_name=REGION)
+    def __init__(self, workers=10, max_retries=10, max_sleep=5.0, denormalize_terms=False, term_stats=False,
+                 author_counts=False, store_bodies=False):
+        self.client = metrics.instrument_client(boto3.client('dynamodb', region_name=REGION))
         self.executor = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
         self.max_retries = max_retries
         self.max_sleep = max_sleep
+        # when set, term items also carry the display fields (author, email, subject)
+        # so searches can be answered from the term query alone, see costmodel.py
+        self.denormalize_terms = denormalize_terms
+        # when set, document frequencies are accumulated here and applied by flush_term_stats
+        self.term_stats = term_stats
+        self.term_counts = Counter()
+        self.term_counts_lock = threading.Lock()
+        # when set, messages per (authorkey, emailkey) are accumulated here and applied by flush_author_counts
+        self.author_counts = author_counts
+        self.authors = Counter()
+        self.author_names = {}
+        self.authors_lock = threading.Lock()
+        # when set, the filtered body is stored zlib-compressed next to the record, see bodies.py
+        self.store_bodies = store_bodies
 
     def _batch_write(self, to_send):
         attempt = 0
@@ -29,6 +60,7 @@ class Database:
             if not unprocessed or all(len(v) == 0 for v in unprocessed.values()):
                 break
 
+            metrics.count('dynamodb.unprocessed_items', sum(len(v) for v in unprocessed.values()))
             attempt += 1
             if attempt > self.max_retries:
                 raise RuntimeError(f"Exceeded retries; still unprocessed: {unprocessed}")
@@ -60,7 +92,7 @@ class Database:
             for to_send in to_sends:
                 self._batch_write(to_send)
 
-    def put_mail_record_and_terms(self, mail: dict, terms: list[list[str]]):
+    def put_mail_record_and_terms(self, mail: dict, terms: list[list[str]], body: str | None = None):
         date = mail['date']
         list_name = mail['list']
         month = mail['month']
@@ -92,6 +124,12 @@ class Database:
             'terms': {'N': num_terms},
             'datekey': {'N': '1'}
         }
+        if mail.get('root'):
+            # thread_date GSI partition, the whole thread is one query, see server.thread_mail
+            mail_records_item['thread'] = {'S': f"{list_name}/{mail['root']}"}
+            mail_records_item['root'] = {'S': mail['root']}
+            if mail['parent']:
+                mail_records_item['parent'] = {'S': mail['parent']}
 
         search_terms_reqs = []
         for term_array in terms:
@@ -104,15 +142,105 @@ class Database:
                 'd': {'S': date},
                 't': {'S': joined_term}
             }
+            if self.denormalize_terms:
+                mst_item['a'] = {'S': author}
+                mst_item['e'] = {'S': email}
+                mst_item['j'] = {'S': subject}
             search_terms_reqs.append({'PutRequest': {'Item': mst_item}})
 
         request_items = {
             TABLE_RECORDS: [{'PutRequest': {'Item': mail_records_item}}],
             TABLE_TERMS: search_terms_reqs
         }
+        if self.store_bodies and body is not None:
+            body_item = {
+                'list': {'S': list_name},
+                'month_id': {'S': month_id},
+                'b': {'B': bodies.compress(body)}
+            }
+            request_items[TABLE_BODIES] = [{'PutRequest': {'Item': body_item}}]
 
         self._batch_write_all(request_items)
 
+        if self.term_stats:
+            self.count_terms(list_name, terms)
+
+        if self.author_counts:
+            with self.authors_lock:
+                self.authors[(authorkey, emailkey)] += 1
+                self.author_names[(authorkey, emailkey)] = (author, email)
+
+    def count_terms(self, list_name, terms):
+        keys = [DOCS_KEY, f'{list_name}/{DOCS_KEY}']
+        for term_array in terms:
+            joined_term = '|'.join(term_array)
+            keys.append(joined_term)
+            keys.append(f'{list_name}/{joined_term}')
+        with self.term_counts_lock:
+            self.term_counts.update(keys)
+
+    def _increment(self, key_count):
+        key, count = key_count
+        self.client.update_item(
+            TableName=TABLE_TERM_STATS,
+            Key={'p': {'S': key}},
+            UpdateExpression='ADD #n :c',
+            ExpressionAttributeNames={'#n': 'n'},
+            ExpressionAttributeValues={':c': {'N': str(count)}}
+        )
+
+    def flush_term_stats(self):
+        # one atomic increment per distinct key since the last flush, call before storing a checkpoint
+        with self.term_counts_lock:
+            counts = self.term_counts
+            self.term_counts = Counter()
+        if self.executor:
+            list(self.executor.map(self._increment, counts.items()))
+        else:
+            for key_count in counts.items():
+                self._increment(key_count)
+        return len(counts)
+
+    def _increment_author(self, keys_count):
+        (authorkey, emailkey), count, (author, email) = keys_count
+        self.client.update_item(
+            TableName=TABLE_AUTHORS,
+            Key={'p': {'S': f'{authorkey}|{emailkey}'}},  # '|' never survives normalization
+            UpdateExpression='ADD #n :c SET ak = :ak, ek = :ek, a = :a, e = :e',
+            ExpressionAttributeNames={'#n': 'n'},
+            ExpressionAttributeValues={
+                ':c': {'N': str(count)},
+                ':ak': {'S': authorkey},
+                ':ek': {'S': emailkey},
+                ':a': {'S': author},
+                ':e': {'S': email}
+            }
+        )
+
+    def discard_counts(self):
+        # drops counts not yet flushed, for mail that another writer will process again
+        with self.term_counts_lock:
+            self.term_counts = Counter()
+        with self.authors_lock:
+            self.authors, self.author_names = Counter(), {}
+
+    def flush_author_counts(self):
+        # like flush_term_stats; the display names are the latest seen for each pair
+        with self.authors_lock:
+            counts, names = self.authors, self.author_names
+            self.authors, self.author_names = Counter(), {}
+        updates = [(keys, count, names[keys]) for keys, count in counts.items()]
+        if self.executor:
+            list(self.executor.map(self._increment_author, updates))
+        else:
+            for update in updates:
+                self._increment_author(update)
+        return len(updates)
+
+    def scan_authors(self, segment=0, total_segments=1):
+        for item in self.scan(TABLE_AUTHORS, 'ak, ek, a, e, n', segment, total_segments):
+            yield item['ak']['S'], item['ek']['S'], item['a']['S'], item['e']['S'], int(item['n']['N'])
+
     def put_checkpoint(self, mailing_list: str, month: str, mail_id: str):
         item = {
             'list': {'S': mailing_list},
@@ -136,8 +264,77 @@ class Database:
             return res['Item']['month']['S'], res['Item']['id']['S']
         return '', ''
 
-    def update_status(self, changed):
-        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    def scan(self, table, projection, segment=0, total_segments=1, names=None):
+        params = {
+            'TableName': table,
+            'ProjectionExpression': projection,
+            'Segment': segment,
+            'TotalSegments': total_segments
+        }
+        if names:  # placeholders for attribute names that are DynamoDB reserved words
+            params['ExpressionAttributeNames'] = names
+        while True:
+            res = self.client.scan(**params)
+            yield from res['Items']
+            if 'LastEvaluatedKey' not in res:
+                break
+            params['ExclusiveStartKey'] = res['LastEvaluatedKey']
+
+    def item_count(self, table):
+        # approximate, refreshed by DynamoDB about every six hours
+        return self.client.describe_table(TableName=table)['Table']['ItemCount']
+
+    @staticmethod
+    def to_status_map(status: dict):
+        return {'M': {k: {'N': str(v)} if isinstance(v, int) else {'S': v} for k, v in status.items()}}
+
+    @staticmethod
+    def from_status_map(attr):
+        return {k: int(v['N']) if 'N' in v else v['S'] for k, v in attr['M'].items()}
+
+    def get_list_status(self):
+        res = self.client.get_item(
+            TableName=TABLE_STATUS,
+            Key={"pk": {"N": "1"}}
+        )
+        return {k[len(LIST_STATUS_PREFIX):]: self.from_status_map(v) for k, v in res.get('Item', {}).items()
+                if k.startswith(LIST_STATUS_PREFIX)}
+
+    def get_last_update(self):
+        res = self.client.get_item(
+            TableName=TABLE_STATUS,
+            Key={"pk": {"N": "1"}}
+        )
+        return res.get('Item', {}).get('last_update', {}).get('S')
+
+    def get_terms_epoch(self):
+        res = self.client.get_item(
+            TableName=TABLE_STATUS,
+            Key={"pk": {"N": "1"}},
+            ProjectionExpression=TERMS_EPOCH
+        )
+        return res.get('Item', {}).get(TERMS_EPOCH, {}).get('N', '0')
+
+    def bump_terms_epoch(self):
+        # called before writing terms; a published Bloom filter is only trusted while its version is the current
+        # epoch, so a writer that dies before republishing the filter leaves it invalid instead of incomplete
+        res = self.client.update_item(
+            TableName=TABLE_STATUS,
+            Key={"pk": {"N": "1"}},
+            UpdateExpression="ADD #epoch :one",
+            ExpressionAttributeNames={"#epoch": TERMS_EPOCH},
+            ExpressionAttributeValues={":one": {"N": "1"}},
+            ReturnValues='UPDATED_NEW'
+        )
+        return res['Attributes'][TERMS_EPOCH]['N']
+
+    @staticmethod
+    def now():
+        return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def update_status(self, changed, now=None, lists=None):
+        # lists maps list names to status dicts of str and int values, stored whole in one attribute per list
+        now = now or self.now()
 
         update_expr = "SET #last_check = :now"
         expr_attr_names = {"#last_check": "last_check"}
@@ -147,6 +344,11 @@ class Database:
             update_expr += ", #last_update = :now"
             expr_attr_names["#last_update"] = "last_update"
 
+        for i, (list_name, status) in enumerate(sorted((lists or {}).items())):
+            update_expr += f", #l{i} = :l{i}"
+            expr_attr_names[f"#l{i}"] = f"{LIST_STATUS_PREFIX}{list_name}"
+            expr_attr_values[f":l{i}"] = self.to_status_map(status)
+
         self.client.update_item(
             TableName=TABLE_STATUS,
             Key={"pk": {"N": "1"}},
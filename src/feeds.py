@@ -0,0 +1,58 @@
+import json
+
+# First page of the latest-mail feeds (global and per list), rendered by updater.py after each changed run so the
+# server answers the most common requests without querying DynamoDB. Each item carries the LastEvaluatedKey a
+# latest query ending at it would return, so pages of any size served from the feed have the same cursors as
+# DynamoDB, and paging past the feed continues there.
+FEED_ITEMS = 100  # one maximum page of the API
+
+
+def feed_key(list_name=None):
+    return f'feeds/latest/{list_name}.json' if list_name else 'feeds/latest.json'
+
+
+def start_key(item, list_name=None):
+    # key attributes of the table and of the list_date or datekey_date index
+    key = {'list': item['list'], 'month_id': item['month_id'], 'date': item['date']}
+    if list_name is None:
+        key['datekey'] = item['datekey']
+    return key
+
+
+def render(items, converted, version, list_name=None):
+    # items are raw records in descending date order, converted their API form
+    return {
+        'version': version,
+        'list': list_name,
+        'items': converted,
+        'keys': [start_key(item, list_name) for item in items],
+    }
+
+
+def page(feed, start_key, limit):
+    # (items, next start key) of a descending page without a date range, None when the feed does not cover it
+    keys = feed['keys']
+    if start_key is None:
+        start = 0
+    else:
+        try:
+            start = keys.index(start_key) + 1
+        except ValueError:
+            return None
+    end = start + limit
+    complete = len(keys) < FEED_ITEMS  # the whole list fits in the feed
+    if end > len(keys) and not complete:
+        return None
+    more = end < len(keys) or (end == len(keys) and not complete)
+    return feed['items'][start:end], keys[end - 1] if more else None
+
+
+def publish(store, feed):
+    key = feed_key(feed['list'])
+    store.put(key, json.dumps(feed, separators=(',', ':')).encode('utf-8'), 'application/json')
+    return key
+
+
+def load(store, list_name=None):
+    data = store.get(feed_key(list_name))
+    return json.loads(data) if data else None
@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+
+import feeds
+import server
+from store import LocalStore
+
+
+def record(i, list_name='net-dev'):
+    return {
+        'list': {'S': list_name},
+        'month_id': {'S': f'2025-February/{i:06d}'},
+        'date': {'S': f'2025-02-01T00:{i // 60:02d}:{i % 60:02d}Z'},
+        'datekey': {'N': '1'},
+    }
+
+
+class TestFeeds(unittest.TestCase):
+    def feed(self, n, list_name='net-dev'):
+        items = [record(i, list_name) for i in reversed(range(n))]
+        return feeds.render(items, [{'id': item['month_id']['S'][-6:]} for item in items], 'v1', list_name)
+
+    def test_page(self):
+        feed = self.feed(feeds.FEED_ITEMS)
+        items, key = feeds.page(feed, None, 10)
+        self.assertEqual([i['id'] for i in items], [f'{i:06d}' for i in range(99, 89, -1)])
+        self.assertEqual(key, feeds.start_key(record(90), 'net-dev'))
+        items, key = feeds.page(feed, key, 10)
+        self.assertEqual(items[0]['id'], '000089')
+        # the last page of a full feed keeps a cursor, paging past it goes to DynamoDB
+        self.assertIsNotNone(feeds.page(feed, None, 100)[1])
+        self.assertIsNone(feeds.page(feed, key, 100))
+        self.assertIsNone(feeds.page(feed, feeds.start_key(record(500), 'net-dev'), 10))
+
+    def test_complete_feed(self):
+        feed = self.feed(15, None)
+        self.assertIn('datekey', feed['keys'][0])
+        items, key = feeds.page(feed, None, 10)
+        items, key = feeds.page(feed, key, 10)
+        self.assertEqual(len(items), 5)
+        self.assertIsNone(key)
+
+    def test_publish_and_load(self):
+        with tempfile.TemporaryDirectory() as root:
+            artifacts = LocalStore(root)
+            self.assertIsNone(feeds.load(artifacts, 'net-dev'))
+            feed = self.feed(3)
+            self.assertEqual(feeds.publish(artifacts, feed), 'feeds/latest/net-dev.json')
+            self.assertEqual(feeds.load(artifacts, 'net-dev'), feed)
+            self.assertIsNone(feeds.load(artifacts))
+
+    def test_latest_feed_version(self):
+        # the server only serves a feed rendered for the current last_update
+        with tempfile.TemporaryDirectory() as root:
+            feeds.publish(LocalStore(root), self.feed(3))
+            saved = server.ARTIFACT_STORE, dict(server._status_version), dict(server._feeds)
+            try:
+                server.ARTIFACT_STORE = root
+                server._feeds.clear()
+                server._status_version.update(value='v1', expires=float('inf'))
+                self.assertEqual(server.latest_feed('net-dev')['version'], 'v1')
+                server._status_version.update(value='v2')
+                self.assertIsNone(server.latest_feed('net-dev'))
+            finally:
+                server.ARTIFACT_STORE = saved[0]
+                server._status_version.update(saved[1])
+                server._feeds.clear()
+                server._feeds.update(saved[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
+import math
 import re
 
+import metrics
 from params import IndexParams
 
 
@@ -77,6 +79,48 @@ class Indexer:
         if parse_code:  # lowest priority, in case max-terms reached
             self.add_all_code_ngrams(terms, tokens)
 
+    def idf(self, term):
+        df = self.params.term_df.get('|'.join(term), 0)
+        return math.log((1 + self.params.term_df_docs) / (1 + df))
+
+    def select(self, terms, limit):
+        # keeps the `limit` highest-idf terms in their original order, earlier terms win ties
+        if len(terms) <= limit:
+            return terms
+        ranked = sorted(range(len(terms)), key=lambda i: (-self.idf(terms[i]), i))
+        return [terms[i] for i in sorted(ranked[:limit])]
+
+    def index_by_idf(self, targets):
+        # same candidates as index() without truncation, then budgets are spent on the rarest terms; stop terms are
+        # dropped first, a df table mined without them would otherwise rank them rarest and spend the budget on them
+        word_terms = []
+        seen = {tuple(term) for term in self.params.stop_terms}
+        code_candidates = []
+        for text, parse_code, all_ngrams, ngram_limit in targets:
+            tokens = self.tokenize(text)
+            norm_tokens = self.normalize_and_filter(tokens)
+            candidates = [s for i in range(len(norm_tokens)) for s in Indexer.ngrams(norm_tokens, i, ngram_limit)]
+            if all_ngrams and norm_tokens:
+                candidates.append(norm_tokens)
+            for term in candidates:
+                if tuple(term) not in seen:
+                    seen.add(tuple(term))
+                    word_terms.append(term)
+            if parse_code:
+                for t in tokens:
+                    for d in ['/', '.', '=', '::']:
+                        if d in t:
+                            code_candidates.extend([n] for sub in self.code_ngrams(t.split(d))
+                                                   if (n := self.normalize(''.join(sub))))
+        code_terms = []
+        for term in code_candidates:
+            if tuple(term) not in seen:
+                seen.add(tuple(term))
+                code_terms.append(term)
+        code_terms = self.select(code_terms, self.params.max_code_terms)
+        return self.select(word_terms + code_terms, self.params.max_terms)
+
+    @metrics.timed('index')
     def index(self, author, email, subject, body):
         targets = (
             (author, False, True, self.params.subject_ngram_limit),
@@ -84,6 +128,8 @@ class Indexer:
             (subject, False, True, self.params.subject_ngram_limit),
             (body, True, False, self.params.word_ngram_limit)
         )
+        if self.params.term_selection == 'idf':
+            return self.index_by_idf(targets)
         terms = []
         for text, parse_code, all_ngrams, ngram_limit in targets:
             self.index_field(terms, text, parse_code, all_ngrams, ngram_limit)
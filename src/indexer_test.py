@@ -1,3 +1,4 @@
+import dataclasses
 import unittest
 
 from indexer import Indexer
@@ -78,5 +79,50 @@ class TestIndexer(unittest.TestCase):
                     ['systemout'], ['out'], ['outprintlnhello'], ['printlnhello']
             ])
 
+    def test_idf_selection(self):
+        params = IndexParams(
+            max_token_length=50,
+            word_ngram_limit=2,
+            code_ngram_limit=3,
+            subject_ngram_limit=2,
+            max_terms=1000,
+            max_code_terms=100,
+            stop_words=['the', 'is', 'of'],
+            stop_prefixes=[],
+            stop_terms=[],
+            stop_lines=[],
+            stop_func=lambda m: False,
+            term_selection='idf',
+            term_df={'thanks': 90, 'thanks|please': 50, 'please': 80, 'review': 60, 'please|review': 40},
+            term_df_docs=100
+        )
+        author = 'Duke'
+        email = 'duke@java.net'
+        subject = 'Review'
+        body = 'Thanks please review java.util.Spliterator'
+
+        # unconstrained budgets keep every candidate of first-come indexing
+        first = Indexer(dataclasses.replace(params, term_selection='first'))
+        self.assertEqual(
+            sorted(Indexer(params).index(author=author, email=email, subject=subject, body=body)),
+            sorted(first.index(author=author, email=email, subject=subject, body=body)))
+
+        # a small budget drops the common leading n-grams, not the rare identifiers at the end
+        idx = Indexer(dataclasses.replace(params, max_terms=6, max_code_terms=2))
+        self.assertEqual(
+            idx.index(author=author, email=email, subject=subject, body=body),
+            [['duke'], ['dukejavanet'], ['review', 'javautilspliterator'], ['javautilspliterator'],
+             ['java'], ['javautil']])
+
+        # stop terms are dropped before selection and take no budget
+        idx = Indexer(dataclasses.replace(params, max_terms=6, max_code_terms=2, stop_terms=[['javautilspliterator']]))
+        terms = idx.index(author=author, email=email, subject=subject, body=body)
+        self.assertEqual(len(terms), 6)
+        self.assertNotIn(['javautilspliterator'], terms)
+
+        self.assertEqual(idx.select([['a'], ['b']], 5), [['a'], ['b']])
+        self.assertGreater(idx.idf(['spliterator']), idx.idf(['review']))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import base64
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import server
+
+# Serves server.lambda_handler outside Lambda@Edge, for development and load testing.
+# Run as an HTTP server with `python local.py --port 8080`, or under any ASGI server with `uvicorn local:app`.
+
+
+def to_event(method, path, querystring, headers, body=b''):
+    request = {
+        'method': method,
+        'uri': path,
+        'querystring': querystring,
+        'headers': {k.lower(): [{'key': k, 'value': v}] for k, v in headers},
+    }
+    if body:
+        request['body'] = {'encoding': 'base64', 'data': base64.b64encode(body).decode('ascii')}
+    return {'Records': [{'cf': {'request': request}}]}
+
+
+def from_response(res):
+    status = int(res['status'])
+    headers = [(h['key'], h['value']) for values in res.get('headers', {}).values() for h in values]
+    body = res.get('body', '')
+    body = base64.b64decode(body) if res.get('bodyEncoding') == 'base64' else body.encode('utf-8')
+    return status, headers, body
+
+
+def invoke(method, path, querystring, headers, body=b''):
+    start = time.perf_counter()
+    status, res_headers, res_body = from_response(
+        server.lambda_handler(to_event(method, path, querystring, headers, body), None))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f'local method={method}, path={path}, status={status}, bytes={len(res_body)}, ms={elapsed_ms:.1f}')
+    return status, res_headers, res_body
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def handle_request(self):
+        url = urllib.parse.urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, headers, res_body = invoke(self.command, url.path, url.query, self.headers.items(), body)
+        self.send_response(status)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(res_body)))
+        self.end_headers()
+        self.wfile.write(res_body)
+
+    do_GET = handle_request
+    do_POST = handle_request
+
+    def log_message(self, format, *args):
+        pass  # invoke() logs every request with its latency
+
+
+async def app(scope, receive, send):
+    if scope['type'] != 'http':
+        return
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    headers = [(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope['headers']]
+    status, res_headers, res_body = await asyncio.to_thread(
+        invoke, scope['method'], scope['path'], scope['query_string'].decode('latin-1'), headers, body)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in res_headers],
+    })
+    await send({'type': 'http.response.body', 'body': res_body})
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Local HTTP server for the query API")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    httpd = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f'serving on http://{args.host}:{args.port}/api')
+    httpd.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,24 @@
 import re
+import threading
+from concurrent.futures import Future
 from datetime import datetime
 from typing import NamedTuple
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Comment
+
+import metrics
 
 BASE_URL = 'https://mail.openjdk.org/pipermail'
 
+# thread.html precedes each message link with '<!--{depth} {thread key} -->'
+THREAD_COMMENT = re.compile(r'(\d+) \S*')
+MAIL_HREF = re.compile(r'([0-9]+)\.html')
+
+# reply and forward prefixes stripped to match a reply to the thread it continues in an earlier month
+SUBJECT_PREFIX = re.compile(r'^\s*((re|fwd?|aw)\s*:\s*|\[[^]]*]\s*)+', re.IGNORECASE)
+THREAD_MONTHS = 3  # months searched back for the start of a thread
+
 
 class Checkpoint(NamedTuple):
     month: str
@@ -18,6 +30,11 @@ class MonthMail(NamedTuple):
     mail_url: str
 
 
+class MonthThreads(NamedTuple):
+    threads: dict  # id -> (parent, root) within the month
+    subjects: dict  # id -> subject, as linked from thread.html
+
+
 class Mail(NamedTuple):
     list: str
     month: str
@@ -27,6 +44,8 @@ class Mail(NamedTuple):
     email: str
     date: str
     body: str
+    parent: str = ''  # id of the message replied to, empty for thread roots
+    root: str = ''  # id of the first message of the thread, possibly in an earlier month, empty if unknown
 
 
 def http_session(concurrency_limit):
@@ -45,6 +64,10 @@ class MailingList:
         self.checkpoint = checkpoint
         self.url = f'{BASE_URL}/{name}'
         self.session = session
+        self.threads = {}  # month -> Future of MonthThreads
+        self.refreshed = set()  # months whose thread.html was refetched for a missing message
+        self.threads_lock = threading.Lock()
+        self.roots = {}  # (month, root) -> (parent, root) of a month's root continuing an earlier month's thread
 
     def mail_urls(self):
         checkpoint_month_url = f'{self.url}/{self.checkpoint.month}/date.html'
@@ -63,9 +86,11 @@ class MailingList:
             yield from mail_urls
 
     def fetch_html_page(self, url):
-        with self.session.get(url) as response:
+        with metrics.timer('pipermail.fetch'), self.session.get(url) as response:
             response.raise_for_status()
-            return BeautifulSoup(response.text, "html.parser")
+            text = response.text
+        with metrics.timer('pipermail.parse'):
+            return BeautifulSoup(text, "html.parser")
 
     @staticmethod
     def convert_date(s):
@@ -86,7 +111,100 @@ class MailingList:
         body = pre.get_text() if pre else ''  # absent body observed
         if not re.sub(r'[^\w+#]+', '', author):  # author key has been observed to be '-' and '- -'
             author = email
-        return Mail(list=list, month=month, id=id, subject=subject, author=author, email=email, date=date, body=body)
+        parent, root = self.thread_of(month, id)
+        return Mail(list=list, month=month, id=id, subject=subject, author=author, email=email, date=date, body=body,
+                    parent=parent, root=root)
+
+    @staticmethod
+    def parse_thread_page(page, subjects=None):
+        # messages are listed in thread order with their depth, so the ancestors of each one are on a stack;
+        # a reply whose parent is in an earlier month starts at depth 0 and becomes a root here, see thread_of
+        threads = {}
+        stack = []
+        depth = None
+        for node in page.descendants:
+            if isinstance(node, Comment):
+                m = THREAD_COMMENT.fullmatch(node.strip())
+                depth = int(m.group(1)) if m else None
+            elif depth is not None and node.name == 'a' and (m := MAIL_HREF.fullmatch(node.get('href', ''))):
+                id = m.group(1)
+                del stack[depth:]
+                threads[id] = (stack[-1] if stack else '', stack[0] if stack else id)
+                stack.append(id)
+                depth = None
+                if subjects is not None:
+                    subjects[id] = node.get_text().strip()
+        return threads
+
+    def fetch_month_threads(self, month):
+        subjects = {}
+        threads = self.parse_thread_page(self.fetch_html_page(f'{self.url}/{month}/thread.html'), subjects)
+        return MonthThreads(threads, subjects)
+
+    def month_threads(self, month, stale=None):
+        # thread.html is fetched once per month and shared by the mail workers, outside the lock so other months
+        # proceed; passing the future whose page lacked a message refetches it, once per month, so mail missing
+        # from thread.html for good costs no more fetches
+        with self.threads_lock:
+            future = self.threads.get(month)
+            refetch = future is not None and future is stale and month not in self.refreshed
+            fetch = future is None or refetch
+            if refetch:
+                self.refreshed.add(month)
+            if fetch:
+                future = self.threads[month] = Future()
+        if fetch:
+            try:
+                future.set_result(self.fetch_month_threads(month))
+            except Exception as e:
+                with self.threads_lock:
+                    if self.threads.get(month) is future:
+                        del self.threads[month]  # the next message retries
+                future.set_exception(e)
+        return future
+
+    @staticmethod
+    def previous_month(month):
+        dt = datetime.strptime(month, '%Y-%B')
+        return f'{dt.year - 1}-December' if dt.month == 1 else datetime(dt.year, dt.month - 1, 1).strftime('%Y-%B')
+
+    def continued_thread(self, month, root, subject, months=THREAD_MONTHS):
+        # pipermail threads each month on its own, so a reply to an earlier month's message roots a new thread;
+        # a root whose subject is a reply continues the newest earlier thread with the same subject, and its parent
+        # is taken as the last message of that thread, the closest the archive tells
+        key = (month, root)
+        if key in self.roots:
+            return self.roots[key]
+        base = SUBJECT_PREFIX.sub('', subject).strip()
+        result = ('', root)
+        if months and base and base != subject.strip():
+            previous = self.previous_month(month)
+            try:
+                earlier = self.month_threads(previous).result()
+            except requests.HTTPError:  # no archive for that month
+                earlier = None
+            if earlier:
+                members = {}
+                for id, (_, r) in earlier.threads.items():
+                    members.setdefault(r, []).append(id)
+                matches = [r for r in members if SUBJECT_PREFIX.sub('', earlier.subjects[r]).strip() == base]
+                if matches:
+                    r = max(matches)
+                    _, r_root = self.continued_thread(previous, r, earlier.subjects[r], months - 1)
+                    result = (max(members[r]), r_root)
+        self.roots[key] = result
+        return result
+
+    def thread_of(self, month, id):
+        future = self.month_threads(month)
+        month_threads = future.result()
+        if id not in month_threads.threads:  # newer than the fetched page
+            month_threads = self.month_threads(month, stale=future).result()
+        parent, root = month_threads.threads.get(id, ('', ''))
+        if root:
+            continued_parent, root = self.continued_thread(month, root, month_threads.subjects[root])
+            parent = parent or continued_parent
+        return parent, root
 
     def fetch_month_urls(self):
         page = self.fetch_html_page(f'{self.url}/')
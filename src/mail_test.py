@@ -0,0 +1,108 @@
+import unittest
+
+import requests
+from bs4 import BeautifulSoup
+
+from mail import Checkpoint, MailingList
+
+# trimmed from a pipermail thread.html, which leaves <LI> unclosed
+THREAD_PAGE = '''
+<ul>
+<!--0 01740000000- -->
+<LI><A HREF="025750.html">RFR: 8350000: Fix handshake
+</A><A NAME="25750">&nbsp;</A>
+<I>Peter Parker
+</I>
+
+<UL>
+<!--1 01740000000-01740000100- -->
+<LI><A HREF="025751.html">RFR: 8350000: Fix handshake
+</A><A NAME="25751">&nbsp;</A>
+<I>Mary Jane
+</I>
+
+<UL>
+<!--2 01740000000-01740000100-01740000200- -->
+<LI><A HREF="025753.html">RFR: 8350000: Fix handshake
+</A><A NAME="25753">&nbsp;</A>
+<I>Peter Parker
+</I>
+
+</UL>
+<!--1 01740000000-01740000300- -->
+<LI><A HREF="025754.html">RFR: 8350000: Fix handshake
+</A><A NAME="25754">&nbsp;</A>
+<I>Flash Thompson
+</I>
+
+</UL>
+<!--0 01740000050- -->
+<LI><A HREF="025752.html">Question about virtual threads
+</A><A NAME="25752">&nbsp;</A>
+<I>Ned Leeds
+</I>
+
+</ul>
+'''
+
+# the next month, where replies to the handshake thread start at depth 0
+NEXT_THREAD_PAGE = '''
+<ul>
+<!--0 01740100000- -->
+<LI><A HREF="025800.html">Re: RFR: 8350000: Fix handshake
+</A><A NAME="25800">&nbsp;</A>
+<UL>
+<!--1 01740100000-01740100100- -->
+<LI><A HREF="025801.html">RE: [net-dev] RFR: 8350000: Fix handshake
+</A><A NAME="25801">&nbsp;</A>
+</UL>
+<!--0 01740100200- -->
+<LI><A HREF="025802.html">Re: Something else
+</A><A NAME="25802">&nbsp;</A>
+</ul>
+'''
+
+
+class PagedMailingList(MailingList):
+    def __init__(self, pages):
+        super().__init__(None, 'net-dev', Checkpoint('', ''))
+        self.pages = pages
+        self.fetched = []
+
+    def fetch_html_page(self, url):
+        self.fetched.append(url)
+        if url not in self.pages:
+            raise requests.HTTPError(url)
+        return BeautifulSoup(self.pages[url], 'html.parser')
+
+
+class TestMail(unittest.TestCase):
+    def test_parse_thread_page(self):
+        threads = MailingList.parse_thread_page(BeautifulSoup(THREAD_PAGE, 'html.parser'))
+        self.assertEqual(threads, {
+            '025750': ('', '025750'),
+            '025751': ('025750', '025750'),
+            '025753': ('025751', '025750'),
+            '025754': ('025750', '025750'),
+            '025752': ('', '025752'),
+        })
+
+    def test_thread_across_months(self):
+        base = 'https://mail.openjdk.org/pipermail/net-dev'
+        ml = PagedMailingList({f'{base}/2025-January/thread.html': THREAD_PAGE,
+                               f'{base}/2025-February/thread.html': NEXT_THREAD_PAGE})
+        self.assertEqual(ml.thread_of('2025-February', '025800'), ('025754', '025750'))
+        self.assertEqual(ml.thread_of('2025-February', '025801'), ('025800', '025750'))
+        self.assertEqual(ml.thread_of('2025-February', '025802'), ('', '025802'))
+        self.assertEqual(ml.thread_of('2025-January', '025752'), ('', '025752'))
+        self.assertEqual(len(ml.fetched), 2)
+
+        # a message newer than the fetched page refetches it, but only once per month
+        self.assertEqual(ml.thread_of('2025-February', '025803'), ('', ''))
+        self.assertEqual(len(ml.fetched), 3)
+        self.assertEqual(ml.thread_of('2025-February', '025804'), ('', ''))
+        self.assertEqual(len(ml.fetched), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process counters and latency histograms, flushed as CloudWatch embedded metric format (EMF) log lines, which
+# CloudWatch turns into metrics without API calls, or as a Prometheus text file for local runs.
+
+NAMESPACE = 'OpenJDKMail'
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+EMF_MAX_VALUES = 100  # EMF takes at most 100 values per metric and line
+
+# DynamoDB operations that report consumed capacity when asked to
+CAPACITY_OPERATIONS = frozenset({'Query', 'Scan', 'GetItem', 'PutItem', 'UpdateItem', 'BatchGetItem',
+                                 'BatchWriteItem'})
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.samples = []  # raw values since the last EMF flush, capped
+
+    def observe(self, value):
+        i = 0
+        while i < len(BUCKETS_MS) and value > BUCKETS_MS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.sum += value
+        if len(self.samples) < EMF_MAX_VALUES:
+            self.samples.append(round(value, 3))
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed = time.monotonic()
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, ms):
+        with self.lock:
+            h = self.histograms.get(name)
+            if h is None:
+                h = self.histograms[name] = Histogram()
+            h.observe(ms)
+
+    def emf(self, dimensions):
+        # one log line with every counter and the histogram samples since the last one; counters restart at zero
+        with self.lock:
+            counters, self.counters = self.counters, {}
+            samples = {name: h.samples for name, h in self.histograms.items() if h.samples}
+            for h in self.histograms.values():
+                h.samples = []
+        if not counters and not samples:
+            return None
+        metrics = [{'Name': name, 'Unit': 'Count'} for name in counters]
+        metrics += [{'Name': name, 'Unit': 'Milliseconds'} for name in samples]
+        return json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{'Namespace': NAMESPACE, 'Dimensions': [list(dimensions)], 'Metrics': metrics}]
+            },
+            **dimensions,
+            **counters,
+            **samples,
+        }, separators=(',', ':'))
+
+    def prometheus(self, prefix='openjdk_mail'):
+        # cumulative since start, as Prometheus expects
+        def metric_name(name):
+            return f'{prefix}_{name}'.replace('.', '_').replace('-', '_').lower()
+
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f'# TYPE {metric_name(name)}_total counter', f'{metric_name(name)}_total {value}']
+            for name, h in sorted(self.histograms.items()):
+                m = f'{metric_name(name)}_ms'
+                lines.append(f'# TYPE {m} histogram')
+                cumulative = 0
+                for le, n in zip([*BUCKETS_MS, '+Inf'], h.buckets):
+                    cumulative += n
+                    lines.append(f'{m}_bucket{{le="{le}"}} {cumulative}')
+                lines += [f'{m}_sum {h.sum:.3f}', f'{m}_count {h.count}']
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# per-request (name, ms) timings, set by the server while a debug request is handled
+_trace = contextvars.ContextVar('trace', default=None)
+
+
+def count(name, n=1):
+    registry.count(name, n)
+
+
+def observe(name, ms):
+    registry.observe(name, ms)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, ms))
+
+
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - start) * 1000)
+
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def submit(pool, fn, *args):
+    # runs fn on an executor within a copy of the caller's context, so its timings join the caller's trace
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def start_trace():
+    return _trace.set([])
+
+
+def end_trace(token):
+    trace = _trace.get()
+    _trace.reset(token)
+    return trace or []
+
+
+def server_timing(trace, total_ms):
+    # Server-Timing header value, durations of the same name summed
+    totals = {}
+    for name, ms in trace:
+        dur, n = totals.get(name, (0.0, 0))
+        totals[name] = (dur + ms, n + 1)
+    parts = [f'{name};dur={dur:.1f};desc="{n}x"' for name, (dur, n) in totals.items()]
+    return ', '.join([*parts, f'total;dur={total_ms:.1f}'])
+
+
+def instrument_client(client, service='dynamodb'):
+    # times every API call of a boto3 client, including its retries, and counts retries and consumed capacity
+    def before_parameter_build(params, model, **kwargs):
+        if model.name in CAPACITY_OPERATIONS:
+            params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+    def before_call(context, **kwargs):
+        context['metrics_start'] = time.perf_counter()
+
+    def after_call(parsed, model, context, **kwargs):
+        start = context.get('metrics_start')
+        if start is not None:
+            observe(f'{service}.{model.name}', (time.perf_counter() - start) * 1000)
+        retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        if retries:
+            count(f'{service}.retries', retries)
+        capacity = parsed.get('ConsumedCapacity')
+        if capacity:
+            units = sum(c.get('CapacityUnits', 0) for c in (capacity if isinstance(capacity, list) else [capacity]))
+            count(f'{service}.{model.name}.capacity', units)
+
+    events = client.meta.events
+    events.register(f'before-parameter-build.{service}', before_parameter_build)
+    events.register(f'before-call.{service}', before_call)
+    events.register(f'after-call.{service}', after_call)
+    return client
+
+
+def flush(output, dimensions=None, path=None):
+    # output is 'emf' (printed, picked up from the Lambda log) or 'prometheus' (written to path), None does nothing
+    registry.flushed = time.monotonic()
+    if output == 'emf':
+        line = registry.emf(dimensions or {})
+        if line:
+            print(line, flush=True)
+    elif output == 'prometheus' and path:
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(registry.prometheus())
+        os.replace(tmp, path)
+
+
+def flush_due(interval):
+    return time.monotonic() - registry.flushed >= interval
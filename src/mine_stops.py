@@ -0,0 +1,122 @@
+import argparse
+import dataclasses
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import batched, islice
+
+import mail
+import params
+import stops
+import task
+from sketch import SpaceSaving
+from updater import MAILING_LISTS
+
+logger = logging.getLogger(__name__)
+
+
+def init_logging():
+    root = logging.getLogger()
+    if root.handlers:
+        for handler in root.handlers:
+            root.removeHandler(handler)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] <%(threadName)s> %(levelname)s - %(message)s')
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Stop-term candidate miner")
+    p.add_argument("--lists", nargs="+", default=MAILING_LISTS)
+    p.add_argument("--max_mails_per_list", type=int, help="defaults to the whole archive")
+    p.add_argument("--capacity", type=int, default=200_000, help="terms tracked by the heavy-hitters sketch")
+    p.add_argument("--top", type=int, default=500)
+    p.add_argument("--min_fraction", type=float, default=0.05, help="minimum document frequency to emit")
+    p.add_argument("--include_existing", action="store_true", help="also count terms already in STOP_TERMS")
+    p.add_argument("--mail_workers", type=int, default=20)
+    p.add_argument("--throttle_sleep", type=float, default=1.6)
+    p.add_argument("--out", default="stops_candidates.py")
+    p.add_argument("--df_out", help="also write the tracked document frequencies as JSON")
+    return p.parse_args()
+
+
+def mine(lists, index_params, capacity, max_mails_per_list, mail_workers, throttle_sleep):
+    # every term returned by Indexer.index is unique within its mail, so counts are document frequencies
+    ss = SpaceSaving(capacity)
+    docs = 0
+    executor = ThreadPoolExecutor(max_workers=mail_workers)
+    session = mail.http_session(mail_workers)
+    for list_name in lists:
+        ml = mail.MailingList(session, list_name, mail.Checkpoint(month='', id=''))
+        urls = islice(ml.mail_urls(), max_mails_per_list)
+
+        def fn(mail_url):
+            m = ml.fetch_mail(mail_url)
+            return None if index_params.stop_func(m) else task.index_mail(m, index_params)
+
+        list_docs = 0
+        for batch in batched(urls, mail_workers):
+            for terms in executor.map(fn, batch):
+                if terms is None:
+                    continue
+                for term_array in terms:
+                    ss.add('|'.join(term_array))
+                list_docs += 1
+            time.sleep(throttle_sleep)
+        docs += list_docs
+        logger.info(f'mined list, list={list_name}, docs={list_docs}, total_docs={docs}, tracked={len(ss.counts)}')
+    return ss, docs
+
+
+def candidates(ss: SpaceSaving, docs, top, min_fraction):
+    result = []
+    for term, count, error in ss.top(top):
+        if docs and count / docs >= min_fraction:
+            result.append((term.split('|'), count, error))
+    return result
+
+
+def df_table(ss: SpaceSaving, docs):
+    # guaranteed lower bounds: a term tracked after an eviction inherits the evicted count as error, and ranking
+    # that inflated count would make rare terms look common to idf term selection
+    return {'docs': docs, 'df': {term: count - error for term, count, error in ss.top() if count > error}}
+
+
+def render(cands, docs, lists):
+    lines = [
+        f'# The stop terms below are the top high-frequency terms that appeared in {docs:,} mail documents',
+        f'# from {", ".join(lists)}.',
+        '# Mined by mine_stops.py with a Space-Saving sketch; counts may overestimate by the noted error.',
+        '# Review before merging into stops.STOP_TERMS: names and subject-matter words should be omitted.',
+        'STOP_TERMS = [',
+    ]
+    for rank, (term_array, count, error) in enumerate(cands, start=1):
+        note = f' (error<={error / docs:.2%})' if error else ''
+        lines.append(f'    {term_array!r},  # [{rank}] {count / docs:.2%}{note}')
+    lines.append(']')
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    init_logging()
+    args = parse_args()
+    logger.info(args)
+    index_params = params.DEFAULT_PARAMS
+    if args.include_existing:
+        index_params = dataclasses.replace(index_params, stop_terms=[])
+    ss, docs = mine(args.lists, index_params, args.capacity, args.max_mails_per_list, args.mail_workers,
+                    args.throttle_sleep)
+    cands = candidates(ss, docs, args.top, args.min_fraction)
+    with open(args.out, 'w') as f:
+        f.write(render(cands, docs, args.lists))
+    logger.info(f'wrote candidates, out={args.out}, count={len(cands)}, existing={len(stops.STOP_TERMS)}')
+    if args.df_out:
+        with open(args.df_out, 'w') as f:
+            table = df_table(ss, docs)
+            json.dump(table, f)
+        logger.info(f'wrote document frequencies, out={args.df_out}, terms={len(table["df"])}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+import json
+from dataclasses import dataclass, replace
 from typing import Callable, Any
 
 import stops
@@ -17,6 +18,9 @@ class IndexParams:
     stop_terms: list[str] # terms in this list are removed during a terminal step in the pipeline
     stop_lines: list[str] #  lines that start with one of these regexes are ignored prior to tokenization
     stop_func: Callable[[Any], bool] # mail documents are not indexes that evaluate true
+    term_selection: str = 'first' # 'first' fills max_terms in field and position order, 'idf' keeps the rarest terms
+    term_df: dict[str, int] | None = None # document frequency by pipe-joined term, required for 'idf' selection
+    term_df_docs: int = 0 # number of mail documents term_df was counted over
 
 
 DEFAULT_PARAMS = IndexParams(
@@ -32,3 +36,15 @@ DEFAULT_PARAMS = IndexParams(
     stop_lines=stops.STOP_LINES,
     stop_func=stops.STOP_FUNC
 )
+
+
+def idf_params(df_path, max_terms=None, base=DEFAULT_PARAMS):
+    # df_path is a frequency table written by mine_stops.py --df_out: {"docs": N, "df": {"i|think": n, ...}}
+    with open(df_path) as f:
+        table = json.load(f)
+    return replace(
+        base,
+        term_selection='idf',
+        term_df=table['df'],
+        term_df_docs=table['docs'],
+        max_terms=max_terms or base.max_terms)
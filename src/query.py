@@ -0,0 +1,47 @@
+import re
+
+# Query-time subset of params.DEFAULT_PARAMS and indexer normalization.
+# server.py imports only this module so cold starts skip building stops.STOP_TERMS.
+# query_test.py asserts these stay in sync with stops.py and params.py.
+
+MAX_TOKEN_LENGTH = 100
+WORD_NGRAM_LIMIT = 3  # longest body phrase indexed as a term
+
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is", "it", "no",
+    "not", "of", "on", "or", "such", "that", "the", "their", "then", "there", "these", "they", "this", "to",
+    "was", "will", "with"})
+
+STOP_PREFIXES = ("http://", "https://")
+
+NON_WORD = re.compile(r'[^\w+#]+')
+
+
+def normalize(t):
+    # same as indexer.normalize, used for authorkey and emailkey
+    return NON_WORD.sub('', t.lower())
+
+
+WHITESPACE_SEPARATED = re.compile(r'\S+')
+
+
+def token_spans(text):
+    # (token, start, end) for each indexable whitespace-separated token, offsets into text
+    for m in WHITESPACE_SEPARATED.finditer(text):
+        t = m.group()
+        if len(t) > MAX_TOKEN_LENGTH:
+            continue
+        t = t.lower()
+        if t.startswith(STOP_PREFIXES):
+            continue
+        t = NON_WORD.sub('', t)
+        if t and t not in STOP_WORDS:
+            yield t, m.start(), m.end()
+
+
+def tokens(query):
+    return [t for t, _, _ in token_spans(query)]
+
+
+def term(query):
+    return '|'.join(tokens(query))
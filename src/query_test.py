@@ -0,0 +1,39 @@
+import unittest
+
+import query
+import stops
+from indexer import Indexer, normalize
+from params import DEFAULT_PARAMS
+
+
+class TestQuery(unittest.TestCase):
+    def test_constants(self):
+        self.assertEqual(query.MAX_TOKEN_LENGTH, DEFAULT_PARAMS.max_token_length)
+        self.assertEqual(query.WORD_NGRAM_LIMIT, DEFAULT_PARAMS.word_ngram_limit)
+        self.assertEqual(set(query.STOP_WORDS), set(stops.STOP_WORDS))
+        self.assertEqual(set(query.STOP_PREFIXES), set(stops.STOP_PREFIXES))
+
+    def test_term(self):
+        idx = Indexer(DEFAULT_PARAMS)
+        queries = [
+            'SSLSocket',
+            'virtual threads',
+            'JEP 444',
+            'The state of the Valhalla',
+            'java.util.concurrent',
+            'C++ and C#',
+            'https://openjdk.org/jeps/444 loom',
+            'x' * 101 + ' panama',
+            '  ',
+            '',
+        ]
+        for q in queries:
+            self.assertEqual(query.term(q), '|'.join(idx.normalize_and_filter(idx.tokenize(q))), q)
+
+    def test_normalize(self):
+        for s in ['Brian Goetz', 'brian.goetz@oracle.com', 'B. Goetz', '- -']:
+            self.assertEqual(query.normalize(s), normalize(s))
+
+
+if __name__ == '__main__':
+    unittest.main()
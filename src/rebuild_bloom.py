@@ -0,0 +1,100 @@
+import argparse
+import logging
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+import bloom
+import database
+import store
+
+logger = logging.getLogger(__name__)
+
+
+def init_logging():
+    root = logging.getLogger()
+    if root.handlers:
+        for handler in root.handlers:
+            root.removeHandler(handler)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] <%(threadName)s> %(levelname)s - %(message)s')
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Rebuild the Bloom filter of indexed terms")
+    p.add_argument("--store", required=True, help="s3://bucket/prefix or a local directory")
+    p.add_argument("--capacity", type=int, help="expected distinct keys, defaults to the number of scanned keys")
+    p.add_argument("--fpr", type=float, default=0.01)
+    p.add_argument("--segments", type=int, default=8)
+    p.add_argument("--probes", type=int, default=100_000)
+    p.add_argument("--dry_run", action="store_true")
+    return p.parse_args()
+
+
+def rebuild(db, capacity, fpr, segments, dry_run=False):
+    # bumped before the scan: a writer that started earlier bumps again when it finishes, so a filter missing its
+    # terms is never trusted; a dry run leaves the published filter valid
+    version = db.get_terms_epoch() if dry_run else db.bump_terms_epoch()
+
+    def scan_segment(segment):
+        # digests of each distinct list/term key and its term key; a scan returns the items of a partition together
+        digests = bytearray()
+        scanned = 0
+        previous = None
+        for item in db.scan(database.TABLE_TERMS, 'p', segment, segments):
+            list_term = item['p']['S']
+            if list_term != previous:
+                previous = list_term
+                digests += bloom.digest(list_term)
+                digests += bloom.digest(list_term[list_term.index('/') + 1:])
+            scanned += 1
+            if scanned % 1_000_000 == 0:
+                logger.info(f'scanning, segment={segment}, items={scanned}, keys={len(digests) // bloom.DIGEST_SIZE}')
+        return digests, scanned
+
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        results = list(executor.map(scan_segment, range(segments)))
+    scanned = sum(n for _, n in results)
+    # upper bound: term keys repeat across lists
+    capacity = capacity or max(1, sum(len(digests) for digests, _ in results) // bloom.DIGEST_SIZE)
+    bf = bloom.BloomFilter.for_capacity(capacity, fpr)
+    bf.version = version
+    logger.info(f'building filter, capacity={capacity}, fpr={fpr}, m={bf.m}, k={bf.k}, version={bf.version}')
+    for digests, _ in results:
+        for i in range(0, len(digests), bloom.DIGEST_SIZE):
+            key_digest = bytes(digests[i:i + bloom.DIGEST_SIZE])
+            if not bf.contains_digest(key_digest):  # keeps count close to the number of distinct keys
+                bf.add_digest(key_digest)
+    return bf, scanned
+
+
+def empirical_fpr(bf, probes):
+    # random keys are never indexed terms, so every hit is a false positive
+    hits = sum(1 for _ in range(probes) if f'~{secrets.token_hex(8)}' in bf)
+    return hits / probes if probes else 0.0
+
+
+def report(bf, scanned, probes):
+    logger.info(f'scanned items={scanned}, distinct keys={bf.count}')
+    logger.info(f'size={len(bf.bits) / 1024 ** 2:.1f}MiB, m={bf.m}, k={bf.k}, fill={bf.fill_ratio():.3f}')
+    logger.info(f'fpr expected={bf.expected_fpr():.5f}, observed={bf.observed_fpr():.5f}, '
+                f'empirical={empirical_fpr(bf, probes):.5f} over {probes} probes')
+
+
+def main():
+    init_logging()
+    args = parse_args()
+    logger.info(args)
+    db = database.Database(workers=0)
+    bf, scanned = rebuild(db, args.capacity, args.fpr, args.segments, args.dry_run)
+    report(bf, scanned, args.probes)
+    epoch = db.get_terms_epoch()
+    if epoch != bf.version:
+        logger.warning(f'terms written during the rebuild, not publishing, version={bf.version}, terms_epoch={epoch}')
+    elif not args.dry_run:
+        key = bloom.publish(store.open_store(args.store), bf)
+        logger.info(f'published filter, key={key}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Latest-mail queries over openjdk-mail-records and the API form of its items, shared by server.py and updater.py,
+# which publishes the latest feeds (see feeds.py) without loading the API module.
+
+TABLE_RECORDS = 'openjdk-mail-records'
+
+
+def query_latest(client, index, key_name, key_value, forward, limit, start_key=None, date_range=None):
+    params = {
+        "TableName": TABLE_RECORDS,
+        "IndexName": index,
+        "KeyConditionExpression": "#key = :key",
+        "ExpressionAttributeNames": {"#key": key_name},
+        "ExpressionAttributeValues": {":key": key_value},
+        "ScanIndexForward": forward,
+        "Limit": limit,
+    }
+    if date_range:
+        start_iso, end_iso = date_range
+        params["KeyConditionExpression"] += " AND #date BETWEEN :from AND :to"
+        params["ExpressionAttributeNames"]["#date"] = "date"
+        params["ExpressionAttributeValues"][":from"] = {"S": f"{start_iso}"}
+        params["ExpressionAttributeValues"][":to"] = {"S": f"{end_iso}\uffff"}
+    if start_key:
+        params["ExclusiveStartKey"] = start_key
+    res = client.query(**params)
+    return res["Items"], res.get("LastEvaluatedKey")
+
+
+def latest_mail(client, list_name, forward, limit, start_key=None, date_range=None):
+    return query_latest(client, "list_date", "list", {"S": list_name}, forward, limit, start_key, date_range)
+
+
+def latest_mail_global(client, forward, limit, start_key=None, date_range=None):
+    return query_latest(client, "datekey_date", "datekey", {"N": '1'}, forward, limit, start_key, date_range)
+
+
+def convert_item(item):
+    return {
+        'list': item['list']['S'],
+        'month': item['month']['S'],
+        'id': item['id']['S'],
+        'date': item['date']['S'],
+        'author': item['author']['S'],
+        'email': item['email']['S'],
+        'subject': item['subject']['S'],
+        **{k: item[k]['S'] for k in ('parent', 'root') if k in item}
+    }
+
+
+def convert(items):
+    return [convert_item(i) for i in items]
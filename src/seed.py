@@ -6,6 +6,7 @@ from itertools import batched
 
 import database
 import mail
+import metrics
 import params
 import task
 
@@ -28,13 +29,24 @@ def parse_args():
     p.add_argument("--db_workers", type=int, default=10)
     p.add_argument("--mail_workers", type=int, default=20)
     p.add_argument("--throttle_sleep", type=int, default=1.6)
+    p.add_argument("--denormalize_terms", action="store_true")
+    p.add_argument("--term_stats", action="store_true")
+    p.add_argument("--author_counts", action="store_true", help="count messages per author for build_authors.py")
+    p.add_argument("--store_bodies", action="store_true", help="store compressed filtered bodies for /mail/bodies")
+    p.add_argument("--term_df", help="frequency table from mine_stops.py --df_out, enables idf term selection")
+    p.add_argument("--max_terms", type=int)
+    p.add_argument("--metrics", choices=["emf", "prometheus"], help="emit metrics after each batch")
+    p.add_argument("--metrics_file", default="seed.prom", help="Prometheus text file for --metrics prometheus")
     return p.parse_args()
 
 
-def index(list_name, db_workers, mail_workers, throttle_sleep):
+def index(list_name, db_workers, mail_workers, throttle_sleep, denormalize_terms=False, term_stats=False,
+          index_params=params.DEFAULT_PARAMS, author_counts=False, store_bodies=False, metrics_output=None,
+          metrics_file=None):
     executor = ThreadPoolExecutor(max_workers=mail_workers)
 
-    db = database.Database(db_workers)
+    db = database.Database(db_workers, denormalize_terms=denormalize_terms, term_stats=term_stats,
+                           author_counts=author_counts, store_bodies=store_bodies)
     month, id = db.get_checkpoint(list_name)
     logger.info(f'loaded checkpoint, month={month}, id={id}')
 
@@ -42,21 +54,32 @@ def index(list_name, db_workers, mail_workers, throttle_sleep):
     ml = mail.MailingList(mail.http_session(mail_workers), list_name, cp)
 
     def fn(mail_url):
-        return task.process_mail(ml, db, mail_url, params.DEFAULT_PARAMS)
+        return task.process_mail(ml, db, mail_url, index_params)
 
     for batch in batched(ml.mail_urls(), mail_workers):
+        db.bump_terms_epoch()  # invalidates the published Bloom filter, see rebuild_bloom.py
         mails = list(executor.map(fn, batch))
         last_mail = mails[-1]
+        if term_stats:
+            keys = db.flush_term_stats()
+            logger.info(f'flushed term stats, keys={keys}')
+        if author_counts:
+            keys = db.flush_author_counts()
+            logger.info(f'flushed author counts, keys={keys}')
         db.put_checkpoint(last_mail.list, last_mail.month, last_mail.id)
         logger.info(f'store checkpoint, month={last_mail.month}, id={last_mail.id}')
+        metrics.flush(metrics_output, {'Service': 'seed', 'List': list_name}, metrics_file)
         time.sleep(throttle_sleep)
+    db.bump_terms_epoch()  # again after the last batch, for a filter rebuilt while it was written
 
 
 def main():
     init_logging()
     args = parse_args()
     logger.info(args)
-    index(args.list, args.db_workers, args.mail_workers, args.throttle_sleep)
+    index_params = params.idf_params(args.term_df, args.max_terms) if args.term_df else params.DEFAULT_PARAMS
+    index(args.list, args.db_workers, args.mail_workers, args.throttle_sleep, args.denormalize_terms,
+          args.term_stats, index_params, args.author_counts, args.store_bodies, args.metrics, args.metrics_file)
 
 
 if __name__ == '__main__':
@@ -1,21 +1,103 @@
 import base64
+import hashlib
 import json
 import re
+import threading
+import time
 import urllib.parse
-from typing import NamedTuple  # Added this import
-
-import boto3
-
-import indexer
-from params import DEFAULT_PARAMS
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, NamedTuple
+
+import authors
+import bloom
+import bodies
+import feeds
+import metrics
+import query
+import records
+import store
+import suggest
+from cache import DynamoDBStore, LRUCache, ResultCache
 
 TABLE_RECORDS = 'openjdk-mail-records'
 TABLE_TERMS = 'openjdk-mail-terms'
 TABLE_STATUS = 'openjdk-mail-status'
+TABLE_TERM_STATS = 'openjdk-mail-term-stats'
+TABLE_BODIES = 'openjdk-mail-bodies'
+
+DOCS_KEY = '!docs'  # term stats key holding the number of indexed mails, see database.py
+LIST_STATUS_PREFIX = 'list:'  # status item attributes holding per-list status, see database.py
+TERMS_EPOCH = 'terms_epoch'  # status item attribute a Bloom filter's version must match, see database.py
 
 REGION = 'us-west-1'
 
-client = boto3.client('dynamodb', region_name=REGION)
+CACHE_MAX_ENTRIES = 2048
+CACHE_MAX_AGE = 60  # Cache-Control max-age in seconds for CloudFront and browsers
+CACHE_TABLE = None  # e.g. 'openjdk-mail-cache', enables the shared store
+STATUS_TTL = 30  # seconds between last_update version checks
+LIST_STALL_SECONDS = 3600  # a list not checked for this long is reported as stalled
+PREFETCH_NEXT_PAGE = False  # produce the page behind each returned cursor in the background
+PREFETCH_TTL = 30  # seconds a prefetched page waits for its request
+PREFETCH_WAIT = 5  # seconds a request waits for its page to finish prefetching before querying itself
+TERM_STATS_ENABLED = False  # report openjdk-mail-term-stats document frequencies as search totals
+ARTIFACT_STORE = None  # e.g. 's3://openjdk-mail-artifacts', where rebuild_bloom.py and updater.py publish
+SUGGEST_DIR = '/tmp'  # local copy of the suggest artifact, memory-mapped and kept across warm invocations
+SUGGEST_TTL = 3600  # seconds between checks for a newly published suggest artifact
+AUTHORS_TTL = 300  # seconds between checks for a newly published author directory
+FEEDS_TTL = 60  # seconds between store reads of a latest feed that does not match last_update
+THREAD_MAX_ITEMS = 500  # default and maximum page size of /threads, large enough for nearly every thread
+BODIES_MAX_ITEMS = 50
+BODY_MAX_CHARS = 20_000  # default per-body content limit, callers may ask for up to BODY_MAX_CHARS * 5
+# encoded JSON bytes per response; items past it add only their metadata, which fits in the 1MB Lambda@Edge limit
+BODIES_MAX_BYTES = 900_000
+BODIES_MAX_AGE = 86400  # stored bodies never change
+MAX_MATCHES = 50
+SUGGEST_MAX_AGE = 3600  # Cache-Control max-age for suggestions, which only change when build_suggest.py runs
+
+BATCH_MAX_QUERIES = 20
+
+EXPORT_PAGE_SIZE = 100  # batch_get_item takes at most 100 keys
+EXPORT_MAX_ITEMS = 10_000
+EXPORT_MAX_BYTES = 600_000  # gzip bytes; with base64 and one more page this stays under the 1MB Lambda@Edge limit
+
+METRICS_OUTPUT = None  # 'emf' prints CloudWatch embedded metric format lines, see metrics.py
+METRICS_FLUSH_INTERVAL = 60  # seconds
+
+MAX_POOL_CONNECTIONS = 20  # also the number of batch query threads, so each can hold a connection
+CONNECT_TIMEOUT = 2
+READ_TIMEOUT = 5
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def dynamodb():
+    # boto3 import and client construction dominate cold starts, so defer until a handler needs them
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import boto3
+                from botocore.config import Config
+                config = Config(
+                    tcp_keepalive=True,
+                    max_pool_connections=MAX_POOL_CONNECTIONS,
+                    connect_timeout=CONNECT_TIMEOUT,
+                    read_timeout=READ_TIMEOUT,
+                    retries={'max_attempts': 3, 'mode': 'standard'})
+                _client = metrics.instrument_client(boto3.client('dynamodb', region_name=REGION, config=config))
+    return _client
+
+
+result_cache = ResultCache(
+    LRUCache(CACHE_MAX_ENTRIES),
+    DynamoDBStore(dynamodb, CACHE_TABLE) if CACHE_TABLE else None)
+
+# versioned cache key -> Future of the response body, see prefetch_next_page
+prefetch_cache = LRUCache(CACHE_MAX_ENTRIES // 4, ttl=PREFETCH_TTL)
+prefetch_lock = threading.Lock()
 
 
 class CommonParams(NamedTuple):
@@ -30,6 +112,8 @@ class Request(NamedTuple):
     uri: str
     query: str
     params: dict[str, list[str]]
+    headers: dict[str, str]
+    body: bytes = b''
 
     def uri_with_query(self):
         return f'{self.uri}?{self.query}' if self.query else self.uri
@@ -41,7 +125,12 @@ class Request(NamedTuple):
         uri = request['uri']
         query = request['querystring'] if 'querystring' in request else ''
         params = urllib.parse.parse_qs(query)
-        return Request(method=method, uri=uri, query=query, params=params)
+        headers = {k: v[0]['value'] for k, v in request.get('headers', {}).items() if v}
+        # present when the Lambda@Edge association includes the body
+        body = request.get('body') or {}
+        data = body.get('data', '')
+        body = base64.b64decode(data) if body.get('encoding') == 'base64' else data.encode('utf-8')
+        return Request(method=method, uri=uri, query=query, params=params, headers=headers, body=body)
 
 
 def search_mail(list_name, term, cp: CommonParams):
@@ -65,7 +154,7 @@ def search_mail(list_name, term, cp: CommonParams):
         params['ExpressionAttributeValues'][':to'] = {'S': end_sk}
     if cp.start_key:
         params['ExclusiveStartKey'] = cp.start_key
-    res = client.query(**params)
+    res = dynamodb().query(**params)
     return res['Items'], res.get('LastEvaluatedKey')
 
 
@@ -87,7 +176,7 @@ def search_mail_global(term, cp: CommonParams):
         params["ExpressionAttributeValues"][":to"] = {"S": f"{end_iso}\uffff"}
     if cp.start_key:
         params['ExclusiveStartKey'] = cp.start_key
-    res = client.query(**params)
+    res = dynamodb().query(**params)
     return res['Items'], res.get('LastEvaluatedKey')
 
 
@@ -108,72 +197,73 @@ def mail_keys_from_search_items(items):
     return [mail_key_from_search_item(item) for item in items]
 
 
+def is_denormalized(item):
+    return 'a' in item and 'e' in item and 'j' in item
+
+
+def mail_from_search_item(item):
+    # term items written with Database(denormalize_terms=True) carry the display fields
+    list_term = item['p']['S']
+    date, month, mail_id = item['s']['S'].split('/')
+    return {
+        'list': {'S': list_term[:list_term.index('/')]},
+        'month': {'S': month},
+        'id': {'S': mail_id},
+        'date': {'S': date},
+        'author': item['a'],
+        'email': item['e'],
+        'subject': item['j'],
+    }
+
+
 def get_mail(search_items):
-    keys = mail_keys_from_search_items(search_items)
+    mails = [mail_from_search_item(item) if is_denormalized(item) else None for item in search_items]
+    pending = [item for item, mail in zip(search_items, mails) if mail is None]
+    keys = mail_keys_from_search_items(pending)
     if not keys:
-        return []
-    res = client.batch_get_item(
-        RequestItems={
-            TABLE_RECORDS: {
-                'Keys': keys
-            }
-        }
-    )
-    mails = []
+        return mails
+    record_items = []
+    request = {TABLE_RECORDS: {'Keys': keys}}
+    while request:  # throttled reads come back as UnprocessedKeys
+        res = dynamodb().batch_get_item(RequestItems=request)
+        record_items.extend(res['Responses'][TABLE_RECORDS])
+        request = res.get('UnprocessedKeys')
+    fetched = []
     for key in keys:
         found = False
-        for item in res['Responses'][TABLE_RECORDS]:
+        for item in record_items:
             if item['list'] == key['list'] and item['month_id'] == key['month_id']:
-                mails.append(item)
+                fetched.append(item)
                 found = True
                 break
         if not found:
             raise Exception(f'item key not found, list={key["list"]}, month_id={key["month_id"]}')
-    return mails
+    it = iter(fetched)
+    return [mail if mail is not None else next(it) for mail in mails]
 
 
 def latest_mail(list_name, cp: CommonParams):
+    return records.latest_mail(dynamodb(), list_name, cp.forward, cp.limit, cp.start_key, cp.date_range)
+
+
+def thread_mail(list_name, root, cp: CommonParams):
     params = {
         "TableName": TABLE_RECORDS,
-        "IndexName": "list_date",
-        "KeyConditionExpression": "#list = :list",
-        "ExpressionAttributeNames": {"#list": "list"},
-        "ExpressionAttributeValues": {":list": {"S": list_name}},
+        "IndexName": "thread_date",
+        "KeyConditionExpression": "#thread = :thread",
+        "ExpressionAttributeNames": {"#thread": "thread"},
+        "ExpressionAttributeValues": {":thread": {"S": f"{list_name}/{root}"}},
         "ScanIndexForward": cp.forward,
         "Limit": cp.limit,
     }
-    if cp.date_range:
-        start_iso, end_iso = cp.date_range
-        params["KeyConditionExpression"] += " AND #date BETWEEN :from AND :to"
-        params["ExpressionAttributeNames"]["#date"] = "date"
-        params["ExpressionAttributeValues"][":from"] = {"S": f"{start_iso}"}
-        params["ExpressionAttributeValues"][":to"] = {"S": f"{end_iso}\uffff"}
     if cp.start_key:
         params["ExclusiveStartKey"] = cp.start_key
-    res = client.query(**params)
+    res = dynamodb().query(**params)
     return res["Items"], res.get("LastEvaluatedKey")
 
 
 def latest_mail_global(cp: CommonParams):
-    params = {
-        "TableName": TABLE_RECORDS,
-        "IndexName": "datekey_date",
-        "KeyConditionExpression": "#datekey = :dk",
-        "ExpressionAttributeNames": {"#datekey": "datekey"},
-        "ExpressionAttributeValues": {":dk": {"N": '1'}},
-        "ScanIndexForward": cp.forward,
-        "Limit": cp.limit,
-    }
-    if cp.date_range:
-        start_iso, end_iso = cp.date_range
-        params["KeyConditionExpression"] += " AND #date BETWEEN :from AND :to"
-        params["ExpressionAttributeNames"]["#date"] = "date"
-        params["ExpressionAttributeValues"][":from"] = {"S": f"{start_iso}"}
-        params["ExpressionAttributeValues"][":to"] = {"S": f"{end_iso}\uffff"}
-    if cp.start_key:
-        params["ExclusiveStartKey"] = cp.start_key
-    res = client.query(**params)
-    return res["Items"], res.get("LastEvaluatedKey")
+    return records.latest_mail_global(dynamodb(), cp.forward, cp.limit, cp.start_key, cp.date_range)
 
 
 def mail_by_author(list_name, authorkey, cp: CommonParams):
@@ -203,7 +293,7 @@ def mail_by_author(list_name, authorkey, cp: CommonParams):
     if cp.start_key:
         params['ExclusiveStartKey'] = cp.start_key
 
-    res = client.query(**params)
+    res = dynamodb().query(**params)
     return res['Items'], res.get('LastEvaluatedKey')
 
 
@@ -234,7 +324,7 @@ def mail_by_email(list_name, emailkey, cp: CommonParams):
     if cp.start_key:
         params['ExclusiveStartKey'] = cp.start_key
 
-    res = client.query(**params)
+    res = dynamodb().query(**params)
     return res['Items'], res.get('LastEvaluatedKey')
 
 
@@ -259,7 +349,7 @@ def mail_by_author_global(authorkey, cp: CommonParams):
     if cp.start_key:
         params['ExclusiveStartKey'] = cp.start_key
 
-    res = client.query(**params)
+    res = dynamodb().query(**params)
     return res['Items'], res.get('LastEvaluatedKey')
 
 
@@ -284,42 +374,216 @@ def mail_by_email_global(emailkey, cp: CommonParams):
     if cp.start_key:
         params['ExclusiveStartKey'] = cp.start_key
 
-    res = client.query(**params)
+    res = dynamodb().query(**params)
     return res['Items'], res.get('LastEvaluatedKey')
 
 
 def get_status():
-    response = client.get_item(
+    response = dynamodb().get_item(
         TableName=TABLE_STATUS,
-        Key={"pk": {"N": "1"}}
+        Key={"pk": {"N": "1"}},
+        # the item also holds per-list status, see get_list_status
+        ProjectionExpression=f'last_check, last_update, {TERMS_EPOCH}'
     )
 
     item = response.get("Item", {})
     last_check = item.get("last_check", {}).get("S")
     last_update = item.get("last_update", {}).get("S")
-    return last_check, last_update
-
-
-def convert_item(item):
-    return {
-        'list': item['list']['S'],
-        'month': item['month']['S'],
-        'id': item['id']['S'],
-        'date': item['date']['S'],
-        'author': item['author']['S'],
-        'email': item['email']['S'],
-        'subject': item['subject']['S'],
-    }
-
-
-def convert(items):
-    return [convert_item(i) for i in items]
+    terms_epoch = item.get(TERMS_EPOCH, {}).get("N", "0")
+    return last_check, last_update, terms_epoch
+
+
+def get_list_status():
+    # per-list maps written by updater.py, see database.Database.update_status
+    item = dynamodb().get_item(TableName=TABLE_STATUS, Key={"pk": {"N": "1"}}).get('Item', {})
+    lists = {}
+    for k, v in item.items():
+        if k.startswith(LIST_STATUS_PREFIX):
+            lists[k[len(LIST_STATUS_PREFIX):]] = {f: int(a['N']) if 'N' in a else a['S'] for f, a in v['M'].items()}
+    now = time.time()
+    for status in lists.values():
+        checked = datetime.strptime(status['checked'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+        status['stalled'] = bool(status.get('error') or status.get('backlog') or
+                                 now - checked.timestamp() > LIST_STALL_SECONDS)
+    return dict(sorted(lists.items()))
+
+
+_status_version = {'value': None, 'terms_epoch': None, 'expires': 0.0}
+
+
+def status_version():
+    # last_update only moves when updater.py indexes new mail, so it versions every cached result
+    now = time.monotonic()
+    if _status_version['expires'] < now:
+        _, last_update, terms_epoch = get_status()
+        _status_version['value'] = last_update
+        _status_version['terms_epoch'] = terms_epoch
+        _status_version['expires'] = now + STATUS_TTL
+    return _status_version['value']
+
+
+_bloom = {'filter': None, 'checked': 0.0}
+
+
+def term_filter():
+    # returns the published Bloom filter of indexed terms, or None unless it covers the current terms epoch;
+    # every writer bumps the epoch before writing terms, so a filter missing some never matches
+    if not ARTIFACT_STORE:
+        return None
+    status_version()
+    version = _status_version['terms_epoch']
+    bf = _bloom['filter']
+    now = time.monotonic()
+    if (bf is None or bf.version != version) and _bloom['checked'] < now:
+        _bloom['checked'] = now + STATUS_TTL
+        try:
+            bf = _bloom['filter'] = bloom.load(store.open_store(ARTIFACT_STORE)) or bf
+        except Exception as e:
+            print(f'bloom filter load failed, error={e}')
+    if bf is None or bf.version != version:
+        return None
+    return bf
+
+
+_suggest = {'index': None, 'checked': 0.0}
+
+
+def suggest_index():
+    if not ARTIFACT_STORE:
+        return None
+    now = time.monotonic()
+    if _suggest['checked'] < now:
+        _suggest['checked'] = now + SUGGEST_TTL
+        try:
+            _suggest['index'] = suggest.load(store.open_store(ARTIFACT_STORE), SUGGEST_DIR) or _suggest['index']
+        except Exception as e:
+            print(f'suggest index load failed, error={e}')
+    return _suggest['index']
+
+
+_authors = {'directory': None, 'checked': 0.0}
+
+
+def author_directory():
+    if not ARTIFACT_STORE:
+        return None
+    now = time.monotonic()
+    if _authors['checked'] < now:
+        _authors['checked'] = now + AUTHORS_TTL
+        try:
+            # the pointer is tiny, the directory is only fetched again when its version moved
+            artifacts = store.open_store(ARTIFACT_STORE)
+            directory = _authors['directory']
+            pointer = json.loads(artifacts.get(authors.ARTIFACT_POINTER) or 'null')
+            if pointer and (directory is None or directory.version != pointer['version']):
+                _authors['directory'] = authors.load(artifacts) or directory
+        except Exception as e:
+            print(f'author directory load failed, error={e}')
+    return _authors['directory']
+
+
+_feeds = {}  # list name, None for the global feed -> {'feed': ..., 'checked': ...}
+
+
+def latest_feed(list_name):
+    # first page of the latest feed published by updater.py, None unless it was rendered for the current last_update
+    if not ARTIFACT_STORE:
+        return None
+    version = status_version()
+    entry = _feeds.setdefault(list_name, {'feed': None, 'checked': 0.0})
+    now = time.monotonic()
+    if (entry['feed'] is None or entry['feed']['version'] != version) and entry['checked'] < now:
+        entry['checked'] = now + FEEDS_TTL
+        try:
+            entry['feed'] = feeds.load(store.open_store(ARTIFACT_STORE), list_name) or entry['feed']
+        except Exception as e:
+            print(f'feed load failed, list={list_name}, error={e}')
+    feed = entry['feed']
+    return feed if feed and version and feed['version'] == version else None
+
+
+def may_have_results(list_name, term):
+    if not term:
+        return False
+    bf = term_filter()
+    return bf is None or (f'{list_name}/{term}' if list_name else term) in bf
+
+
+stats_cache = LRUCache(CACHE_MAX_ENTRIES * 4)
+
+
+def get_term_stats(keys):
+    stats = {}
+    for i in range(0, len(keys), 100):
+        request = {
+            TABLE_TERM_STATS: {
+                'Keys': [{'p': {'S': k}} for k in keys[i:i + 100]],
+                'ProjectionExpression': '#p, #n',
+                'ExpressionAttributeNames': {'#p': 'p', '#n': 'n'}
+            }
+        }
+        # throttled keys come back unprocessed, reading them as absent would cache a zero frequency
+        while request:
+            res = dynamodb().batch_get_item(RequestItems=request)
+            for item in res['Responses'].get(TABLE_TERM_STATS, []):
+                stats[item['p']['S']] = int(item['n']['N'])
+            request = res.get('UnprocessedKeys')
+    return stats
+
+
+def get_bodies(keys):
+    # compressed bodies by (list, month_id), absent for mail indexed without Database(store_bodies=True)
+    found = {}
+    for i in range(0, len(keys), 100):
+        request = {TABLE_BODIES: {'Keys': keys[i:i + 100]}}
+        while request:
+            res = dynamodb().batch_get_item(RequestItems=request)
+            for item in res['Responses'].get(TABLE_BODIES, []):
+                found[(item['list']['S'], item['month_id']['S'])] = item['b']['B']
+            request = res.get('UnprocessedKeys')
+    return found
+
+
+def term_stats(keys):
+    # document frequencies by stats key, absent keys count zero; cached per last_update version
+    version = status_version()
+    result = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        df = stats_cache.get(f'{version}/{key}')
+        if df is None:
+            missing.append(key)
+        else:
+            result[key] = df
+    if missing:
+        fetched = get_term_stats(missing)
+        for key in missing:
+            result[key] = fetched.get(key, 0)
+            stats_cache.put(f'{version}/{key}', result[key])
+    return result
+
+
+def stats_key(list_name, term):
+    return f'{list_name}/{term}' if list_name else term
+
+
+def search_total(list_name, term):
+    return term_stats([stats_key(list_name, term)])[stats_key(list_name, term)]
 
 
 def to_json_string(val):
     return json.dumps(val, separators=(',', ':'))
 
 
+def fit_json_string(text, limit):
+    # longest prefix of text whose JSON encoding, quotes and \uXXXX escapes included, takes at most limit bytes
+    size = len(to_json_string(text))
+    while size > limit and text:
+        text = text[:max(0, min(len(text) - 1, len(text) * limit // size))]
+        size = len(to_json_string(text))
+    return text
+
+
 def _b64e(d: dict) -> str:
     return base64.urlsafe_b64encode(to_json_string(d).encode("utf-8")).decode("ascii")
 
@@ -328,29 +592,131 @@ def _b64d(s: str) -> dict:
     return json.loads(base64.urlsafe_b64decode(s.encode("ascii")).decode("utf-8"))
 
 
-def to_response_string(val, cursor):
+def to_response_string(val, cursor, extra=None):
     res = {"items": val}
     if cursor:
         res["cursor"] = _b64e(cursor)
+    if extra:
+        res.update(extra)
     return to_json_string(res)
 
 
-def to_json_response(body):
+def to_headers(headers: dict[str, str]):
+    return {k.lower(): [{'key': k, 'value': v}] for k, v in headers.items()}
+
+
+def to_json_response(body, headers=None):
     return {
         'status': '200',
         'statusDescription': 'OK',
-        'headers': {
-            'content-type': [
-                {
-                    'key': 'Content-Type',
-                    'value': 'application/json'
-                }
-            ]
-        },
+        'headers': to_headers({'Content-Type': 'application/json', **(headers or {})}),
         'body': body
     }
 
 
+def to_not_modified_response(headers):
+    return {
+        'status': '304',
+        'statusDescription': 'Not Modified',
+        'headers': to_headers(headers)
+    }
+
+
+def cache_key(cp: CommonParams, *parts):
+    return to_json_string([*parts, cp.forward, cp.limit, cp.date_range, cp.start_key])
+
+
+def cached_json_response(r: Request, cp: CommonParams, parts, produce):
+    # produce(cp) returns the response body for one page; parts identify the query apart from cp
+    version = status_version()
+    key = cache_key(cp, *parts)
+    body = None
+    if version:
+        key = f'{version}/{key}'
+        body = result_cache.get(key)
+        if body is None and cp.start_key:
+            body = prefetched(key)
+    if body is None:
+        with metrics.timer('produce'):
+            body = produce(cp)
+        if version:
+            result_cache.put(key, body)
+    if PREFETCH_NEXT_PAGE and version:
+        prefetch_next_page(version, cp, parts, produce, body)
+    headers = {
+        'ETag': f'"{hashlib.sha1(body.encode("utf-8")).hexdigest()}"',
+        'Cache-Control': f'public, max-age={CACHE_MAX_AGE}'
+    }
+    if r.headers.get('if-none-match') == headers['ETag']:
+        return to_not_modified_response(headers)
+    return to_json_response(body, headers)
+
+
+def prefetch_next_page(version, cp: CommonParams, parts, produce, body):
+    # most clients ask for the page behind the cursor next, so start producing it now; the result is kept
+    # under the cache key that request will compute, as a future it can wait on
+    cursor = json.loads(body).get('cursor')
+    if not cursor:
+        return
+    next_cp = cp._replace(start_key=_b64d(cursor))
+    key = f'{version}/{cache_key(next_cp, *parts)}'
+    with prefetch_lock:
+        if key in prefetch_cache or key in result_cache.local:
+            return
+        # not traced: the work belongs to the request that will ask for the page, not to this one
+        prefetch_cache.put(key, executor('prefetch').submit(produce, next_cp))
+
+
+def prefetched(key):
+    future = prefetch_cache.get(key)
+    if future is None:
+        return None
+    try:
+        body = future.result(timeout=PREFETCH_WAIT)
+    except Exception as e:
+        print(f'prefetch failed, error={e!r}')
+        return None
+    result_cache.put(key, body)
+    return body
+
+
+def export_max_items(r: Request):
+    return max(1, min(EXPORT_MAX_ITEMS, extract_param(r.params, 'max_items', EXPORT_MAX_ITEMS, int)))
+
+
+def export_response(cp: CommonParams, max_items, query_page, resolve=None):
+    # format=ndjson: pages through DynamoDB server-side, querying page N+1 while page N is resolved, converted
+    # and compressed; stops at max_items or EXPORT_MAX_BYTES and hands back the cursor to continue from
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip container
+    chunks = []
+    size = 0
+    count = 0
+    future = metrics.submit(executor('export'), query_page, cp._replace(limit=min(EXPORT_PAGE_SIZE, max_items)))
+    while future:
+        items, start_key = future.result()
+        count += len(items)
+        future = None
+        if start_key and count < max_items and size < EXPORT_MAX_BYTES:
+            page_cp = cp._replace(start_key=start_key, limit=min(EXPORT_PAGE_SIZE, max_items - count))
+            future = metrics.submit(executor('export'), query_page, page_cp)
+        lines = ''.join(to_json_string(m) + '\n' for m in records.convert(resolve(items) if resolve else items))
+        # a sync flush per page keeps size exact and lets clients decode complete lines as they arrive
+        chunk = gz.compress(lines.encode('utf-8')) + gz.flush(zlib.Z_SYNC_FLUSH)
+        chunks.append(chunk)
+        size += len(chunk)
+    chunks.append(gz.flush())
+    headers = {'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip', 'X-Item-Count': str(count)}
+    if start_key:
+        headers['X-Next-Cursor'] = _b64e(start_key)
+    return {
+        'status': '200',
+        'statusDescription': 'OK',
+        'headers': to_headers(headers),
+        'bodyEncoding': 'base64',
+        'body': base64.b64encode(b''.join(chunks)).decode('ascii')
+    }
+
+
 def extract_param(params, name, default=None, func=None):
     if name not in params:
         return default
@@ -375,64 +741,378 @@ def common_params(params: dict[str, list[str]]):
     return CommonParams(forward=forward, limit=limit, start_key=start_key, date_range=date_range)
 
 
-def lambda_handler(event, context):
-    r = Request.new(event)
-    print(f'method={r.method}, path={r.uri_with_query()}')
+def handle_search(r: Request, cp: CommonParams, list_name=None):
+    term = query.term(extract_param(r.params, 'q'))
+
+    if extract_param(r.params, 'format') == 'ndjson':
+        def query_page(page_cp):
+            if list_name:
+                return search_mail(list_name, term, page_cp)
+            return search_mail_global(term, page_cp)
+
+        if not may_have_results(list_name, term):
+            return export_response(cp, 0, lambda page_cp: ([], None))
+        return export_response(cp, export_max_items(r), query_page, get_mail)
+
+    def produce(cp: CommonParams):
+        if not may_have_results(list_name, term):
+            return to_response_string([], None)
+        extra = {}
+        # a zero count may be mail indexed without term stats, so only the Bloom filter rules a term out
+        if TERM_STATS_ENABLED and (total := search_total(list_name, term)):
+            extra['total'] = total
+        if list_name:
+            items, start_key = search_mail(list_name, term, cp)
+        else:
+            items, start_key = search_mail_global(term, cp)
+        return to_response_string(records.convert(get_mail(items)), start_key, extra)
+
+    return cached_json_response(r, cp, ('search', list_name, term), produce)
+
+
+def handle_latest(r: Request, cp: CommonParams, list_name=None):
+    if extract_param(r.params, 'format') == 'ndjson':
+        def query_page(page_cp):
+            return latest_mail(list_name, page_cp) if list_name else latest_mail_global(page_cp)
+
+        return export_response(cp, export_max_items(r), query_page)
+
+    def produce(cp: CommonParams):
+        feed = latest_feed(list_name) if not cp.forward and not cp.date_range else None
+        if feed and (page := feeds.page(feed, cp.start_key, cp.limit)):
+            return to_response_string(*page)
+        if list_name:
+            items, start_key = latest_mail(list_name, cp)
+        else:
+            items, start_key = latest_mail_global(cp)
+        return to_response_string(records.convert(items), start_key)
+
+    return cached_json_response(r, cp, ('latest', list_name), produce)
+
+
+def resolve_param(r: Request):
+    return extract_param(r.params, 'resolve', False, lambda p: p in ('1', 'true'))
+
+
+def handle_by_author(r: Request, cp: CommonParams, list_name=None):
+    authorkey = query.normalize(extract_param(r.params, 'author'))
+    extra = {}
+    if resolve_param(r) and (directory := author_directory()):
+        extra['resolved'] = authorkey = directory.resolve_author(authorkey)
+
+    def produce(cp: CommonParams):
+        if list_name:
+            items, start_key = mail_by_author(list_name, authorkey, cp)
+        else:
+            items, start_key = mail_by_author_global(authorkey, cp)
+        return to_response_string(records.convert(items), start_key, extra)
+
+    return cached_json_response(r, cp, ('byauthor', list_name, authorkey, bool(extra)), produce)
+
+
+def handle_by_email(r: Request, cp: CommonParams, list_name=None):
+    emailkey = query.normalize(extract_param(r.params, 'email'))
+    extra = {}
+    if resolve_param(r) and (directory := author_directory()):
+        extra['resolved'] = emailkey = directory.resolve_email(emailkey)
+
+    def produce(cp: CommonParams):
+        if list_name:
+            items, start_key = mail_by_email(list_name, emailkey, cp)
+        else:
+            items, start_key = mail_by_email_global(emailkey, cp)
+        return to_response_string(records.convert(items), start_key, extra)
+
+    return cached_json_response(r, cp, ('byemail', list_name, emailkey, bool(extra)), produce)
+
+
+def handle_bodies(r: Request, cp: CommonParams):
+    # ids=list/month/id,list/month/id; q adds match offsets and snippets; content=0 returns snippets only
+    ids = []
+    for mail_id in extract_param(r.params, 'ids', '').split(','):
+        parts = mail_id.split('/')
+        if len(parts) == 3 and all(parts) and mail_id not in ids:
+            ids.append(mail_id)
+    ids = ids[:BODIES_MAX_ITEMS]
+    q = extract_param(r.params, 'q', '')
+    include_content = extract_param(r.params, 'content', True, lambda p: p not in ('0', 'false'))
+    max_chars = max(1, min(BODY_MAX_CHARS * 5, extract_param(r.params, 'max_chars', BODY_MAX_CHARS, int)))
+    keys = [{'list': {'S': i.split('/')[0]}, 'month_id': {'S': i.split('/', 1)[1]}} for i in ids]
+    found = get_bodies(keys) if keys else {}
+    budget = BODIES_MAX_BYTES - len(to_json_string({'items': []}))
+    items = []
+    for mail_id in ids:
+        list_name, month, id_str = mail_id.split('/')
+        item = {'list': list_name, 'month': month, 'id': id_str, 'found': False}
+        items.append(item)
+        data = found.get((list_name, f'{month}/{id_str}'))
+        if data is None:
+            budget -= len(to_json_string(item)) + 1
+            continue
+        text = bodies.decompress(data)
+        item['found'] = True
+        item['length'] = len(text)
+        if q:
+            matches = bodies.find_matches(text, q)
+            item['matches'] = [list(m) for m in matches[:MAX_MATCHES]]
+            item['snippets'] = bodies.snippets(text, matches)
+        if include_content:
+            item['content'] = ''
+            item['truncated'] = True
+            # what the item takes without content; the content gets what is left of the budget
+            available = budget - len(to_json_string(item)) - 1
+            content = fit_json_string(text[:max_chars], available)
+            item['content'] = content
+            item['truncated'] = len(content) < len(text)
+        budget -= len(to_json_string(item)) + 1  # and the separating comma
+    max_age = BODIES_MAX_AGE if all(item['found'] for item in items) else CACHE_MAX_AGE
+    return to_json_response(to_json_string({'items': items}), {'Cache-Control': f'public, max-age={max_age}'})
+
+
+def handle_thread(r: Request, cp: CommonParams, list_name, root):
+    # oldest first and one page for the whole thread unless asked otherwise
+    cp = cp._replace(
+        forward=extract_param(r.params, 'order', True, lambda p: p != 'desc'),
+        limit=max(1, min(THREAD_MAX_ITEMS, extract_param(r.params, 'limit', THREAD_MAX_ITEMS, int))))
+
+    def produce(cp: CommonParams):
+        items, start_key = thread_mail(list_name, root, cp)
+        return to_response_string(records.convert(items), start_key)
+
+    return cached_json_response(r, cp, ('thread', list_name, root), produce)
+
+
+def handle_term_stats(r: Request, cp: CommonParams, list_name=None):
+    term = query.term(extract_param(r.params, 'q'))
+    tokens = term.split('|') if term else []
+    terms = [term, *tokens] if len(tokens) > 1 else tokens
+    stats = term_stats([stats_key(list_name, t) for t in [DOCS_KEY, *terms]])
+    docs = stats[stats_key(list_name, DOCS_KEY)]
+    res = {
+        'list': list_name,
+        'docs': docs,
+        'terms': [
+            {
+                'term': t,
+                'df': stats[stats_key(list_name, t)],
+                'fraction': stats[stats_key(list_name, t)] / docs if docs else 0.0
+            } for t in terms
+        ]
+    }
+    return to_json_response(to_json_string(res))
+
+
+def handle_authors(r: Request, cp: CommonParams):
+    directory = author_directory()
+    matches = directory.search(extract_param(r.params, 'q', ''), cp.limit) if directory else []
+    res = {
+        'items': [
+            {
+                'author': a.author,
+                'email': a.email,
+                'authorkey': a.authorkey,
+                'emailkey': a.emailkey,
+                'count': a.count,
+                'score': score
+            } for a, score in matches
+        ]
+    }
+    return to_json_response(to_json_string(res), {'Cache-Control': f'public, max-age={CACHE_MAX_AGE}'})
 
-    cp = common_params(r.params)
 
-    if r.method == 'GET' and (m := re.match(r'.*/lists/([^/]+)/mail/search$', r.uri)) and 'q' in r.params:
-        list_name = m.group(1)
-        query = extract_param(r.params, 'q')
-        idx = indexer.Indexer(DEFAULT_PARAMS)
-        term = '|'.join(idx.normalize_and_filter(idx.tokenize(query)))
-        items, start_key = search_mail(list_name, term, cp)
-        return to_json_response(to_response_string(convert(get_mail(items)), start_key))
-    if r.method == 'GET' and r.uri.endswith('/mail/search') and 'q' in r.params:
-        query = extract_param(r.params, 'q')
-        idx = indexer.Indexer(DEFAULT_PARAMS)
-        term = '|'.join(idx.normalize_and_filter(idx.tokenize(query)))
-        items, start_key = search_mail_global(term, cp)
-        return to_json_response(to_response_string(convert(get_mail(items)), start_key))
-    if r.method == 'GET' and (m := re.match(r'.*/lists/([^/]+)/mail$', r.uri)):
-        list_name = m.group(1)
-        items, start_key = latest_mail(list_name, cp)
-        return to_json_response(to_response_string(convert(items), start_key))
-    if r.method == 'GET' and r.uri.endswith('/mail'):
-        items, start_key = latest_mail_global(cp)
-        return to_json_response(to_response_string(convert(items), start_key))
-    if r.method == 'GET' and (m := re.match(r'.*/lists/([^/]+)/mail/byauthor$', r.uri)) and 'author' in r.params:
-        list_name = m.group(1)
-        author = extract_param(r.params, 'author')
-        authorkey = indexer.normalize(author)
-        items, start_key = mail_by_author(list_name, authorkey, cp)
-        return to_json_response(to_response_string(convert(items), start_key))
-    if r.method == 'GET' and (m := re.match(r'.*/lists/([^/]+)/mail/byemail$', r.uri)) and 'email' in r.params:
-        list_name = m.group(1)
-        email = extract_param(r.params, 'email')
-        emailkey = indexer.normalize(email)
-        items, start_key = mail_by_email(list_name, emailkey, cp)
-        return to_json_response(to_response_string(convert(items), start_key))
-    if r.method == 'GET' and r.uri.endswith('/mail/byauthor') and 'author' in r.params:
-        author = extract_param(r.params, 'author')
-        authorkey = indexer.normalize(author)
-        items, start_key = mail_by_author_global(authorkey, cp)
-        return to_json_response(to_response_string(convert(items), start_key))
-    if r.method == 'GET' and r.uri.endswith('/mail/byemail') and 'email' in r.params:
-        email = extract_param(r.params, 'email')
-        emailkey = indexer.normalize(email)
-        items, start_key = mail_by_email_global(emailkey, cp)
-        return to_json_response(to_response_string(convert(items), start_key))
-    if r.method == 'GET' and r.uri.endswith('/mail/status'):
-        last_check, last_update = get_status()
-        res = {
-            'last_check': last_check,
-            'last_update': last_update
+def handle_suggest(r: Request, cp: CommonParams):
+    prefix = suggest.query_prefix(extract_param(r.params, 'prefix', ''))
+    idx = suggest_index() if prefix else None
+    res = {
+        'prefix': prefix.replace('|', ' '),
+        'items': [{'term': t.replace('|', ' '), 'df': df} for t, df in idx.top(prefix, cp.limit)] if idx else []
+    }
+    return to_json_response(to_json_string(res), {'Cache-Control': f'public, max-age={SUGGEST_MAX_AGE}'})
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def executor(name):
+    # one pool per use, created on first use; a task never waits on tasks of its own pool, so batch queries
+    # running ndjson exports or prefetches cannot fill the pool with threads waiting on queued work
+    pool = _executors.get(name)
+    if pool is None:
+        with _executors_lock:
+            pool = _executors.get(name)
+            if pool is None:
+                pool = _executors[name] = ThreadPoolExecutor(MAX_POOL_CONNECTIONS, thread_name_prefix=name)
+    return pool
+
+
+def run_batch_query(q):
+    # one GET through the route table; a failure becomes this query's result instead of failing the batch
+    try:
+        path, _, query_string = q['path'].partition('?')
+        params = urllib.parse.parse_qs(query_string)
+        for k, v in (q.get('params') or {}).items():
+            params[k] = [str(v)]
+        if extract_param(params, 'format') == 'ndjson':
+            return {'status': 400, 'error': 'format=ndjson is not supported in batches'}
+        r = Request('GET', path, urllib.parse.urlencode(params, doseq=True), params, {})
+        res = dispatch(r)
+        if res['status'] != '200':
+            return {'status': int(res['status']), 'error': res.get('body') or res['statusDescription']}
+        return {'status': 200, 'body': json.loads(res['body'])}
+    except Exception as e:
+        print(f'batch query failed, query={q}, error={e!r}')
+        return {'status': 500, 'error': f'{type(e).__name__}: {e}'}
+
+
+def handle_batch(r: Request, cp: CommonParams):
+    try:
+        queries = json.loads(r.body or b'null')['queries']
+        if not all(isinstance(q, dict) and isinstance(q.get('path'), str) for q in queries):
+            raise ValueError('invalid query')
+    except (ValueError, KeyError, TypeError):
+        return bad_request('expected {"queries": [{"path": "/mail/search", "params": {"q": "..."}}, ...]}')
+    if len(queries) > BATCH_MAX_QUERIES:
+        return bad_request(f'at most {BATCH_MAX_QUERIES} queries per batch')
+    futures = [metrics.submit(executor('batch'), run_batch_query, q) for q in queries]
+    results = [future.result() for future in futures]
+    return to_json_response(to_json_string({'results': results}))
+
+
+def handle_status(r: Request, cp: CommonParams):
+    last_check, last_update, _ = get_status()
+    res = {
+        'last_check': last_check,
+        'last_update': last_update
+    }
+    detail = extract_param(r.params, 'detail')
+    if detail == 'lists':
+        res['lists'] = get_list_status()
+    if detail == 'cache':
+        res['caches'] = {
+            'result': result_cache.local.stats(),
+            'prefetch': prefetch_cache.stats(),
+            'term_stats': stats_cache.stats()
         }
-        return to_json_response(to_json_string(res))
+    return to_json_response(to_json_string(res))
 
+
+class Route(NamedTuple):
+    method: str
+    pattern: re.Pattern
+    converters: dict[str, Callable[[str], Any]]
+    required: tuple[str, ...]
+    handler: Callable
+
+
+CONVERTERS = {'str': str, 'int': int}
+
+
+def compile_route(method, template, required, handler):
+    # '/lists/{list_name}/mail' -> '/lists/(?P<list_name>[^/]+)/mail$', searched so a prefix like the /api mount
+    # point is allowed
+    converters = {}
+    regex = ''
+    for part in re.split(r'(\{[^}]+\})', template):
+        if part.startswith('{'):
+            name, _, kind = part[1:-1].partition(':')
+            converters[name] = CONVERTERS[kind or 'str']
+            regex += f'(?P<{name}>[^/]+)'
+        else:
+            regex += re.escape(part)
+    return Route(method, re.compile(f'{regex}$'), converters, tuple(required), handler)
+
+
+def compile_routes(table):
+    # routes are bucketed by literal last path segment so a request only tries the few that can match;
+    # order within a bucket is preserved, see match_route
+    buckets = {}
+    for method, template, required, handler in table:
+        last = template.rsplit('/', 1)[-1]
+        bucket = '*' if last.startswith('{') else last
+        buckets.setdefault((method, bucket), []).append(compile_route(method, template, required, handler))
+    return buckets
+
+
+ROUTES = compile_routes([
+    ('GET', '/lists/{list_name}/mail/search', ('q',), handle_search),
+    ('GET', '/mail/search', ('q',), handle_search),
+    ('GET', '/lists/{list_name}/mail', (), handle_latest),
+    ('GET', '/mail', (), handle_latest),
+    ('GET', '/lists/{list_name}/mail/byauthor', ('author',), handle_by_author),
+    ('GET', '/lists/{list_name}/mail/byemail', ('email',), handle_by_email),
+    ('GET', '/mail/byauthor', ('author',), handle_by_author),
+    ('GET', '/mail/byemail', ('email',), handle_by_email),
+    ('GET', '/lists/{list_name}/threads/{root}', (), handle_thread),
+    ('GET', '/lists/{list_name}/mail/terms/stats', ('q',), handle_term_stats),
+    ('GET', '/mail/terms/stats', ('q',), handle_term_stats),
+    ('GET', '/mail/bodies', ('ids',), handle_bodies),
+    ('GET', '/mail/authors', ('q',), handle_authors),
+    ('GET', '/mail/suggest', ('prefix',), handle_suggest),
+    ('GET', '/mail/status', (), handle_status),
+    ('POST', '/mail/batch', (), handle_batch),
+])
+
+
+def match_route(r: Request):
+    # the route matching the longest part of the path wins, so /lists/net-dev/threads/mail is a thread and not
+    # /mail below a prefix; ties go to the first route with a literal last segment, then to table order
+    best = None
+    last = r.uri.rsplit('/', 1)[-1]
+    for bucket in (last, '*'):
+        for route in ROUTES.get((r.method, bucket), ()):
+            if not (m := route.pattern.search(r.uri)) or (best and m.start() >= best[0]):
+                continue
+            if not all(p in r.params for p in route.required):
+                continue
+            try:
+                path_params = {k: route.converters[k](v) for k, v in m.groupdict().items()}
+            except ValueError:
+                continue
+            best = (m.start(), route, path_params)
+    return best[1:] if best else (None, None)
+
+
+def not_found():
     return {
         'status': '404',
         'statusDescription': 'Not Found',
         'body': 'Not Found'
     }
+
+
+def bad_request(message):
+    return {
+        'status': '400',
+        'statusDescription': 'Bad Request',
+        'body': message
+    }
+
+
+def dispatch(r: Request):
+    route, path_params = match_route(r)
+    if not route:
+        return not_found()
+
+    cp = common_params(r.params)
+    return route.handler(r, cp, **path_params)
+
+
+def lambda_handler(event, context):
+    r = Request.new(event)
+    print(f'method={r.method}, path={r.uri_with_query()}')
+    debug = extract_param(r.params, 'debug') == '1'
+    token = metrics.start_trace() if debug else None
+    start = time.perf_counter()
+    try:
+        res = dispatch(r)
+    finally:
+        total_ms = (time.perf_counter() - start) * 1000
+        metrics.observe('request', total_ms)
+        trace = metrics.end_trace(token) if debug else None
+        if METRICS_OUTPUT and metrics.flush_due(METRICS_FLUSH_INTERVAL):
+            metrics.flush(METRICS_OUTPUT, {'Service': 'server'})
+    if debug:
+        # per-request breakdown, e.g. produce;dur=41.0, dynamodb.Query;dur=23.5;desc="1x", total;dur=44.2
+        res.setdefault('headers', {}).update(to_headers({'Server-Timing': metrics.server_timing(trace, total_ms)}))
+    return res
@@ -0,0 +1,79 @@
+import unittest
+
+import server
+
+
+def request(uri, method='GET', **params):
+    return server.Request(method, uri, '', {k: [v] for k, v in params.items()}, {})
+
+
+class TestCachedResponse(unittest.TestCase):
+    def setUp(self):
+        self.saved = dict(server._status_version), server.result_cache
+        server.result_cache = server.ResultCache(server.LRUCache(16))
+        server._status_version.update(value='v1', expires=float('inf'))
+        self.produced = []
+        self.cp = server.CommonParams(forward=False, limit=10, start_key=None, date_range=None)
+
+    def tearDown(self):
+        server._status_version.update(self.saved[0])
+        server.result_cache = self.saved[1]
+
+    def respond(self, headers=None):
+        def produce(cp):
+            self.produced.append(cp)
+            return server.to_response_string([{'n': len(self.produced)}], None)
+
+        r = server.Request('GET', '/mail', '', {}, headers or {})
+        return server.cached_json_response(r, self.cp, ('latest', None), produce)
+
+    def test_cached_per_version(self):
+        first = self.respond()
+        self.assertEqual(self.respond()['body'], first['body'])
+        self.assertEqual(len(self.produced), 1)
+        # new mail moves last_update, which keys every cached result
+        server._status_version.update(value='v2')
+        self.assertNotEqual(self.respond()['body'], first['body'])
+        self.assertEqual(len(self.produced), 2)
+
+    def test_not_modified(self):
+        etag = self.respond()['headers']['etag'][0]['value']
+        res = self.respond({'if-none-match': etag})
+        self.assertEqual(res['status'], '304')
+        self.assertNotIn('body', res)
+        self.assertEqual(res['headers']['etag'][0]['value'], etag)
+        self.assertEqual(self.respond({'if-none-match': '"stale"'})['status'], '200')
+
+
+class TestRoutes(unittest.TestCase):
+    def route(self, uri, method='GET', **params):
+        route, path_params = server.match_route(request(uri, method, **params))
+        return (route.handler, path_params) if route else None
+
+    def test_match(self):
+        self.assertEqual(self.route('/api/mail'), (server.handle_latest, {}))
+        self.assertEqual(self.route('/api/lists/net-dev/mail'), (server.handle_latest, {'list_name': 'net-dev'}))
+        self.assertEqual(self.route('/api/mail/search', q='loom'), (server.handle_search, {}))
+        self.assertEqual(self.route('/api/lists/net-dev/mail/search', q='loom'),
+                         (server.handle_search, {'list_name': 'net-dev'}))
+        self.assertEqual(self.route('/api/lists/net-dev/threads/025750'),
+                         (server.handle_thread, {'list_name': 'net-dev', 'root': '025750'}))
+        self.assertEqual(self.route('/mail/status'), (server.handle_status, {}))
+        self.assertEqual(self.route('/api/mail/batch', 'POST'), (server.handle_batch, {}))
+
+    def test_no_match(self):
+        self.assertIsNone(self.route('/api/mail/search'))  # q is required
+        self.assertIsNone(self.route('/api/mail/batch'))
+        self.assertIsNone(self.route('/api/lists/net-dev'))
+        self.assertIsNone(self.route('/api/mail/unknown'))
+
+    def test_thread_root_named_like_a_route(self):
+        # the last segment buckets these with /mail and /mail/search, the longer thread match still wins
+        self.assertEqual(self.route('/api/lists/net-dev/threads/mail'),
+                         (server.handle_thread, {'list_name': 'net-dev', 'root': 'mail'}))
+        self.assertEqual(self.route('/api/lists/net-dev/threads/search', q='loom'),
+                         (server.handle_thread, {'list_name': 'net-dev', 'root': 'search'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+class SpaceSaving:
+    """Space-Saving heavy-hitters sketch (Metwally et al.) over a stream-summary of count buckets.
+
+    Tracks at most `capacity` items in O(1) per update. Every item whose true count exceeds
+    n / capacity is guaranteed to be tracked, and each reported count overestimates the true
+    count by at most its recorded error.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}  # item -> count
+        self.errors = {}  # item -> overestimation bound
+        self.buckets = {}  # count -> items with that count
+        self.min_count = 0
+        self.n = 0  # total updates
+
+    def _move(self, item, old, new):
+        if old:
+            bucket = self.buckets[old]
+            bucket.remove(item)
+            if not bucket:
+                del self.buckets[old]
+                if self.min_count == old:
+                    self.min_count = new
+        self.buckets.setdefault(new, set()).add(item)
+        self.counts[item] = new
+
+    def add(self, item):
+        self.n += 1
+        count = self.counts.get(item)
+        if count is not None:
+            self._move(item, count, count + 1)
+        elif len(self.counts) < self.capacity:
+            self.errors[item] = 0
+            self._move(item, 0, 1)
+            self.min_count = 1
+        else:
+            # replace an item with the minimum count; the newcomer inherits that count as its error
+            floor = self.min_count
+            bucket = self.buckets[floor]
+            evicted = bucket.pop()
+            del self.counts[evicted]
+            del self.errors[evicted]
+            if not bucket:
+                del self.buckets[floor]
+                self.min_count = floor + 1
+            self.errors[item] = floor
+            self.buckets.setdefault(floor + 1, set()).add(item)
+            self.counts[item] = floor + 1
+
+    def top(self, k=None):
+        ranked = sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [(item, count, self.errors[item]) for item, count in ranked[:k]]
@@ -0,0 +1,42 @@
+import random
+import unittest
+from collections import Counter
+
+from sketch import SpaceSaving
+
+
+class TestSpaceSaving(unittest.TestCase):
+    def test_exact_under_capacity(self):
+        ss = SpaceSaving(10)
+        for item in ['a', 'b', 'a', 'c', 'a', 'b']:
+            ss.add(item)
+        self.assertEqual(ss.top(), [('a', 3, 0), ('b', 2, 0), ('c', 1, 0)])
+        self.assertEqual(ss.top(1), [('a', 3, 0)])
+        self.assertEqual(ss.n, 6)
+
+    def test_eviction(self):
+        ss = SpaceSaving(2)
+        for item in ['a', 'a', 'b', 'c']:
+            ss.add(item)
+        self.assertEqual(ss.top(), [('a', 2, 0), ('c', 2, 1)])
+        self.assertEqual(ss.min_count, 2)
+
+    def test_heavy_hitters(self):
+        rnd = random.Random(7)
+        stream = [f'w{int(rnd.paretovariate(1.2))}' for _ in range(50_000)]
+        truth = Counter(stream)
+        ss = SpaceSaving(200)
+        for item in stream:
+            ss.add(item)
+        tracked = {item: (count, error) for item, count, error in ss.top()}
+        for item, count in truth.items():
+            if count > len(stream) / 200:
+                self.assertIn(item, tracked)
+        for item, (count, error) in tracked.items():
+            self.assertGreaterEqual(count, truth[item])
+            self.assertLessEqual(count - error, truth[item])
+        self.assertEqual([i for i, _, _ in ss.top(5)], [i for i, _ in truth.most_common(5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import os
+import sqlite3
+
+import query
+
+# Single-file SQLite snapshot of the index for offline readers such as the MCP server, which open it read-only
+# and memory-mapped. Readers check FORMAT and tokenize queries with the settings recorded in meta.
+FORMAT = 1
+
+SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE mail (
+    rowid INTEGER PRIMARY KEY,
+    list TEXT NOT NULL,
+    month TEXT NOT NULL,
+    id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    author TEXT NOT NULL,
+    email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    authorkey TEXT NOT NULL,
+    emailkey TEXT NOT NULL,
+    parent TEXT,
+    root TEXT
+);
+CREATE TABLE terms (
+    term TEXT NOT NULL,
+    date TEXT NOT NULL,
+    mail INTEGER NOT NULL,
+    PRIMARY KEY (term, date, mail)
+) WITHOUT ROWID;
+'''
+
+# created after loading, which is much faster than maintaining them row by row
+INDEXES = '''
+CREATE UNIQUE INDEX mail_key ON mail (list, month, id);
+CREATE INDEX mail_date ON mail (date);
+CREATE INDEX mail_list_date ON mail (list, date);
+CREATE INDEX mail_authorkey_date ON mail (authorkey, date);
+CREATE INDEX mail_emailkey_date ON mail (emailkey, date);
+'''
+
+RECORD_FIELDS = ('list', 'month_id', 'date', 'author', 'email', 'subject', 'authorkey', 'emailkey', 'parent', 'root')
+
+
+def record_projection():
+    # projection and attribute names for scanning openjdk-mail-records, several fields are reserved words
+    names = {f'#{f}': f for f in RECORD_FIELDS}
+    return ', '.join(names), names
+
+
+class SnapshotWriter:
+    def __init__(self, path, lists=None):
+        self.path = path
+        self.tmp = f'{path}.tmp'
+        self.lists = set(lists) if lists else None
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+        self.conn = sqlite3.connect(self.tmp)
+        self.conn.execute('PRAGMA journal_mode = OFF')
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.executescript(SCHEMA)
+        self.keys = {}  # (list, month_id) -> mail rowid, to resolve term items
+        self.mails = 0
+        self.terms = 0
+
+    def add_records(self, items):
+        rows = []
+        for item in items:
+            list_name = item['list']['S']
+            if self.lists is not None and list_name not in self.lists:
+                continue
+            month_id = item['month_id']['S']
+            month, mail_id = month_id.split('/')
+            rows.append((len(self.keys) + len(rows) + 1, list_name, month, mail_id, item['date']['S'],
+                         item['author']['S'], item['email']['S'], item['subject']['S'], item['authorkey']['S'],
+                         item['emailkey']['S'], item.get('parent', {}).get('S'), item.get('root', {}).get('S')))
+        self.conn.executemany('INSERT INTO mail VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        for row in rows:
+            self.keys[(row[1], f'{row[2]}/{row[3]}')] = row[0]
+        self.mails += len(rows)
+
+    def add_terms(self, items):
+        # term items of mail missing from the records scan (other lists, or indexed since) are skipped
+        rows = []
+        for item in items:
+            list_term = item['p']['S']
+            date, month, mail_id = item['s']['S'].split('/')
+            rowid = self.keys.get((list_term[:list_term.index('/')], f'{month}/{mail_id}'))
+            if rowid is not None:
+                rows.append((list_term[list_term.index('/') + 1:], date, rowid))
+        self.conn.executemany('INSERT OR IGNORE INTO terms VALUES (?, ?, ?)', rows)
+        self.terms += len(rows)
+
+    def finish(self, last_update, built):
+        meta = {
+            'format': FORMAT,
+            'last_update': last_update,
+            'built': built,
+            'mails': self.mails,
+            'lists': sorted({list_name for list_name, _ in self.keys}),
+            'max_token_length': query.MAX_TOKEN_LENGTH,
+            'word_ngram_limit': query.WORD_NGRAM_LIMIT,
+            'stop_words': sorted(query.STOP_WORDS),
+            'stop_prefixes': list(query.STOP_PREFIXES),
+        }
+        self.conn.executescript(INDEXES)
+        self.conn.executemany('INSERT INTO meta VALUES (?, ?)',
+                              [(k, v if isinstance(v, str) else json.dumps(v)) for k, v in meta.items()])
+        self.conn.commit()
+        self.conn.execute('ANALYZE')
+        self.conn.execute('VACUUM')
+        self.conn.close()
+        os.replace(self.tmp, self.path)
+        return meta
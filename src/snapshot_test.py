@@ -0,0 +1,67 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import query
+import snapshot
+
+
+def record(list_name, month, mail_id, date, author, **extra):
+    item = {
+        'list': {'S': list_name},
+        'month_id': {'S': f'{month}/{mail_id}'},
+        'date': {'S': date},
+        'author': {'S': author},
+        'email': {'S': f'{author.split()[0].lower()}@example.com'},
+        'subject': {'S': 'RFR: 8350000'},
+        'authorkey': {'S': query.normalize(author)},
+        'emailkey': {'S': query.normalize(f'{author.split()[0].lower()}@example.com')},
+    }
+    item.update({k: {'S': v} for k, v in extra.items()})
+    return item
+
+
+def term(list_name, t, date, month, mail_id):
+    return {'p': {'S': f'{list_name}/{t}'}, 's': {'S': f'{date}/{month}/{mail_id}'}}
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_build(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'mail.sqlite')
+            writer = snapshot.SnapshotWriter(path, lists=['net-dev', 'loom-dev'])
+            writer.add_records([
+                record('net-dev', '2025-February', '025750', '2025-02-01T10:00:00Z', 'Peter Parker'),
+                record('net-dev', '2025-February', '025751', '2025-02-02T10:00:00Z', 'Mary Jane',
+                       parent='025750', root='025750'),
+                record('amber-dev', '2025-February', '000001', '2025-02-03T10:00:00Z', 'Ned Leeds'),
+            ])
+            writer.add_records([record('loom-dev', '2025-March', '000100', '2025-03-01T10:00:00Z', 'Alan B')])
+            writer.add_terms([
+                term('net-dev', 'handshake', '2025-02-01T10:00:00Z', '2025-February', '025750'),
+                term('net-dev', 'handshake', '2025-02-02T10:00:00Z', '2025-February', '025751'),
+                term('amber-dev', 'handshake', '2025-02-03T10:00:00Z', '2025-February', '000001'),
+                term('loom-dev', 'virtual|threads', '2025-03-01T10:00:00Z', '2025-March', '000100'),
+                term('net-dev', 'handshake', '2025-02-05T10:00:00Z', '2025-February', '025799'),  # not scanned
+            ])
+            meta = writer.finish('2025-03-02T00:00:00Z', '2025-03-02T01:00:00Z')
+            self.assertFalse(os.path.exists(f'{path}.tmp'))
+            self.assertEqual(meta['lists'], ['loom-dev', 'net-dev'])
+
+            conn = sqlite3.connect(path)
+            stored = dict(conn.execute('SELECT key, value FROM meta'))
+            self.assertEqual(int(stored['format']), snapshot.FORMAT)
+            self.assertEqual(stored['last_update'], '2025-03-02T00:00:00Z')
+            self.assertEqual(set(json.loads(stored['stop_words'])), query.STOP_WORDS)
+            rows = conn.execute('SELECT m.list, m.id, m.parent FROM terms t JOIN mail m ON m.rowid = t.mail '
+                                'WHERE t.term = ? ORDER BY t.date DESC', ('handshake',)).fetchall()
+            self.assertEqual(rows, [('net-dev', '025751', '025750'), ('net-dev', '025750', None)])
+            self.assertEqual(conn.execute('SELECT id FROM mail WHERE authorkey = ?', ('alanb',)).fetchall(),
+                             [('000100',)])
+            conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+
+REGION = 'us-west-1'
+
+
+class S3Store:
+    def __init__(self, bucket, prefix=''):
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = None
+
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client('s3', region_name=REGION)
+        return self._client
+
+    def get(self, key):
+        try:
+            res = self.client().get_object(Bucket=self.bucket, Key=f'{self.prefix}{key}')
+        except self.client().exceptions.NoSuchKey:
+            return None
+        return res['Body'].read()
+
+    def put(self, key, data: bytes, content_type='application/octet-stream'):
+        self.client().put_object(Bucket=self.bucket, Key=f'{self.prefix}{key}', Body=data, ContentType=content_type)
+
+
+class LocalStore:
+    def __init__(self, root):
+        self.root = root
+
+    def get(self, key):
+        path = os.path.join(self.root, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put(self, key, data: bytes, content_type='application/octet-stream'):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+def open_store(url):
+    # s3://bucket/prefix or a local directory path
+    if url.startswith('s3://'):
+        bucket, _, prefix = url[len('s3://'):].partition('/')
+        return S3Store(bucket, f'{prefix.rstrip("/")}/' if prefix else '')
+    return LocalStore(url)
@@ -0,0 +1,178 @@
+import bisect
+import heapq
+import json
+import mmap
+import os
+import struct
+
+import query
+
+# Artifact layout, little-endian, arrays 4-byte aligned so they can be cast in place from a memory map:
+#   header   magic, n, size, blob length, version length, version (padded)
+#   offsets  u32[n + 1]  term i is blob[offsets[i]:offsets[i + 1]], terms sorted by utf-8 bytes
+#   freqs    u32[n]      document frequency of term i
+#   tree     u32[2 * size] segment tree over freqs holding the index of the range maximum
+#   blob     utf-8 terms, pipe-joined tokens as indexed
+MAGIC = b'SUG1'
+HEADER = struct.Struct('<4sIIIH')
+EMPTY = 0xFFFFFFFF
+
+ARTIFACT_POINTER = 'suggest/terms.json'
+
+
+def _pad(n):
+    return (4 - n % 4) % 4
+
+
+def build(df: dict[str, int], version=''):
+    terms = sorted(df, key=lambda t: t.encode('utf-8'))
+    encoded = [t.encode('utf-8') for t in terms]
+    freqs = [df[t] for t in terms]
+    n = len(terms)
+    size = 1
+    while size < max(n, 1):
+        size *= 2
+    tree = [EMPTY] * (2 * size)
+    for i in range(n):
+        tree[size + i] = i
+    for node in range(size - 1, 0, -1):
+        tree[node] = _better(freqs, tree[2 * node], tree[2 * node + 1])
+    offsets = [0]
+    for e in encoded:
+        offsets.append(offsets[-1] + len(e))
+    blob = b''.join(encoded)
+    v = version.encode('utf-8')
+    parts = [
+        HEADER.pack(MAGIC, n, size, len(blob), len(v)), v, b'\0' * _pad(HEADER.size + len(v)),
+        struct.pack(f'<{n + 1}I', *offsets),
+        struct.pack(f'<{n}I', *freqs),
+        struct.pack(f'<{2 * size}I', *tree),
+        blob
+    ]
+    return b''.join(parts)
+
+
+def _better(freqs, a, b):
+    # index with the higher frequency, the alphabetically first on ties
+    if a == EMPTY:
+        return b
+    if b == EMPTY:
+        return a
+    return a if freqs[a] >= freqs[b] else b
+
+
+class _Terms:
+    # sequence view over the sorted terms for bisect
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.n
+
+    def __getitem__(self, i):
+        return self.index.term_bytes(i)
+
+
+class SuggestIndex:
+    def __init__(self, buf):
+        self.buf = buf
+        mv = memoryview(buf)
+        magic, n, size, blob_len, version_len = HEADER.unpack_from(mv)
+        if magic != MAGIC:
+            raise ValueError(f'not a suggest artifact, magic={magic}')
+        pos = HEADER.size
+        self.version = bytes(mv[pos:pos + version_len]).decode('utf-8')
+        pos += version_len + _pad(HEADER.size + version_len)
+        self.n = n
+        self.size = size
+        self.offsets = mv[pos:pos + 4 * (n + 1)].cast('I')
+        pos += 4 * (n + 1)
+        self.freqs = mv[pos:pos + 4 * n].cast('I')
+        pos += 4 * n
+        self.tree = mv[pos:pos + 8 * size].cast('I')
+        pos += 8 * size
+        self.blob = mv[pos:pos + blob_len]
+
+    @staticmethod
+    def open(path):
+        with open(path, 'rb') as f:
+            return SuggestIndex(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def term_bytes(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def term(self, i):
+        return self.term_bytes(i).decode('utf-8')
+
+    def prefix_range(self, prefix: str):
+        p = prefix.encode('utf-8')
+        terms = _Terms(self)
+        lo = bisect.bisect_left(terms, p)
+        hi = bisect.bisect_left(terms, p + b'\xff', lo)  # 0xff never occurs in utf-8
+        return lo, hi
+
+    def range_max(self, lo, hi):
+        best = EMPTY
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                best = _better(self.freqs, best, self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = _better(self.freqs, best, self.tree[hi])
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def top(self, prefix: str, k=10):
+        # k highest-frequency terms starting with prefix, O(k log n)
+        lo, hi = self.prefix_range(prefix)
+        result = []
+        heap = []
+        if lo < hi:
+            m = self.range_max(lo, hi)
+            heap.append((-self.freqs[m], m, lo, hi))
+        while heap and len(result) < k:
+            _, m, lo, hi = heapq.heappop(heap)
+            result.append((self.term(m), self.freqs[m]))
+            for a, b in ((lo, m), (m + 1, hi)):
+                if a < b:
+                    i = self.range_max(a, b)
+                    heapq.heappush(heap, (-self.freqs[i], i, a, b))
+        return result
+
+
+def query_prefix(text):
+    # 'Virtual Thr' -> 'virtual|thr', a trailing space completes the next token: 'virtual ' -> 'virtual|'
+    tokens = query.tokens(text)
+    if not tokens:
+        return ''
+    prefix = '|'.join(tokens)
+    return prefix + '|' if text[-1:].isspace() else prefix
+
+
+def publish(store, data: bytes, version):
+    key = f'suggest/terms-{version}.sug'
+    store.put(key, data)
+    store.put(ARTIFACT_POINTER, json.dumps({'version': version, 'key': key}).encode('utf-8'), 'application/json')
+    return key
+
+
+def load(store, cache_dir):
+    # downloads the current artifact once per version and memory-maps it, so warm containers share the pages
+    pointer = store.get(ARTIFACT_POINTER)
+    if pointer is None:
+        return None
+    pointer = json.loads(pointer)
+    path = os.path.join(cache_dir, os.path.basename(pointer['key']))
+    if not os.path.exists(path):
+        data = store.get(pointer['key'])
+        if data is None:
+            return None
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return SuggestIndex.open(path)
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import time
+import unittest
+
+import suggest
+from store import LocalStore
+from suggest import SuggestIndex
+
+
+class TestSuggest(unittest.TestCase):
+    DF = {
+        'valhalla': 900,
+        'value': 400,
+        'value|types': 300,
+        'value|classes': 350,
+        'var': 500,
+        'virtual|threads': 800,
+        'virtual': 950,
+        'vector|api': 100,
+        'época': 5,
+    }
+
+    def test_top(self):
+        idx = SuggestIndex(suggest.build(self.DF, 'v1'))
+        self.assertEqual(idx.version, 'v1')
+        self.assertEqual(idx.n, len(self.DF))
+        self.assertEqual(idx.top('v', 3), [('virtual', 950), ('valhalla', 900), ('virtual|threads', 800)])
+        self.assertEqual(idx.top('val'), [('valhalla', 900), ('value', 400), ('value|classes', 350),
+                                          ('value|types', 300)])
+        self.assertEqual(idx.top('value|'), [('value|classes', 350), ('value|types', 300)])
+        self.assertEqual(idx.top('ép'), [('época', 5)])
+        self.assertEqual(idx.top('x'), [])
+        self.assertEqual(len(idx.top('', 100)), len(self.DF))
+
+    def test_empty(self):
+        idx = SuggestIndex(suggest.build({}))
+        self.assertEqual(idx.top('a'), [])
+
+    def test_query_prefix(self):
+        self.assertEqual(suggest.query_prefix('Virtual Thr'), 'virtual|thr')
+        self.assertEqual(suggest.query_prefix('virtual '), 'virtual|')
+        self.assertEqual(suggest.query_prefix('the '), '')
+
+    def test_large(self):
+        df = {f'term{i:06d}': (i * 7919) % 100_003 for i in range(100_000)}
+        idx = SuggestIndex(suggest.build(df))
+        expected = sorted((t for t in df if t.startswith('term0')), key=lambda t: (-df[t], t))[:10]
+        start = time.perf_counter()
+        result = idx.top('term0', 10)
+        elapsed = time.perf_counter() - start
+        self.assertEqual([t for t, _ in result], expected)
+        self.assertLess(elapsed, 0.05)
+
+    def test_publish_and_load(self):
+        with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as cache:
+            artifacts = LocalStore(root)
+            self.assertIsNone(suggest.load(artifacts, cache))
+            suggest.publish(artifacts, suggest.build(self.DF, 'v2'), 'v2')
+            idx = suggest.load(artifacts, cache)
+            self.assertEqual(idx.top('vec'), [('vector|api', 100)])
+            self.assertTrue(os.path.exists(os.path.join(cache, 'terms-v2.sug')))
+
+
+if __name__ == '__main__':
+    unittest.main()
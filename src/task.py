@@ -1,28 +1,43 @@
 import logging
 import re
 
+import metrics
 from database import Database
 from indexer import Indexer
 from params import IndexParams
-from mail import MailingList
+from mail import Mail, MailingList
 
 logger = logging.getLogger(__name__)
 
 
-def process_mail(ml: MailingList, db: Database, mail_url: str, params: IndexParams):
+def filter_body(body: str, params: IndexParams):
+    for regex in params.stop_lines:
+        body = "\n".join(line for line in body.splitlines() if not re.match(regex, line))
+    return body
+
+
+def index_mail(mail: Mail, params: IndexParams, body=None):
+    # body is the already filtered mail body, if the caller has it
+    terms = Indexer(params).index(
+        author=mail.author,
+        email=mail.email,
+        subject=mail.subject,
+        body=filter_body(mail.body, params) if body is None else body)
+    return [t for t in terms if t not in params.stop_terms]
+
+
+def process_mail(ml: MailingList, db: Database, mail_url: str, params: IndexParams, observers=()):
     mail = ml.fetch_mail(mail_url)
     if params.stop_func(mail):
         logger.info(f'skipping changeset mail, month={mail.month}, id={mail.id}, subject=\'{mail.subject}\'')
+        metrics.count('mail.skipped')
     else:
-        body = mail.body
-        for regex in params.stop_lines:
-            body = "\n".join(line for line in body.splitlines() if not re.match(regex, line))
-        terms = Indexer(params).index(
-            author=mail.author,
-            email=mail.email,
-            subject=mail.subject,
-            body=body)
-        terms = [t for t in terms if t not in params.stop_terms]
-        db.put_mail_record_and_terms(mail._asdict(), terms)
+        body = filter_body(mail.body, params)
+        terms = index_mail(mail, params, body)
+        db.put_mail_record_and_terms(mail._asdict(), terms, body)
+        for observer in observers:  # called with (mail, terms) after the mail is stored
+            observer(mail, terms)
+        metrics.count('mail.processed')
+        metrics.count('mail.terms', len(terms))
         logger.info(f'processed mail record, month={mail.month}, id={mail.id}, terms={len(terms)}')
     return mail
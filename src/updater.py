@@ -1,12 +1,47 @@
 import logging
+import os
+import re
 
+import authors
+import bloom
 import database
+import feeds
 import mail
+import metrics
 import params
+import records
+import store
 import task
 
 logger = logging.getLogger(__name__)
 
+# store display fields on term items, see Database(denormalize_terms=...)
+DENORMALIZE_TERMS = False
+
+# maintain openjdk-mail-term-stats document frequencies, see Database(term_stats=...)
+TERM_STATS = False
+
+# maintain openjdk-mail-authors message counts and republish the author directory, see Database(author_counts=...)
+AUTHOR_COUNTS = False
+
+# store compressed filtered bodies in openjdk-mail-bodies, see Database(store_bodies=...)
+STORE_BODIES = False
+
+# frequency table bundled with the function (mine_stops.py --df_out), enables idf term selection
+TERM_DF_FILE = None
+MAX_TERMS = None  # overrides params.DEFAULT_PARAMS.max_terms when TERM_DF_FILE is set
+
+# object store for published artifacts, e.g. 's3://openjdk-mail-artifacts', None disables them
+ARTIFACT_STORE = None
+
+# 'emf' prints CloudWatch embedded metric format lines at the end of each run, see metrics.py
+METRICS_OUTPUT = None
+
+# publish the first page of the latest feeds to ARTIFACT_STORE after each changed run, see feeds.py
+PUBLISH_FEEDS = False
+
+MAIL_URL = re.compile(r'.*/([^/]+)/([^/]+)\.html')
+
 MAILING_LISTS = [
     'amber-dev',
     'amber-spec-experts',
@@ -48,25 +83,129 @@ def init_logging():
         format='[%(asctime)s] <%(threadName)s> %(levelname)s - %(message)s')
 
 
-def update_list(session, db, list_name):
+def load_index_params():
+    if not TERM_DF_FILE:
+        return params.DEFAULT_PARAMS
+    return params.idf_params(os.path.join(os.path.dirname(__file__), TERM_DF_FILE), MAX_TERMS)
+
+
+def update_list(session, db, list_name, observers=(), index_params=params.DEFAULT_PARAMS, previous=None,
+                before_ingest=None):
+    # returns (changed, status); status is the list's entry for Database.update_status and carries the error,
+    # if any, so that one failing list neither hides the others' progress nor stops them;
+    # before_ingest is called before the list's first mail is written
     month, id = db.get_checkpoint(list_name)
     logger.info(f'loaded checkpoint, list={list_name}, month={month}, id={id}')
     cp = mail.Checkpoint(month=month, id=id)
     ml = mail.MailingList(session, list_name, cp)
-    db = database.Database()
+    db = database.Database(denormalize_terms=DENORMALIZE_TERMS, term_stats=TERM_STATS, author_counts=AUTHOR_COUNTS,
+                           store_bodies=STORE_BODIES)
+    previous = previous or {}
+    status = {
+        'checked': db.now(),
+        'checkpoint': f'{month}/{id}',
+        'ingested': 0,
+        'newest': previous.get('newest', ''),  # date of the newest ingested mail
+        'last_ingest': previous.get('last_ingest', ''),
+    }
     changed = False
-    for mail_url in ml.mail_urls():
-        last_mail = task.process_mail(ml, db, mail_url, params.DEFAULT_PARAMS)
-        db.put_checkpoint(last_mail.list, last_mail.month, last_mail.id)
-        changed = True
-        logger.info(f'stored checkpoint, month={last_mail.month}, id={last_mail.id}')
-    return changed
+    try:
+        mail_urls = list(ml.mail_urls())
+        # mail in the archive past the checkpoint when the run started, what the run has to catch up on
+        status['archive_newest'] = '/'.join(MAIL_URL.match(mail_urls[-1]).groups()) if mail_urls \
+            else status['checkpoint']
+        status['backlog'] = len(mail_urls)
+        if mail_urls and before_ingest:
+            before_ingest()
+        for mail_url in mail_urls:
+            last_mail = task.process_mail(ml, db, mail_url, index_params, observers)
+            # counts are flushed with the checkpoint, so a timeout never loses them for checkpointed mail
+            if TERM_STATS:
+                db.flush_term_stats()
+            if AUTHOR_COUNTS:
+                db.flush_author_counts()
+            db.put_checkpoint(last_mail.list, last_mail.month, last_mail.id)
+            changed = True
+            status['checkpoint'] = f'{last_mail.month}/{last_mail.id}'
+            status['ingested'] += 1
+            status['backlog'] -= 1
+            status['newest'] = max(status['newest'], last_mail.date)
+            status['last_ingest'] = db.now()
+            logger.info(f'stored checkpoint, month={last_mail.month}, id={last_mail.id}')
+    except Exception as e:
+        logger.exception(f'list update failed, list={list_name}')
+        status['error'] = repr(e)[:500]
+    return changed, status
+
+
+def load_bloom(artifacts, epoch):
+    bf = bloom.load(artifacts)
+    if not bf:
+        logger.info('no bloom filter published, run rebuild_bloom.py')
+        return None
+    if bf.version != epoch:
+        # terms were written since the filter was published, extending it would publish false negatives
+        logger.warning(f'bloom filter stale, version={bf.version}, terms_epoch={epoch}, run rebuild_bloom.py')
+        return None
+    return bf
+
+
+def publish_feeds(artifacts, version, client):
+    # the global feed and every list's, since the server only serves feeds matching the current last_update
+    for list_name in [None, *MAILING_LISTS]:
+        if list_name:
+            items, _ = records.latest_mail(client, list_name, False, feeds.FEED_ITEMS)
+        else:
+            items, _ = records.latest_mail_global(client, False, feeds.FEED_ITEMS)
+        key = feeds.publish(artifacts, feeds.render(items, records.convert(items), version, list_name))
+        logger.info(f'published feed, key={key}, items={len(items)}')
 
 
 def lambda_handler(event, context):
     init_logging()
-    db = database.Database()
+    db = database.Database(denormalize_terms=DENORMALIZE_TERMS, term_stats=TERM_STATS)
     session = mail.http_session(1)
-    changed = any([update_list(session, db, list_name) for list_name in MAILING_LISTS])
-    date = db.update_status(changed)
-    logger.info(f'updated status, changed={changed}, date={date}')
\ No newline at end of file
+    artifacts = store.open_store(ARTIFACT_STORE) if ARTIFACT_STORE else None
+    epoch = db.get_terms_epoch()
+    bf = load_bloom(artifacts, epoch) if artifacts else None
+    observers = [lambda m, terms: bloom.add_terms(bf, m.list, terms)] if bf else []
+    run = {'epoch': None}
+
+    def before_ingest():
+        # invalidates the published filter once per run, before the first terms are written
+        if run['epoch'] is None:
+            run['epoch'] = db.bump_terms_epoch()
+
+    ip = load_index_params()
+    previous = db.get_list_status()
+    results = {list_name: update_list(session, db, list_name, observers, ip, previous.get(list_name), before_ingest)
+               for list_name in MAILING_LISTS}
+    changed = any(c for c, _ in results.values())
+    failed = [list_name for list_name, (_, status) in results.items() if 'error' in status]
+    now = db.now()
+    if run['epoch']:
+        # bumped again after writing, so a filter another process published meanwhile without these terms is stale;
+        # this run's filter covers every term only if no other writer (seed.py, backfill.py, rebuild_bloom.py) bumped
+        end = db.bump_terms_epoch()
+        if bf and failed:
+            # a mail that failed partway may have written terms the observer never saw
+            logger.warning(f'bloom filter not published, list updates failed, lists={failed}, run rebuild_bloom.py')
+        elif bf and int(run['epoch']) == int(epoch) + 1 and int(end) == int(run['epoch']) + 1:
+            bf.version = end
+            key = bloom.publish(artifacts, bf)
+            logger.info(f'published bloom filter, key={key}, count={bf.count}, '
+                        f'expected_fpr={bf.expected_fpr():.5f}')
+        elif bf:
+            logger.warning('bloom filter not published, terms written concurrently, run rebuild_bloom.py')
+    if changed and artifacts and AUTHOR_COUNTS:
+        directory = authors.AuthorDirectory.build([authors.Author(*a) for a in db.scan_authors()], now)
+        key = authors.publish(artifacts, directory)
+        logger.info(f'published author directory, key={key}, entries={len(directory.entries)}')
+    if changed and artifacts and PUBLISH_FEEDS:
+        publish_feeds(artifacts, now, db.client)
+    date = db.update_status(changed, now, {list_name: status for list_name, (_, status) in results.items()})
+    logger.info(f'updated status, changed={changed}, date={date}')
+    metrics.flush(METRICS_OUTPUT, {'Service': 'updater'})
+    if failed:
+        # after the status update, so the run still records progress and fails for monitoring
+        raise RuntimeError(f'list updates failed, lists={failed}')